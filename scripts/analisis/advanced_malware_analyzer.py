@@ -11,29 +11,38 @@ y análisis de comportamiento.
 import os
 import sys
 import json
+import argparse
 import logging
-import hashlib
-import pefile
-import magic
-import yara
 import pandas as pd
 from datetime import datetime
 from typing import Dict, List, Any, Optional
 import subprocess
 import tempfile
 import shutil
+from scripts.utilidades.common import HashEngine, map_file
+from scripts.utilidades.pe_inspector import PEInspector
+from scripts.utilidades.file_type import FileTypeDetector
+from scripts.utilidades.yara_rules import YaraRulesManager
+from scripts.utilidades.import_index import ImportIndex
 
 class AdvancedMalwareAnalyzer:
-    def __init__(self, sample_path: str, rules_path: Optional[str] = None):
+    def __init__(self, sample_path: str, rules_path: Optional[str] = None,
+                 indice_imports: Optional[ImportIndex] = None):
         """
         Inicializa el analizador de malware
         
         Args:
             sample_path (str): Ruta al archivo a analizar
             rules_path (str, optional): Ruta al directorio de reglas YARA
+            indice_imports (ImportIndex, optional): Índice de imports al que se
+                agrega la muestra y en el que se buscan muestras relacionadas
         """
         self.sample_path = sample_path
         self.rules_path = rules_path
+        self.indice_imports = indice_imports
+        self.hash_engine = HashEngine()
+        self.pe_inspector = PEInspector()
+        self.tipos = FileTypeDetector()
         self.results = {
             'informacion_basica': {},
             'analisis_estatico': {},
@@ -57,15 +66,14 @@ class AdvancedMalwareAnalyzer:
             Dict[str, Any]: Información básica del archivo
         """
         try:
+            # El tipo se identifica con la cabecera leída durante el hashing
+            cabecera = self.tipos.capture()
+            hashes = self._calcular_hashes([cabecera])
             file_info = {
                 'nombre': os.path.basename(self.sample_path),
                 'tamano': os.path.getsize(self.sample_path),
-                'tipo': magic.from_file(self.sample_path),
-                'hashes': {
-                    'md5': self._calcular_hash('md5'),
-                    'sha1': self._calcular_hash('sha1'),
-                    'sha256': self._calcular_hash('sha256')
-                },
+                'tipo': self.tipos.from_buffer(cabecera.data, hashes.get('sha256')),
+                'hashes': hashes,
                 'timestamp': {
                     'creacion': datetime.fromtimestamp(os.path.getctime(self.sample_path)).isoformat(),
                     'modificacion': datetime.fromtimestamp(os.path.getmtime(self.sample_path)).isoformat()
@@ -77,25 +85,21 @@ class AdvancedMalwareAnalyzer:
             logging.error(f"Error al obtener información básica: {str(e)}")
             return {}
             
-    def _calcular_hash(self, algoritmo: str) -> str:
+    def _calcular_hashes(self, consumidores=()) -> Dict[str, str]:
         """
-        Calcula el hash del archivo usando el algoritmo especificado
+        Calcula todos los hashes configurados del archivo en una sola lectura
         
         Args:
-            algoritmo (str): Algoritmo de hash a usar
+            consumidores: Objetos con update() que reciben los mismos bloques
             
         Returns:
-            str: Hash calculado
+            Dict[str, str]: Hash calculado por algoritmo
         """
         try:
-            hash_obj = hashlib.new(algoritmo)
-            with open(self.sample_path, 'rb') as f:
-                while chunk := f.read(8192):
-                    hash_obj.update(chunk)
-            return hash_obj.hexdigest()
+            return self.hash_engine.hash_file(self.sample_path, consumidores)
         except Exception as e:
-            logging.error(f"Error al calcular hash {algoritmo}: {str(e)}")
-            return ""
+            logging.error(f"Error al calcular hashes: {str(e)}")
+            return {}
             
     def analisis_estatico(self) -> Dict[str, Any]:
         """
@@ -109,52 +113,58 @@ class AdvancedMalwareAnalyzer:
                 'caracteristicas_pe': {},
                 'strings': [],
                 'imports': [],
+                'imphash': None,
+                'muestras_mismo_imphash': [],
                 'exports': [],
                 'secciones': [],
                 'recursos': []
             }
             
             if self.results['informacion_basica']['tipo'].startswith('PE32'):
-                pe = pefile.PE(self.sample_path)
+                sha256 = self.results['informacion_basica'].get('hashes', {}).get('sha256')
+                with map_file(self.sample_path) as datos:
+                    pe = self.pe_inspector.inspect(datos, sha256, ('imports', 'exports', 'resources'))
                 
                 # Analizar características PE
                 static_analysis['caracteristicas_pe'] = {
-                    'machine': hex(pe.FILE_HEADER.Machine),
-                    'timestamp': datetime.fromtimestamp(pe.FILE_HEADER.TimeDateStamp).isoformat(),
-                    'entry_point': hex(pe.OPTIONAL_HEADER.AddressOfEntryPoint),
-                    'image_base': hex(pe.OPTIONAL_HEADER.ImageBase)
+                    'machine': hex(pe['machine']),
+                    'timestamp': datetime.fromtimestamp(pe['timestamp']).isoformat(),
+                    'entry_point': hex(pe['entry_point']),
+                    'image_base': hex(pe['image_base'])
                 }
                 
                 # Analizar secciones
-                for section in pe.sections:
+                for section in pe['sections']:
                     section_info = {
-                        'nombre': section.Name.decode().rstrip('\x00'),
-                        'virtual_address': hex(section.VirtualAddress),
-                        'virtual_size': hex(section.Misc_VirtualSize),
-                        'raw_size': hex(section.SizeOfRawData),
-                        'characteristics': hex(section.Characteristics)
+                        'nombre': section['name'],
+                        'virtual_address': hex(section['virtual_address']),
+                        'virtual_size': hex(section['virtual_size']),
+                        'raw_size': hex(section['raw_size']),
+                        'characteristics': hex(section['characteristics'])
                     }
                     static_analysis['secciones'].append(section_info)
                 
                 # Analizar imports
-                if hasattr(pe, 'DIRECTORY_ENTRY_IMPORT'):
-                    for entry in pe.DIRECTORY_ENTRY_IMPORT:
-                        dll_name = entry.dll.decode()
-                        for imp in entry.imports:
-                            if imp.name:
-                                static_analysis['imports'].append(f"{dll_name}:{imp.name.decode()}")
+                for dll_name, funciones in pe['imports']:
+                    for funcion in funciones:
+                        static_analysis['imports'].append(f"{dll_name}:{funcion}")
+                static_analysis['imphash'] = pe['imphash']
+                
+                # Indexar la muestra y buscar otras con el mismo imphash
+                if self.indice_imports is not None and sha256:
+                    if pe['imphash']:
+                        static_analysis['muestras_mismo_imphash'] = [
+                            muestra for muestra in self.indice_imports.samples_with_imphash(pe['imphash'])
+                            if muestra != sha256
+                        ]
+                    self.indice_imports.add(sha256, pe['imphash'], pe['imports'], self.sample_path)
+                    self.indice_imports.commit()
                 
                 # Analizar exports
-                if hasattr(pe, 'DIRECTORY_ENTRY_EXPORT'):
-                    for exp in pe.DIRECTORY_ENTRY_EXPORT.symbols:
-                        if exp.name:
-                            static_analysis['exports'].append(exp.name.decode())
+                static_analysis['exports'].extend(pe['exports'])
                 
                 # Analizar recursos
-                if hasattr(pe, 'DIRECTORY_ENTRY_RESOURCE'):
-                    for resource_type in pe.DIRECTORY_ENTRY_RESOURCE.entries:
-                        if resource_type.name:
-                            static_analysis['recursos'].append(resource_type.name.__str__())
+                static_analysis['recursos'].extend(pe['resources'])
             
             self.results['analisis_estatico'] = static_analysis
             return static_analysis
@@ -174,19 +184,12 @@ class AdvancedMalwareAnalyzer:
                 logging.warning("No se especificó directorio de reglas YARA")
                 return []
                 
-            # Compilar reglas YARA
-            rules = []
-            for root, _, files in os.walk(self.rules_path):
-                for file in files:
-                    if file.endswith('.yar') or file.endswith('.yara'):
-                        rules.append(os.path.join(root, file))
-                        
-            if not rules:
+            # Reglas compiladas una sola vez y reutilizadas entre ejecuciones
+            yara_rules = YaraRulesManager.for_path(self.rules_path)
+            if yara_rules.rules is None:
                 logging.warning("No se encontraron reglas YARA")
                 return []
                 
-            yara_rules = yara.compile(filepaths={f'rule_{i}': rule for i, rule in enumerate(rules)})
-            
             # Analizar archivo
             matches = yara_rules.match(self.sample_path)
             firmas = [str(match) for match in matches]
@@ -336,6 +339,9 @@ def main():
     parser.add_argument('--rules', help='Ruta al directorio de reglas YARA')
     parser.add_argument('--output', default='reporte_malware', 
                        help='Ruta base para los archivos de salida')
+    parser.add_argument('--indice-imports', nargs='?', const='',
+                       help='Base de datos del índice de imports (ver import_index.py); '
+                            'sin valor usa analysis.import_index_db')
     
     args = parser.parse_args()
     
@@ -343,14 +349,19 @@ def main():
         logging.error(f"El archivo {args.sample} no existe")
         sys.exit(1)
         
-    analyzer = AdvancedMalwareAnalyzer(args.sample, args.rules)
+    indice = ImportIndex(args.indice_imports or None) if args.indice_imports is not None else None
+    analyzer = AdvancedMalwareAnalyzer(args.sample, args.rules, indice)
     
-    # Realizar análisis
-    analyzer.obtener_informacion_basica()
-    analyzer.analisis_estatico()
-    analyzer.analizar_firmas()
-    analyzer.analizar_comportamiento()
-    analyzer.calcular_riesgo()
+    try:
+        # Realizar análisis
+        analyzer.obtener_informacion_basica()
+        analyzer.analisis_estatico()
+        analyzer.analizar_firmas()
+        analyzer.analizar_comportamiento()
+        analyzer.calcular_riesgo()
+    finally:
+        if indice is not None:
+            indice.close()
     
     # Generar reporte
     analyzer.generar_reporte(args.output)
@@ -12,23 +12,40 @@ import logging
 from datetime import datetime
 import json
 import argparse
-import hashlib
 import stat
 import time
+import textwrap
 from pathlib import Path
-import magic
+import numpy as np
+from scripts.utilidades.common import (DirectoryWalker, HashEngine, StreamingReportWriter,
+                                       add_walker_arguments, walker_from_args)
+from scripts.utilidades.checkpoint import ResumableWalk
+from scripts.utilidades.file_type import FileTypeDetector
+from scripts.utilidades.columnar_store import FileFindingsStore
+from scripts.utilidades.timeline import TimelineBuilder
+from scripts.utilidades.rules_engine import AttributeRuleEngine
 
 class FileSystemAnalyzer:
-    def __init__(self, directorio, output_file='filesystem_analysis.json'):
+    def __init__(self, directorio, output_file='filesystem_analysis.json', stream=False,
+                 checkpoint=None, reanudar=False, walker=None, timeline=None):
         """
         Inicializa el analizador de sistema de archivos
         
         Args:
             directorio (str): Directorio a analizar
             output_file (str): Archivo de salida para los resultados
+            stream (bool): Escribir cada archivo en JSONL/CSV al analizarlo en lugar
+                de acumular los resultados en memoria
+            checkpoint (str): Archivo de punto de control del recorrido (activa el modo streaming)
+            reanudar (bool): Continuar desde el punto de control de una ejecución interrumpida
+            walker (DirectoryWalker): Recorrido con filtros (por defecto todos los archivos)
+            timeline (str): Ruta de la línea de tiempo MACB a generar junto al análisis
         """
         self.directorio = directorio
         self.output_file = output_file
+        self.hash_engine = HashEngine(["md5"])
+        self.tipos = FileTypeDetector()
+        self.walker = walker or DirectoryWalker()
         self.extensiones_sospechosas = [
             '.exe', '.dll', '.bat', '.cmd', '.ps1', '.vbs',
             '.js', '.jse', '.wsf', '.wsh', '.msi', '.scr'
@@ -40,26 +57,55 @@ class FileSystemAnalyzer:
             'cscript.exe',
             'mshta.exe'
         ]
+        # Las reglas de config.yaml (filesystem_rules) reemplazan a las predeterminadas
+        self.reglas = AttributeRuleEngine(default_rules=self.reglas_por_defecto())
+        self.tamano_lote = 4096
         self.resultados = {
             'fecha_analisis': datetime.now().isoformat(),
-            'directorio': directorio,
-            'archivos_analizados': [],
-            'alertas': []
+            'directorio': directorio
         }
+        # Los archivos analizados y sus alertas se guardan en columnas y se
+        # reconstruyen como diccionarios solo al generar el reporte
+        self.hallazgos = FileFindingsStore()
+        self.timeline = None
+        self.totales = {'archivos_analizados': 0, 'alertas': 0}
+        self.recorrido = None
+        estado_salida = None
+        if checkpoint:
+            # Reanudar solo es idempotente si la salida se escribe de forma incremental
+            stream = True
+            self.recorrido = ResumableWalk(directorio, checkpoint, reanudar, on_save=self.estado_checkpoint,
+                                           walker=self.walker)
+            estado_salida = self.recorrido.extra.get('salida')
+            self.totales.update(self.recorrido.extra.get('totales', {}))
+        if timeline:
+            # Con punto de control los tramos quedan junto a la línea de tiempo para sobrevivir a un reinicio
+            self.timeline = TimelineBuilder(
+                timeline, temp_dir=os.path.dirname(os.path.abspath(timeline)) if checkpoint else None,
+                resume_state=self.recorrido.extra.get('timeline') if self.recorrido else None)
+        self.stream = (StreamingReportWriter(os.path.splitext(output_file)[0], resume_state=estado_salida)
+                       if stream else None)
         
-    def calcular_hash(self, archivo):
-        """Calcula el hash MD5 de un archivo"""
+    def estado_checkpoint(self):
+        """Estado de la salida guardado con cada punto de control"""
+        estado = {'salida': self.stream.state(), 'totales': dict(self.totales)}
+        if self.timeline:
+            estado['timeline'] = self.timeline.state()
+        return estado
+        
+    def calcular_hash(self, archivo, consumidores=()):
+        """Calcula el hash MD5 de un archivo (los consumidores reciben los mismos bloques)"""
         try:
-            with open(archivo, 'rb') as f:
-                return hashlib.md5(f.read()).hexdigest()
+            return self.hash_engine.hash_file(archivo, consumidores).get('md5')
         except Exception as e:
             logging.error(f"Error al calcular hash de {archivo}: {str(e)}")
             return None
     
-    def analizar_permisos(self, archivo):
-        """Analiza los permisos de un archivo"""
+    def analizar_permisos(self, archivo, st=None):
+        """Analiza los permisos de un archivo (reutiliza st si ya está disponible)"""
         try:
-            st = os.stat(archivo)
+            if st is None:
+                st = os.stat(archivo)
             permisos = {
                 'usuario': st.st_uid,
                 'grupo': st.st_gid,
@@ -73,49 +119,74 @@ class FileSystemAnalyzer:
             logging.error(f"Error al analizar permisos de {archivo}: {str(e)}")
             return None
     
-    def analizar_archivo(self, archivo):
+    def reglas_por_defecto(self):
+        """Reglas de atributos usadas si config.yaml no define filesystem_rules"""
+        return [
+            {'reason': 'Extensión sospechosa', 'extensions': self.extensiones_sospechosas},
+            {'reason': 'Nombre sospechoso', 'name_contains': self.patrones_sospechosos},
+            {'reason': 'Permisos inusuales', 'modes': ['777', '666']},
+            {'reason': 'Archivo oculto', 'name_startswith': ['.']}
+        ]
+        
+    def evaluar_reglas(self, archivos):
+        """
+        Evalúa las reglas de atributos sobre un lote de archivos
+        
+        Args:
+            archivos (list): Pares (Path, stat o None)
+            
+        Returns:
+            list: Razones por las que cada archivo es sospechoso
+        """
+        modos = np.array([st.st_mode if st else 0 for _, st in archivos], dtype=np.uint32)
+        tamanos = np.array([st.st_size if st else 0 for _, st in archivos], dtype=np.int64)
+        coincidencias = self.reglas.evaluate([archivo.name for archivo, _ in archivos], modos, tamanos,
+                                             [str(archivo) for archivo, _ in archivos])
+        return self.reglas.reasons_for(coincidencias)
+        
+    def analizar_lote(self, registros):
+        """Analiza un lote de registros del recorrido evaluando las reglas de una vez"""
+        archivos = [(Path(registro.path), registro.stat) for registro in registros]
+        for (archivo, st), razones in zip(archivos, self.evaluar_reglas(archivos)):
+            self.analizar_archivo(archivo, st, razones)
+    
+    def analizar_archivo(self, archivo, st=None, razones=None):
         """Analiza un archivo en busca de indicadores sospechosos"""
         try:
+            if st is None:
+                try:
+                    st = os.stat(archivo)
+                except OSError:
+                    st = None
+            if razones is None:
+                razones = self.evaluar_reglas([(archivo, st)])[0]
+                    
+            # El tipo se identifica con la cabecera leída durante el hashing
+            cabecera = self.tipos.capture()
+            hash_archivo = self.calcular_hash(archivo, [cabecera])
             info = {
                 'ruta': str(archivo),
                 'nombre': archivo.name,
-                'hash': self.calcular_hash(archivo),
-                'permisos': self.analizar_permisos(archivo),
-                'tipo': magic.from_file(str(archivo)),
-                'sospechoso': False,
-                'razones': []
+                'hash': hash_archivo,
+                'permisos': self.analizar_permisos(archivo, st),
+                'tipo': self.tipos.from_buffer(cabecera.data, hash_archivo),
+                'sospechoso': bool(razones),
+                'razones': razones
             }
             
-            # Verificar extensión sospechosa
-            if archivo.suffix.lower() in self.extensiones_sospechosas:
-                info['sospechoso'] = True
-                info['razones'].append('Extensión sospechosa')
-            
-            # Verificar nombre sospechoso
-            if any(patron in archivo.name.lower() for patron in self.patrones_sospechosos):
-                info['sospechoso'] = True
-                info['razones'].append('Nombre sospechoso')
-            
-            # Verificar permisos inusuales
-            if info['permisos'] and info['permisos']['modo'] in ['777', '666']:
-                info['sospechoso'] = True
-                info['razones'].append('Permisos inusuales')
+            if self.timeline and st is not None:
+                self.timeline.add(info['ruta'], st, hash_archivo)
             
-            # Verificar archivos ocultos
-            if archivo.name.startswith('.'):
-                info['sospechoso'] = True
-                info['razones'].append('Archivo oculto')
+            self.totales['archivos_analizados'] += 1
+            if info['sospechoso']:
+                self.totales['alertas'] += 1
             
-            self.resultados['archivos_analizados'].append(info)
+            if self.stream:
+                self.stream.write(info)
+                return
             
-            if info['sospechoso']:
-                alerta = {
-                    'tipo': 'archivo_sospechoso',
-                    'archivo': str(archivo),
-                    'razones': info['razones'],
-                    'timestamp': datetime.now().isoformat()
-                }
-                self.resultados['alertas'].append(alerta)
+            self.hallazgos.append(info['ruta'], info['hash'], st if info['permisos'] else None,
+                                  info['tipo'], info['razones'])
                 
         except Exception as e:
             logging.error(f"Error al analizar archivo {archivo}: {str(e)}")
@@ -123,29 +194,99 @@ class FileSystemAnalyzer:
     def analizar_directorio(self):
         """Analiza todos los archivos en el directorio"""
         try:
-            for root, _, files in os.walk(self.directorio):
-                for file in files:
-                    archivo = Path(root) / file
-                    self.analizar_archivo(archivo)
+            if self.recorrido:
+                for registro in self.recorrido:
+                    self.analizar_archivo(Path(registro.path), registro.stat)
+                return
+            # Las reglas se evalúan por lotes; el recorrido reanudable sigue archivo a
+            # archivo porque da por completado cada archivo al pedir el siguiente
+            lote = []
+            for registro in self.walker.walk(self.directorio):
+                lote.append(registro)
+                if len(lote) >= self.tamano_lote:
+                    self.analizar_lote(lote)
+                    lote = []
+            if lote:
+                self.analizar_lote(lote)
         except Exception as e:
             logging.error(f"Error al analizar directorio: {str(e)}")
     
     def generar_reporte(self):
         """Genera un reporte con los resultados del análisis"""
         try:
+            if self.timeline:
+                self.timeline.close()
+            if self.stream:
+                resumen = {
+                    'fecha_analisis': self.resultados['fecha_analisis'],
+                    'directorio': self.directorio,
+                    **self.totales
+                }
+                self.stream.close(resumen)
+                if self.recorrido:
+                    self.recorrido.finish()
+                logging.info(f"Reporte generado en {', '.join(self.stream.paths)}")
+                return
             with open(self.output_file, 'w') as f:
-                json.dump(self.resultados, f, indent=4)
+                self._escribir_json(f)
             logging.info(f"Reporte generado en {self.output_file}")
         except Exception as e:
             logging.error(f"Error al generar reporte: {str(e)}")
 
+    def _escribir_json(self, f):
+        """
+        Escribe el reporte JSON materializando un archivo a la vez
+        
+        El resultado es idéntico a json.dump(indent=4) sobre el diccionario
+        completo, sin construir todas las entradas en memoria.
+        """
+        f.write('{\n')
+        for clave, valor in self.resultados.items():
+            f.write(f'    {json.dumps(clave)}: {json.dumps(valor)},\n')
+        secciones = [('archivos_analizados', self.hallazgos.records()),
+                     ('alertas', self.hallazgos.alerts())]
+        for n, (clave, entradas) in enumerate(secciones):
+            f.write(f'    {json.dumps(clave)}: [')
+            separador = '\n'
+            for entrada in entradas:
+                f.write(separador)
+                f.write(textwrap.indent(json.dumps(entrada, indent=4), ' ' * 8))
+                separador = ',\n'
+            f.write('\n    ]' if separador != '\n' else ']')
+            f.write(',\n' if n < len(secciones) - 1 else '\n')
+        f.write('}')
+        
+    def exportar_parquet(self, ruta):
+        """Exporta los archivos analizados a Parquet (requiere pyarrow)"""
+        try:
+            self.hallazgos.to_parquet(ruta)
+            logging.info(f"Hallazgos exportados a {ruta}")
+        except ImportError:
+            logging.error("La exportación a Parquet requiere pyarrow")
+        except Exception as e:
+            logging.error(f"Error al exportar a Parquet: {str(e)}")
+
 def main():
     parser = argparse.ArgumentParser(description='Analizador de Sistemas de Archivos')
     parser.add_argument('directorio', help='Directorio a analizar')
     parser.add_argument('--output', default='filesystem_analysis.json',
                        help='Archivo de salida para los resultados')
+    parser.add_argument('--stream', action='store_true',
+                       help='Escribir el reporte en JSONL/CSV a medida que avanza el análisis')
+    parser.add_argument('--checkpoint',
+                       help='Archivo de punto de control (por defecto <salida>.checkpoint.json en modo --stream)')
+    parser.add_argument('--resume', action='store_true',
+                       help='Reanudar un análisis interrumpido desde su punto de control')
+    parser.add_argument('--timeline',
+                       help='Generar bodyfile y línea de tiempo MACB ordenada en esta ruta')
+    parser.add_argument('--parquet',
+                       help='Exportar además los archivos analizados a Parquet (sin --stream/--checkpoint)')
+    add_walker_arguments(parser)
     
     args = parser.parse_args()
+    if args.parquet and (args.stream or args.resume or args.checkpoint):
+        # En streaming los resultados no se acumulan en columnas que exportar
+        parser.error('--parquet no es compatible con --stream/--resume/--checkpoint')
     
     # Configurar logging
     logging.basicConfig(
@@ -153,9 +294,15 @@ def main():
         format='%(asctime)s - %(levelname)s - %(message)s'
     )
     
-    analyzer = FileSystemAnalyzer(args.directorio, args.output)
+    checkpoint = args.checkpoint
+    if checkpoint is None and (args.stream or args.resume):
+        checkpoint = os.path.splitext(args.output)[0] + '.checkpoint.json'
+    analyzer = FileSystemAnalyzer(args.directorio, args.output, args.stream, checkpoint, args.resume,
+                                  walker_from_args(args), args.timeline)
     analyzer.analizar_directorio()
     analyzer.generar_reporte()
+    if args.parquet:
+        analyzer.exportar_parquet(args.parquet)
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -7,30 +7,126 @@ Este script analiza logs de seguridad en busca de patrones sospechosos
 y genera reportes de eventos relevantes.
 """
 
+import os
 import re
 import json
+import time
+import signal
 import logging
 from datetime import datetime
 import argparse
 from collections import defaultdict
+from scripts.utilidades.log_patterns import LogPatternMatcher
+from scripts.utilidades.common import map_file
+from scripts.utilidades.log_chunks import iter_file_line_blocks, iter_line_blocks, map_line_ranges
+from scripts.utilidades.log_follow import LogFollower
+from scripts.utilidades.log_time import SlidingWindowCounter, TimestampParser
+
+# Líneas evaluadas juntas por el prefiltro de literales
+BATCH_LINES = 10000
+
+# Origen y usuario de los eventos de autenticación (sshd, sudo)
+IP_PATTERN = re.compile(r'\bfrom ([0-9A-Fa-f][0-9A-Fa-f.:]*[0-9A-Fa-f])')
+USER_PATTERN = re.compile(r'\bfor (?:invalid user )?(\S+) from |\bsudo:\s+(\S+) : ')
+
+# Reglas "umbral eventos de un tipo con la misma clave en ventana segundos"
+WINDOW_RULES = [
+    {'nombre': 'fuerza_bruta_por_ip', 'tipo': 'intentos_fallidos', 'clave': 'ip', 'umbral': 5, 'ventana': 60},
+    {'nombre': 'fuerza_bruta_por_usuario', 'tipo': 'intentos_fallidos', 'clave': 'usuario',
+     'umbral': 10, 'ventana': 300},
+]
 
 class SecurityLogAnalyzer:
-    def __init__(self, log_file):
+    def __init__(self, log_file, patterns=None, window_rules=None):
         """
         Inicializa el analizador de logs
         
         Args:
             log_file (str): Ruta al archivo de log
+            patterns (dict): Patrones por tipo (por defecto los de autenticación)
+            window_rules (list): Reglas de ventana deslizante (por defecto WINDOW_RULES)
         """
         self.log_file = log_file
-        self.patterns = {
+        self.patterns = dict(patterns) if patterns else {
             'intentos_fallidos': r'Failed password',
             'acceso_exitoso': r'Accepted password',
             'escalada_privilegios': r'sudo:.*COMMAND=',
             'puertos_escaneados': r'Port scan detected',
             'ataques_brute_force': r'Too many authentication failures'
         }
+        # Los patrones se compilan una vez y se prefiltran por su literal obligatorio
+        self.matcher = LogPatternMatcher(self.patterns, re.IGNORECASE)
         self.results = defaultdict(list)
+        self.window_rules = list(WINDOW_RULES if window_rules is None else window_rules)
+        self._counters = [SlidingWindowCounter(regla['ventana']) for regla in self.window_rules]
+        # Un extractor de hora por archivo, que recuerda el formato de sus líneas
+        self._time_parsers = {}
+
+    def _time_parser(self, log_file):
+        parser = self._time_parsers.get(log_file)
+        if parser is None:
+            try:
+                referencia = os.path.getmtime(log_file)
+            except OSError:
+                referencia = None
+            parser = self._time_parsers[log_file] = TimestampParser(referencia)
+        return parser
+
+    def _event(self, type, line, log_file=None):
+        """Entrada de resultado con la hora del evento (o la del análisis si la línea no la tiene)"""
+        epoch = self._time_parser(log_file or self.log_file).parse(line)
+        entrada = {
+            'timestamp': (datetime.fromtimestamp(epoch) if epoch is not None else datetime.now()).isoformat(),
+            'epoch': epoch,
+            'linea': line.strip(),
+            'tipo': type
+        }
+        ip = IP_PATTERN.search(line)
+        if ip:
+            entrada['ip'] = ip.group(1)
+        usuario = USER_PATTERN.search(line)
+        if usuario:
+            entrada['usuario'] = usuario.group(1) or usuario.group(2)
+        return entrada
+
+    def _apply_windows(self, entrada, now=None):
+        """
+        Cuenta un evento en las reglas de ventana y devuelve las alertas que dispara
+
+        Una regla alerta cuando los eventos de una clave llegan al umbral
+        dentro de la ventana. Los eventos sin hora propia solo cuentan si se
+        indica now (en seguimiento continuo, la hora de llegada); en un
+        análisis de archivo se ignoran.
+        """
+        alertas = []
+        epoch = entrada['epoch'] if entrada['epoch'] is not None else now
+        if epoch is None:
+            return alertas
+        for regla, contador in zip(self.window_rules, self._counters):
+            clave = entrada.get(regla['clave'])
+            if entrada['tipo'] != regla['tipo'] or clave is None:
+                continue
+            if contador.add(clave, epoch) == regla['umbral']:
+                alerta = {
+                    'timestamp': entrada['timestamp'],
+                    'epoch': entrada['epoch'],
+                    'linea': entrada['linea'],
+                    'tipo': regla['nombre'],
+                    regla['clave']: clave,
+                    'eventos': regla['umbral'],
+                    'ventana': regla['ventana']
+                }
+                alertas.append(alerta)
+        return alertas
+
+    def _add_result(self, type, line):
+        entrada = self._event(type, line)
+        self._store(entrada)
+
+    def _store(self, entrada):
+        self.results[entrada['tipo']].append(entrada)
+        for alerta in self._apply_windows(entrada):
+            self.results[alerta['tipo']].append(alerta)
         
     def analyze_line(self, line):
         """
@@ -39,22 +135,95 @@ class SecurityLogAnalyzer:
         Args:
             line (str): Línea de log a analizar
         """
-        for type, pattern in self.patterns.items():
-            if re.search(pattern, line, re.IGNORECASE):
-                self.results[type].append({
-                    'timestamp': datetime.now().isoformat(),
-                    'linea': line.strip(),
-                    'tipo': type
-                })
+        for type in self.matcher.match(line):
+            self._add_result(type, line)
+
+    def analyze_lines(self, lines):
+        """
+        Analiza un bloque de líneas de una vez
+
+        Equivale a llamar a analyze_line con cada línea, pero los literales de
+        los patrones se buscan sobre el bloque completo.
+
+        Args:
+            lines (list): Líneas de log a analizar
+        """
+        for type, indices in self.matcher.match_lines(lines).items():
+            for i in indices:
+                self._add_result(type, lines[i])
                 
-    def analyze_file(self):
-        """Analiza el archivo de log completo"""
+    def analyze_file(self, workers=1):
+        """
+        Analiza el archivo de log completo
+
+        Con workers > 1 el archivo se mapea en memoria, se divide en rangos por
+        saltos de línea y cada rango se analiza en un proceso distinto; los
+        resultados se combinan en el orden del archivo, igual que en secuencial.
+
+        Args:
+            workers (int): Número de procesos
+        """
         try:
-            with open(self.log_file, 'r') as f:
-                for line in f:
-                    self.analyze_line(line)
+            if workers > 1:
+                for resultados in map_line_ranges(self.log_file, _analyze_range, workers, self.patterns):
+                    for entradas in resultados.values():
+                        # Las ventanas se evalúan aquí, en el orden del archivo
+                        for entrada in entradas:
+                            self._store(entrada)
+                return
+            # Mismo decodificador que los rangos en paralelo: los bytes no UTF-8 se sustituyen
+            with map_file(self.log_file) as data:
+                self._analyze_blocks(iter_line_blocks(data, 0, len(data)))
         except Exception as e:
             logging.error(f"Error al analizar archivo: {str(e)}")
+
+    def _analyze_blocks(self, blocks):
+        """Analiza bloques de líneas decodificadas en lotes de BATCH_LINES"""
+        for lines in blocks:
+            for inicio in range(0, len(lines), BATCH_LINES):
+                self.analyze_lines(lines[inicio:inicio + BATCH_LINES])
+
+    def _follow_line(self, log_file, line, now):
+        """Detecciones y alertas de una línea nueva de un log seguido, recibida en el instante now"""
+        # La referencia del año de syslog avanza con el reloj mientras se sigue el log
+        self._time_parser(log_file).advance(now)
+        eventos = []
+        for type in self.matcher.match(line):
+            entrada = self._event(type, line, log_file)
+            eventos += [dict(evento, archivo=log_file) for evento in [entrada] + self._apply_windows(entrada, now)]
+        return eventos
+
+    def follow(self, log_files, output_file=None, state_file=None, from_start=False):
+        """
+        Sigue uno o varios logs y emite cada detección en cuanto se escribe la línea
+
+        Cada detección, y cada alerta de las reglas de ventana, se escribe como
+        una línea JSON en la salida estándar y, si se indica, en output_file. Las rotaciones se siguen por inodo y los
+        offsets se guardan en state_file para continuar tras un reinicio.
+        Termina con Ctrl+C o SIGTERM.
+
+        Args:
+            log_files (list): Archivos de log a seguir
+            output_file (str): Archivo JSONL donde agregar las detecciones
+            state_file (str): Archivo de offsets (por defecto analysis.log_follow_state)
+            from_start (bool): Leer desde el principio los archivos sin offset guardado
+        """
+        follower = LogFollower(log_files, state_file, from_start=from_start)
+        salida = open(output_file, 'a', encoding='utf-8') if output_file else None
+        try:
+            for log_file, line in follower.follow():
+                for evento in self._follow_line(log_file, line, time.time()):
+                    deteccion = json.dumps(evento, ensure_ascii=False)
+                    print(deteccion, flush=True)
+                    if salida:
+                        salida.write(deteccion + '\n')
+                        salida.flush()
+        except KeyboardInterrupt:
+            logging.info("Seguimiento detenido")
+        finally:
+            follower.close()
+            if salida:
+                salida.close()
             
     def generate_report(self, output_file):
         """
@@ -76,13 +245,35 @@ class SecurityLogAnalyzer:
         except Exception as e:
             logging.error(f"Error al generar reporte: {str(e)}")
 
+# Analizador de cada proceso del pool, reutilizado entre rangos con los mismos patrones
+_range_analyzer = None
+
+def _analyze_range(log_file, start, end, patterns):
+    """Analiza un rango del archivo en un proceso del pool y devuelve sus resultados"""
+    global _range_analyzer
+    if _range_analyzer is None or _range_analyzer.patterns != patterns:
+        # Las ventanas necesitan el orden global y se evalúan al combinar los rangos
+        _range_analyzer = SecurityLogAnalyzer(log_file, patterns, window_rules=[])
+    _range_analyzer.results = defaultdict(list)
+    _range_analyzer._analyze_blocks(iter_file_line_blocks(log_file, start, end))
+    return dict(_range_analyzer.results)
+
 def main():
     parser = argparse.ArgumentParser(description='Analizador de Logs de Seguridad')
-    parser.add_argument('log_file', help='Ruta al archivo de log')
-    parser.add_argument('--output', default='reporte_analisis.json', 
-                       help='Ruta al archivo de salida')
+    parser.add_argument('log_file', nargs='+', help='Ruta al archivo de log (varios con --follow)')
+    parser.add_argument('--output', help='Ruta al archivo de salida (por defecto reporte_analisis.json; '
+                                         'con --follow, JSONL opcional de detecciones)')
+    parser.add_argument('--workers', type=int, default=1,
+                       help='Procesos para analizar el archivo por rangos (por defecto: 1)')
+    parser.add_argument('--follow', action='store_true',
+                       help='Seguir los logs como tail -F y emitir las detecciones al momento')
+    parser.add_argument('--state', help='Archivo de offsets del modo --follow')
+    parser.add_argument('--from-start', action='store_true',
+                       help='Con --follow, leer desde el principio los logs sin offset guardado')
     
     args = parser.parse_args()
+    if not args.follow and len(args.log_file) > 1:
+        parser.error('solo se puede analizar un archivo salvo con --follow')
     
     # Configurar logging
     logging.basicConfig(
@@ -90,9 +281,15 @@ def main():
         format='%(asctime)s - %(levelname)s - %(message)s'
     )
     
-    analyzer = SecurityLogAnalyzer(args.log_file)
-    analyzer.analyze_file()
-    analyzer.generate_report(args.output)
+    if args.follow:
+        # SIGTERM termina como Ctrl+C para guardar los offsets
+        signal.signal(signal.SIGTERM, signal.default_int_handler)
+        SecurityLogAnalyzer(args.log_file[0]).follow(args.log_file, args.output, args.state, args.from_start)
+        return
+
+    analyzer = SecurityLogAnalyzer(args.log_file[0])
+    analyzer.analyze_file(args.workers)
+    analyzer.generate_report(args.output or 'reporte_analisis.json')
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
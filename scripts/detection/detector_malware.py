@@ -8,40 +8,55 @@ análisis de firmas, comportamiento y técnicas de evasión.
 """
 
 import os
-import hashlib
-import pefile
-import magic
 import logging
 from datetime import datetime
 import json
 import argparse
 from pathlib import Path
-import yara
-import psutil
-import time
-import win32api
-import win32process
-import win32con
-import win32security
-import ctypes
-from ctypes import wintypes
+import threading
 import sys
+from scripts.utilidades.common import (DirectoryWalker, HashEngine, StreamingReportWriter,
+                                       add_walker_arguments, map_file, walker_from_args)
+from scripts.utilidades.scan_cache import ScanCache, ruleset_version
+from scripts.utilidades.yara_rules import YaraRulesManager, LiteralMatcher
+from scripts.utilidades.pe_inspector import PEInspector
+from scripts.utilidades.file_type import FileTypeDetector
+from scripts.utilidades.hash_index import HashReputationIndex
+from scripts.utilidades.sandbox_runner import SandboxRunner
+from scripts.utilidades.checkpoint import ResumableWalk
+
+# Columnas del reporte CSV (los campos opcionales no aparecen en todos los resultados)
+CAMPOS_REPORTE = ['archivo', 'hash', 'hashes', 'tipo', 'sospechoso', 'razones',
+                  'caracteristicas_pe', 'comportamiento']
 
 class DetectorMalware:
-    def __init__(self, directorio, reglas_yara=None):
+    def __init__(self, directorio, reglas_yara=None, cache=None, indice_hashes=None, sandbox_workers=None,
+                 salida_stream=None, checkpoint=None, reanudar=False, walker=None):
         """
         Inicializa el detector de malware
         
         Args:
             directorio (str): Directorio a analizar
-            reglas_yara (str): Ruta al archivo de reglas YARA
+            reglas_yara (str): Ruta al archivo o directorio de reglas YARA
+            cache (str): Ruta a la caché SQLite de escaneos previos
+            indice_hashes (str): Directorio del índice de hashes maliciosos conocidos
+            sandbox_workers (int): Muestras ejecutadas a la vez en el análisis de comportamiento
+            salida_stream (str): Ruta base de los reportes JSONL/CSV escritos durante el análisis
+            checkpoint (str): Archivo de punto de control del recorrido (requiere salida_stream)
+            reanudar (bool): Continuar desde el punto de control de una ejecución interrumpida
+            walker (DirectoryWalker): Recorrido con filtros (por defecto todos los archivos)
         """
         self.directorio = directorio
+        self.hash_engine = HashEngine()
+        self.walker = walker or DirectoryWalker()
+        self.pe_inspector = PEInspector()
+        self.tipos = FileTypeDetector()
         self.reglas_yara = self.cargar_reglas_yara(reglas_yara) if reglas_yara else None
         self.firmas_malware = {
             '4a5e1e4baab89f3a32518a88c31bc87f618d7667': 'Ejemplo de firma 1',
             'b1d5781111d84f7b3fe45a0852e59758cd7a87e5': 'Ejemplo de firma 2'
         }
+        self.indice_hashes = HashReputationIndex(indice_hashes) if indice_hashes else None
         self.resultados = {
             'fecha_analisis': datetime.now().isoformat(),
             'directorio': directorio,
@@ -54,158 +69,230 @@ class DetectorMalware:
             'Wireshark', 'Process Explorer', 'Process Monitor',
             'Debugger', 'Sandbox', 'Analysis'
         ]
+        self.indicadores_evasion = LiteralMatcher(self.tecnicas_evasion)
+        self.cache = ScanCache(cache, self.version_reglas()) if cache else None
+        self.sandbox = SandboxRunner(workers=sandbox_workers)
+        self._lock = threading.Lock()
+        self._pendientes_cache = []
+        # En modo streaming los resultados se escriben al terminar cada archivo
+        # y en memoria solo quedan los contadores del resumen
+        self.totales = {'archivos_analizados': 0, 'archivos_sospechosos': 0, 'comportamiento': 0}
+        self.recorrido = None
+        estado_salida = None
+        if checkpoint and salida_stream:
+            self.recorrido = ResumableWalk(directorio, checkpoint, reanudar, on_save=self.estado_checkpoint,
+                                           walker=self.walker)
+            estado_salida = self.recorrido.extra.get('salida')
+            self.totales.update(self.recorrido.extra.get('totales', {}))
+        self.stream = (StreamingReportWriter(salida_stream, csv_fields=CAMPOS_REPORTE, resume_state=estado_salida)
+                       if salida_stream else None)
+        
+    def version_reglas(self):
+        """Calcula la versión de las reglas y firmas usadas para invalidar la caché"""
+        version_yara = self.reglas_yara.version if self.reglas_yara else None
+        version_indice = self.indice_hashes.version if self.indice_hashes else None
+        return ruleset_version(version_yara, version_indice, self.firmas_malware, self.tecnicas_evasion)
+        
+    def buscar_firma(self, hash_archivo):
+        """Busca un hash en las firmas locales y en el índice de reputación"""
+        if hash_archivo in self.firmas_malware:
+            return self.firmas_malware[hash_archivo]
+        if self.indice_hashes:
+            return self.indice_hashes.lookup(hash_archivo)
+        return None
         
     def cargar_reglas_yara(self, archivo_reglas):
-        """Carga las reglas YARA desde un archivo"""
+        """Carga las reglas YARA desde un archivo o directorio, reutilizando la versión compilada"""
         try:
-            return yara.compile(filepath=archivo_reglas)
+            gestor = YaraRulesManager.for_path(archivo_reglas)
+            return gestor if gestor.rules is not None else None
         except Exception as e:
             logging.error(f"Error al cargar reglas YARA: {str(e)}")
             return None
             
-    def calcular_hash(self, archivo):
-        """Calcula el hash MD5 de un archivo"""
+    def calcular_hashes(self, archivo, datos=None):
+        """Calcula todos los hashes configurados de un archivo en una sola lectura"""
         try:
-            with open(archivo, 'rb') as f:
-                return hashlib.md5(f.read()).hexdigest()
+            if datos is not None:
+                return self.hash_engine.hash_buffer(datos)
+            return self.hash_engine.hash_file(archivo)
         except Exception as e:
             logging.error(f"Error al calcular hash: {str(e)}")
-            return None
+            return {}
             
-    def analizar_pe(self, archivo):
-        """Analiza un archivo PE (Portable Executable)"""
+    def calcular_hash(self, archivo):
+        """Calcula el hash MD5 de un archivo"""
+        return self.calcular_hashes(archivo).get('md5')
+            
+    def analizar_pe(self, archivo, datos=None, digest=None):
+        """Analiza un archivo PE (Portable Executable) parseando solo cabeceras, imports y exports"""
         try:
-            pe = pefile.PE(archivo)
+            directorios = ('imports', 'exports')
+            if datos is None:
+                with map_file(archivo) as datos:
+                    pe = self.pe_inspector.inspect(datos, digest, directorios)
+            else:
+                pe = self.pe_inspector.inspect(datos, digest, directorios)
             caracteristicas = {
                 'tipo': 'PE',
-                'secciones': len(pe.sections),
-                'imports': len(pe.DIRECTORY_ENTRY_IMPORT) if hasattr(pe, 'DIRECTORY_ENTRY_IMPORT') else 0,
-                'exports': len(pe.DIRECTORY_ENTRY_EXPORT.symbols) if hasattr(pe, 'DIRECTORY_ENTRY_EXPORT') else 0,
-                'timestamp': pe.FILE_HEADER.TimeDateStamp,
-                'entry_point': pe.OPTIONAL_HEADER.AddressOfEntryPoint,
-                'image_base': pe.OPTIONAL_HEADER.ImageBase
+                'secciones': len(pe['sections']),
+                'imports': len(pe['imports']),
+                'exports': len(pe['exports']),
+                'timestamp': pe['timestamp'],
+                'entry_point': pe['entry_point'],
+                'image_base': pe['image_base']
             }
             return caracteristicas
         except Exception as e:
             logging.error(f"Error al analizar PE: {str(e)}")
             return None
             
-    def detectar_evasion(self, archivo):
-        """Detecta técnicas de evasión en el archivo"""
+    def detectar_evasion(self, archivo, datos=None):
+        """Detecta técnicas de evasión en el archivo sin decodificar su contenido"""
         try:
-            with open(archivo, 'rb') as f:
-                contenido = f.read().decode('utf-8', errors='ignore')
-                for tecnica in self.tecnicas_evasion:
-                    if tecnica.lower() in contenido.lower():
-                        return True
-            return False
+            if datos is None:
+                with map_file(archivo) as datos:
+                    return bool(self.indicadores_evasion.match(datos))
+            return bool(self.indicadores_evasion.match(datos))
         except Exception as e:
             logging.error(f"Error al detectar evasión: {str(e)}")
             return False
             
     def analizar_comportamiento(self, archivo):
-        """Analiza el comportamiento del archivo en tiempo real"""
-        try:
-            proceso = psutil.Popen([str(archivo)], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-            comportamiento = {
-                'pid': proceso.pid,
-                'inicio': datetime.now().isoformat(),
-                'acciones': []
-            }
-            
-            # Monitorear por 5 segundos
-            for _ in range(5):
-                try:
-                    # Verificar handles
-                    handles = win32process.EnumProcessModules(proceso.pid)
-                    if len(handles) > 50:  # Umbral arbitrario
-                        comportamiento['acciones'].append({
-                            'tipo': 'handles_excesivos',
-                            'cantidad': len(handles)
-                        })
-                    
-                    # Verificar memoria
-                    memoria = proceso.memory_info().rss
-                    if memoria > 100 * 1024 * 1024:  # 100MB
-                        comportamiento['acciones'].append({
-                            'tipo': 'uso_memoria_alto',
-                            'memoria': memoria
-                        })
-                    
-                    # Verificar red
-                    conexiones = proceso.connections()
-                    if conexiones:
-                        comportamiento['acciones'].append({
-                            'tipo': 'conexiones_red',
-                            'conexiones': [str(c) for c in conexiones]
-                        })
+        """Analiza el comportamiento del archivo en el sandbox y espera el resultado"""
+        return self.sandbox.submit(archivo).result()
+        
+    def encolar_comportamiento(self, archivo, resultado, st=None):
+        """Encola el análisis de comportamiento sin detener el escaneo estático"""
+        def recibir(comportamiento):
+            with self._lock:
+                if comportamiento:
+                    resultado['comportamiento'] = comportamiento
+                    self.totales['comportamiento'] += 1
+                    if not self.stream:
+                        self.resultados['comportamiento'].append(comportamiento)
+                if self.stream:
+                    self.stream.write(resultado)
                     
-                    time.sleep(1)
-                except Exception as e:
-                    logging.error(f"Error en monitoreo: {str(e)}")
+        self.sandbox.submit(archivo, recibir)
+        if self.cache:
+            # El veredicto se guarda cuando el comportamiento esté disponible
+            self._pendientes_cache.append((str(archivo), st, resultado))
             
-            proceso.terminate()
-            return comportamiento
-        except Exception as e:
-            logging.error(f"Error en análisis de comportamiento: {str(e)}")
-            return None
+    def esperar_comportamiento(self):
+        """Espera los análisis de comportamiento encolados y guarda sus veredictos"""
+        self.sandbox.wait()
+        if self.cache:
+            for archivo, st, resultado in self._pendientes_cache:
+                self.cache.put(archivo, st, resultado)
+        self._pendientes_cache = []
             
-    def analizar_archivo(self, archivo):
-        """Analiza un archivo en busca de indicadores de malware"""
-        try:
-            hash_archivo = self.calcular_hash(archivo)
-            tipo_archivo = magic.from_file(archivo)
-            
-            resultado = {
-                'archivo': str(archivo),
-                'hash': hash_archivo,
-                'tipo': tipo_archivo,
-                'sospechoso': False,
-                'razones': [],
-                'comportamiento': None
-            }
-            
-            # Verificar firma
-            if hash_archivo in self.firmas_malware:
-                resultado['sospechoso'] = True
-                resultado['razones'].append(f"Firma conocida: {self.firmas_malware[hash_archivo]}")
+    def estado_checkpoint(self):
+        """
+        Deja la salida consistente con los archivos completados y devuelve su estado
+        
+        Los análisis de comportamiento pendientes se esperan para que ningún
+        resultado anterior al punto de control quede sin escribir.
+        """
+        self.esperar_comportamiento()
+        if self.cache:
+            self.cache.commit()
+        with self._lock:
+            return {'salida': self.stream.state(), 'totales': dict(self.totales)}
             
-            # Analizar con YARA
-            if self.reglas_yara:
-                matches = self.reglas_yara.match(str(archivo))
-                if matches:
-                    resultado['sospechoso'] = True
-                    resultado['razones'].append(f"Regla YARA: {[m.rule for m in matches]}")
+    def registrar_resultado(self, resultado, completo=True):
+        """
+        Agrega el resultado de un archivo a los resultados del análisis
+        
+        Args:
+            resultado (dict): Resultado del archivo
+            completo (bool): False si el comportamiento aún está pendiente; en modo
+                streaming el resultado se escribe cuando llega el comportamiento
+        """
+        with self._lock:
+            self.totales['archivos_analizados'] += 1
+            if resultado['sospechoso']:
+                self.totales['archivos_sospechosos'] += 1
+            if resultado.get('comportamiento'):
+                self.totales['comportamiento'] += 1
+                
+            if self.stream:
+                if completo:
+                    self.stream.write(resultado)
+                return
+            if resultado.get('comportamiento'):
+                self.resultados['comportamiento'].append(resultado['comportamiento'])
+            self.resultados['archivos_analizados'].append(resultado)
+            if resultado['sospechoso']:
+                self.resultados['archivos_sospechosos'].append(resultado)
             
-            # Analizar archivos PE
-            if 'PE32' in tipo_archivo or 'PE64' in tipo_archivo:
-                caracteristicas = self.analizar_pe(archivo)
-                if caracteristicas:
-                    resultado['caracteristicas_pe'] = caracteristicas
+    def analizar_archivo(self, archivo, st=None):
+        """Analiza un archivo en busca de indicadores de malware"""
+        try:
+            # Reutilizar el veredicto previo si el archivo y las reglas no cambiaron
+            if self.cache:
+                if st is None:
+                    st = os.stat(archivo)
+                resultado = self.cache.get(str(archivo), st)
+                if resultado is not None:
+                    self.registrar_resultado(resultado)
+                    return
                     
-                    # Reglas básicas de detección
-                    if caracteristicas['secciones'] > 10:
+            # Una sola apertura y mapeo del archivo para todo el análisis estático
+            with map_file(archivo) as datos:
+                hashes = self.calcular_hashes(archivo, datos)
+                tipo_archivo = self.tipos.from_buffer(datos, hashes.get('sha256'))
+                
+                resultado = {
+                    'archivo': str(archivo),
+                    'hash': hashes.get('md5'),
+                    'hashes': hashes,
+                    'tipo': tipo_archivo,
+                    'sospechoso': False,
+                    'razones': [],
+                    'comportamiento': None
+                }
+                
+                # Verificar firma contra cualquiera de los hashes calculados
+                for hash_archivo in hashes.values():
+                    firma = self.buscar_firma(hash_archivo)
+                    if firma:
                         resultado['sospechoso'] = True
-                        resultado['razones'].append("Demasiadas secciones")
-                    if caracteristicas['imports'] < 5:
+                        resultado['razones'].append(f"Firma conocida: {firma}")
+                
+                # Analizar con YARA sobre los bytes ya mapeados
+                if self.reglas_yara and len(datos):
+                    matches = self.reglas_yara.match(data=datos)
+                    if matches:
                         resultado['sospechoso'] = True
-                        resultado['razones'].append("Pocas importaciones")
-            
-            # Detectar técnicas de evasión
-            if self.detectar_evasion(archivo):
-                resultado['sospechoso'] = True
-                resultado['razones'].append("Técnicas de evasión detectadas")
+                        resultado['razones'].append(f"Regla YARA: {[m.rule for m in matches]}")
+                
+                # Analizar archivos PE
+                if 'PE32' in tipo_archivo or 'PE64' in tipo_archivo:
+                    caracteristicas = self.analizar_pe(archivo, datos, hashes.get('sha256'))
+                    if caracteristicas:
+                        resultado['caracteristicas_pe'] = caracteristicas
+                        
+                        # Reglas básicas de detección
+                        if caracteristicas['secciones'] > 10:
+                            resultado['sospechoso'] = True
+                            resultado['razones'].append("Demasiadas secciones")
+                        if caracteristicas['imports'] < 5:
+                            resultado['sospechoso'] = True
+                            resultado['razones'].append("Pocas importaciones")
+                
+                # Detectar técnicas de evasión
+                if self.detectar_evasion(archivo, datos):
+                    resultado['sospechoso'] = True
+                    resultado['razones'].append("Técnicas de evasión detectadas")
             
-            # Analizar comportamiento
-            if resultado['sospechoso']:
-                comportamiento = self.analizar_comportamiento(archivo)
-                if comportamiento:
-                    resultado['comportamiento'] = comportamiento
-                    self.resultados['comportamiento'].append(comportamiento)
+            self.registrar_resultado(resultado, completo=not resultado['sospechoso'])
             
-            self.resultados['archivos_analizados'].append(resultado)
+            # Analizar comportamiento de forma asíncrona
             if resultado['sospechoso']:
-                self.resultados['archivos_sospechosos'].append(resultado)
+                self.encolar_comportamiento(archivo, resultado, st if self.cache else None)
+            elif self.cache:
+                self.cache.put(str(archivo), st, resultado)
                 
         except Exception as e:
             logging.error(f"Error al analizar archivo {archivo}: {str(e)}")
@@ -213,16 +300,34 @@ class DetectorMalware:
     def analizar_directorio(self):
         """Analiza todos los archivos en el directorio"""
         try:
-            for root, _, files in os.walk(self.directorio):
-                for file in files:
-                    archivo = Path(root) / file
-                    self.analizar_archivo(archivo)
+            if self.recorrido:
+                for registro in self.recorrido:
+                    self.analizar_archivo(Path(registro.path), registro.stat)
+                return
+            for registro in self.walker.walk(self.directorio):
+                self.analizar_archivo(Path(registro.path), registro.stat)
         except Exception as e:
             logging.error(f"Error al analizar directorio: {str(e)}")
+        finally:
+            self.esperar_comportamiento()
+            if self.cache:
+                self.cache.commit()
             
     def generar_reporte(self, archivo_salida):
         """Genera un reporte con los resultados del análisis"""
         try:
+            if self.stream:
+                # Los resultados ya están en disco: se cierra con el resumen
+                resumen = {
+                    'fecha_analisis': self.resultados['fecha_analisis'],
+                    'directorio': self.directorio,
+                    **self.totales
+                }
+                self.stream.close(resumen)
+                if self.recorrido:
+                    self.recorrido.finish()
+                logging.info(f"Reporte generado en {', '.join(self.stream.paths)}")
+                return
             with open(archivo_salida, 'w') as f:
                 json.dump(self.resultados, f, indent=4)
             logging.info(f"Reporte generado en {archivo_salida}")
@@ -232,9 +337,22 @@ class DetectorMalware:
 def main():
     parser = argparse.ArgumentParser(description='Detector Avanzado de Malware')
     parser.add_argument('directorio', help='Directorio a analizar')
-    parser.add_argument('--reglas', help='Archivo de reglas YARA')
+    parser.add_argument('--reglas', help='Archivo o directorio de reglas YARA')
     parser.add_argument('--salida', default='reporte_malware.json', 
                        help='Ruta al archivo de salida')
+    parser.add_argument('--cache',
+                       help='Base de datos SQLite para omitir archivos sin cambios')
+    parser.add_argument('--indice-hashes',
+                       help='Directorio del índice de hashes maliciosos (ver hash_index.py)')
+    parser.add_argument('--sandbox-workers', type=int,
+                       help='Muestras ejecutadas a la vez en el análisis de comportamiento')
+    parser.add_argument('--stream', action='store_true',
+                       help='Escribir el reporte en JSONL/CSV a medida que avanza el análisis')
+    parser.add_argument('--checkpoint',
+                       help='Archivo de punto de control (por defecto <salida>.checkpoint.json en modo --stream)')
+    parser.add_argument('--resume', action='store_true',
+                       help='Reanudar un análisis interrumpido desde su punto de control (implica --stream)')
+    add_walker_arguments(parser)
     
     args = parser.parse_args()
     
@@ -244,9 +362,16 @@ def main():
         format='%(asctime)s - %(levelname)s - %(message)s'
     )
     
-    detector = DetectorMalware(args.directorio, args.reglas)
+    salida_stream = os.path.splitext(args.salida)[0] if args.stream or args.resume else None
+    checkpoint = args.checkpoint or (f"{salida_stream}.checkpoint.json" if salida_stream else None)
+    detector = DetectorMalware(args.directorio, args.reglas, args.cache, args.indice_hashes,
+                               args.sandbox_workers, salida_stream, checkpoint, args.resume,
+                               walker_from_args(args))
     detector.analizar_directorio()
+    detector.sandbox.shutdown()
     detector.generar_reporte(args.salida)
+    if detector.cache:
+        detector.cache.close()
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
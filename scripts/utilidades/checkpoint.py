@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Recorridos de directorio reanudables
+Este módulo recorre un árbol de directorios en un orden determinista y guarda
+periódicamente un punto de control con la frontera del recorrido (directorios
+pendientes) y la marca del último archivo completado, para que un escaneo
+interrumpido continúe donde se detuvo.
+"""
+
+import os
+import json
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from loguru import logger
+
+from scripts.utilidades.common import DirectoryWalker, FileRecord
+
+CHECKPOINT_VERSION = 1
+
+class ResumableWalk:
+    """
+    Recorrido en profundidad con puntos de control
+
+    Los directorios se listan ordenados por nombre y sus archivos se entregan
+    antes de descender a los subdirectorios. Un archivo se considera completado
+    cuando el consumidor pide el siguiente, de modo que un archivo a medio
+    analizar se repite al reanudar. Los filtros y el listado de cada directorio
+    son los del DirectoryWalker indicado.
+    """
+
+    def __init__(self, root: str, checkpoint_path: str, resume: bool = False,
+                 every_files: int = 1000, every_seconds: float = 60.0,
+                 on_save: Optional[Callable[[], Dict[str, Any]]] = None,
+                 walker: Optional[DirectoryWalker] = None):
+        """
+        Args:
+            root: Directorio raíz del recorrido
+            checkpoint_path: Archivo JSON del punto de control
+            resume: Continuar desde el punto de control existente
+            every_files: Archivos completados entre puntos de control
+            every_seconds: Tiempo máximo entre puntos de control
+            on_save: Función llamada antes de guardar; debe dejar la salida del
+                escáner consistente con lo completado y devolver su estado
+            walker: Recorrido que aporta filtros y listado (por defecto todos los archivos)
+        """
+        self.root = str(root)
+        self.checkpoint_path = str(checkpoint_path)
+        self.every_files = every_files
+        self.every_seconds = every_seconds
+        self.on_save = on_save
+        self.walker = walker or DirectoryWalker(threads=1)
+        self.completed = 0
+        self.extra: Dict[str, Any] = {}
+        self.done = False
+        self._pending: List[List] = [[self.root, 0]]
+        self._current: Optional[List] = None
+        self._last: Optional[str] = None
+        self._since_save = 0
+        self._last_save = time.monotonic()
+
+        if resume:
+            self._load()
+
+    def _load(self):
+        """Restaura el estado del recorrido desde el punto de control"""
+        try:
+            with open(self.checkpoint_path, encoding="utf-8") as f:
+                estado = json.load(f)
+        except FileNotFoundError:
+            logger.warning(f"No existe el punto de control {self.checkpoint_path}: se inicia desde cero")
+            return
+
+        if estado.get("version") != CHECKPOINT_VERSION or estado.get("root") != self.root:
+            raise ValueError(f"El punto de control {self.checkpoint_path} no corresponde a {self.root}")
+
+        self._pending = estado["pending"]
+        self._current = estado["current"]
+        self._last = estado["last"]
+        self.completed = estado["completed"]
+        self.extra = estado.get("extra", {})
+        logger.info(f"Reanudando recorrido de {self.root} tras {self.completed} archivos")
+
+    def _list(self, directory: List, root_dev: int):
+        """Lista archivos y subdirectorios de un directorio ordenados por nombre"""
+        files, subdirs = self.walker.scan(self.root, directory[0], directory[1], root_dev)
+        files.sort(key=lambda registro: registro.name)
+        subdirs.sort()
+        return files, [list(subdir) for subdir in subdirs]
+
+    def __iter__(self) -> Iterator[FileRecord]:
+        root_dev = os.stat(self.root).st_dev
+        while self._current is not None or self._pending:
+            if self._current is None:
+                self._current = self._pending.pop()
+                files, subdirs = self._list(self._current, root_dev)
+                # Invertidos para visitar los subdirectorios en orden alfabético
+                self._pending.extend(reversed(subdirs))
+                self._last = None
+            else:
+                # Reanudación dentro de un directorio: sus subdirectorios ya están en la frontera
+                files, _ = self._list(self._current, root_dev)
+
+            for registro in files:
+                if self._last is not None and registro.name <= self._last:
+                    continue
+                yield registro
+                self._last = registro.name
+                self.completed += 1
+                self._since_save += 1
+                if (self._since_save >= self.every_files
+                        or time.monotonic() - self._last_save >= self.every_seconds):
+                    self.save()
+            self._current = None
+        self.done = True
+
+    def save(self):
+        """Guarda el punto de control de forma atómica"""
+        if self.on_save is not None:
+            self.extra = self.on_save()
+        estado = {
+            "version": CHECKPOINT_VERSION,
+            "root": self.root,
+            "pending": self._pending,
+            "current": self._current,
+            "last": self._last,
+            "completed": self.completed,
+            "extra": self.extra,
+            "saved_at": datetime.now().isoformat()
+        }
+        temporal = f"{self.checkpoint_path}.tmp"
+        with open(temporal, "w", encoding="utf-8") as f:
+            json.dump(estado, f, default=str)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporal, self.checkpoint_path)
+        self._since_save = 0
+        self._last_save = time.monotonic()
+
+    def finish(self):
+        """Elimina el punto de control si el recorrido terminó"""
+        if not self.done:
+            return
+        try:
+            os.unlink(self.checkpoint_path)
+        except FileNotFoundError:
+            pass
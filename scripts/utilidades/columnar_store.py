@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Almacén columnar de hallazgos del sistema de archivos
+Este módulo guarda los resultados del análisis de archivos en columnas
+compactas (arrays de tipos fijos, directorios y tipos internados) en lugar de
+un diccionario por archivo. Los diccionarios se reconstruyen solo al generar
+el reporte y las columnas se pueden exportar a Arrow/Parquet.
+"""
+
+import os
+from array import array
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional
+
+import numpy as np
+
+class _Interner:
+    """Tabla de cadenas repetidas que se guardan una sola vez"""
+
+    def __init__(self):
+        self.values: List[str] = []
+        self._ids: Dict[str, int] = {}
+
+    def add(self, value: str) -> int:
+        ident = self._ids.get(value)
+        if ident is None:
+            ident = self._ids[value] = len(self.values)
+            self.values.append(value)
+        return ident
+
+class FileFindingsStore:
+    """
+    Resultados de FileSystemAnalyzer en columnas
+
+    Cada archivo ocupa unos 100 bytes: tamaño, modo, uid/gid y tiempos como
+    números, el MD5 en binario, el directorio y el tipo como índices de tablas
+    internadas y las razones como índices de su tabla internada, en una
+    columna plana con el offset final de cada archivo (sin límite de razones
+    distintas, a diferencia de una máscara de bits).
+    """
+
+    HASH_BYTES = 16
+
+    def __init__(self):
+        self._directorios = _Interner()
+        self._tipos = _Interner()
+        self._razones = _Interner()
+        self._nombres = bytearray()
+        self._nombre_fin = array('Q')
+        self._directorio = array('I')
+        self._hashes = bytearray()
+        self._tiene_hash = array('B')
+        self._tiene_stat = array('B')
+        self._tamano = array('q')
+        self._modo = array('I')
+        self._uid = array('I')
+        self._gid = array('I')
+        self._atime = array('d')
+        self._mtime = array('d')
+        self._tipo = array('I')
+        self._razon = array('I')
+        self._razones_fin = array('Q')
+        self._analizado = array('d')
+
+    def __len__(self) -> int:
+        return len(self._directorio)
+
+    @property
+    def nbytes(self) -> int:
+        """Memoria aproximada ocupada por las columnas"""
+        columnas = (self._nombre_fin, self._directorio, self._tiene_hash, self._tiene_stat,
+                    self._tamano, self._modo, self._uid, self._gid, self._atime, self._mtime,
+                    self._tipo, self._razon, self._razones_fin, self._analizado)
+        return (len(self._nombres) + len(self._hashes)
+                + sum(c.itemsize * len(c) for c in columnas)
+                + sum(len(v) for v in self._directorios.values + self._tipos.values))
+
+    def append(self, ruta: str, hash_md5: Optional[str], st: Optional[os.stat_result],
+               tipo: str, razones: List[str], analizado: Optional[float] = None):
+        """
+        Agrega el resultado de un archivo
+
+        Args:
+            ruta: Ruta del archivo
+            hash_md5: MD5 en hexadecimal (o None si no se pudo calcular)
+            st: Resultado de stat del archivo (o None si no se pudo obtener)
+            tipo: Tipo de archivo
+            razones: Razones por las que el archivo es sospechoso
+            analizado: Momento del análisis en segundos epoch (por defecto ahora)
+        """
+        directorio, nombre = os.path.split(ruta)
+        self._directorio.append(self._directorios.add(directorio))
+        self._nombres += nombre.encode('utf-8', 'surrogateescape')
+        self._nombre_fin.append(len(self._nombres))
+
+        self._tiene_hash.append(hash_md5 is not None)
+        self._hashes += bytes.fromhex(hash_md5) if hash_md5 else bytes(self.HASH_BYTES)
+
+        self._tiene_stat.append(st is not None)
+        self._tamano.append(st.st_size if st else 0)
+        self._modo.append(st.st_mode if st else 0)
+        self._uid.append(st.st_uid if st else 0)
+        self._gid.append(st.st_gid if st else 0)
+        self._atime.append(st.st_atime if st else 0.0)
+        self._mtime.append(st.st_mtime if st else 0.0)
+
+        self._tipo.append(self._tipos.add(tipo))
+        self._razon.extend(self._razones.add(razon) for razon in razones)
+        self._razones_fin.append(len(self._razon))
+        self._analizado.append(datetime.now().timestamp() if analizado is None else analizado)
+
+    def _ruta(self, i: int) -> str:
+        inicio = self._nombre_fin[i - 1] if i else 0
+        nombre = self._nombres[inicio:self._nombre_fin[i]].decode('utf-8', 'surrogateescape')
+        return os.path.join(self._directorios.values[self._directorio[i]], nombre)
+
+    def _lista_razones(self, i: int) -> List[str]:
+        inicio = self._razones_fin[i - 1] if i else 0
+        return [self._razones.values[r] for r in self._razon[inicio:self._razones_fin[i]]]
+
+    def record(self, i: int) -> Dict[str, Any]:
+        """Reconstruye el resultado de un archivo en el formato del reporte"""
+        ruta = self._ruta(i)
+        permisos = None
+        if self._tiene_stat[i]:
+            permisos = {
+                'usuario': self._uid[i],
+                'grupo': self._gid[i],
+                'modo': oct(self._modo[i])[-3:],
+                'tamaño': self._tamano[i],
+                'ultimo_acceso': datetime.fromtimestamp(self._atime[i]).isoformat(),
+                'ultima_modificacion': datetime.fromtimestamp(self._mtime[i]).isoformat()
+            }
+        razones = self._lista_razones(i)
+        inicio = i * self.HASH_BYTES
+        return {
+            'ruta': ruta,
+            'nombre': os.path.basename(ruta),
+            'hash': self._hashes[inicio:inicio + self.HASH_BYTES].hex() if self._tiene_hash[i] else None,
+            'permisos': permisos,
+            'tipo': self._tipos.values[self._tipo[i]],
+            'sospechoso': bool(razones),
+            'razones': razones
+        }
+
+    def records(self) -> Iterator[Dict[str, Any]]:
+        """Reconstruye los resultados de todos los archivos, uno a la vez"""
+        for i in range(len(self)):
+            yield self.record(i)
+
+    def alerts(self) -> Iterator[Dict[str, Any]]:
+        """Reconstruye las alertas de los archivos sospechosos"""
+        for i in np.flatnonzero(self.columns()['razones']):
+            i = int(i)
+            yield {
+                'tipo': 'archivo_sospechoso',
+                'archivo': self._ruta(i),
+                'razones': self._lista_razones(i),
+                'timestamp': datetime.fromtimestamp(self._analizado[i]).isoformat()
+            }
+
+    def columns(self) -> Dict[str, np.ndarray]:
+        """Vistas NumPy de las columnas numéricas (sin copiar los datos)"""
+        def vista(columna, dtype):
+            return np.frombuffer(columna, dtype=dtype) if len(columna) else np.empty(0, dtype=dtype)
+
+        razones_fin = vista(self._razones_fin, np.uint64)
+
+        return {
+            'directorio': vista(self._directorio, np.uint32),
+            'tamano': vista(self._tamano, np.int64),
+            'modo': vista(self._modo, np.uint32),
+            'uid': vista(self._uid, np.uint32),
+            'gid': vista(self._gid, np.uint32),
+            'atime': vista(self._atime, np.float64),
+            'mtime': vista(self._mtime, np.float64),
+            'tipo': vista(self._tipo, np.uint32),
+            # Número de razones de cada archivo
+            'razones': np.diff(razones_fin, prepend=np.uint64(0)).astype(np.uint32),
+            'analizado': vista(self._analizado, np.float64),
+        }
+
+    def to_arrow(self):
+        """
+        Exporta los hallazgos como tabla Arrow
+
+        Los directorios y tipos se exportan como columnas de diccionario, por lo
+        que la tabla conserva el internado del almacén.
+
+        Raises:
+            ImportError: Si pyarrow no está instalado
+        """
+        import pyarrow as pa
+
+        columnas = self.columns()
+        vista_razon = (np.frombuffer(self._razon, dtype=np.uint32) if len(self._razon)
+                       else np.empty(0, dtype=np.uint32))
+        fin = np.frombuffer(self._nombre_fin, dtype=np.uint64) if len(self) else np.empty(0, np.uint64)
+        offsets = np.concatenate([[0], fin]).astype(np.int64)
+        nombres = pa.LargeStringArray.from_buffers(len(self), pa.py_buffer(offsets),
+                                                   pa.py_buffer(bytes(self._nombres)))
+        tiene_hash = np.frombuffer(self._tiene_hash, dtype=np.uint8).astype(bool)
+        tiene_stat = np.frombuffer(self._tiene_stat, dtype=np.uint8).astype(bool)
+        hashes = pa.FixedSizeBinaryArray.from_buffers(
+            pa.binary(self.HASH_BYTES), len(self),
+            [pa.py_buffer(np.packbits(tiene_hash, bitorder='little')), pa.py_buffer(bytes(self._hashes))])
+
+        def tiempo(segundos):
+            return pa.array((segundos * 1e6).astype(np.int64).view('datetime64[us]'), mask=~tiene_stat)
+
+        return pa.table({
+            'directorio': pa.DictionaryArray.from_arrays(columnas['directorio'], self._directorios.values),
+            'nombre': nombres,
+            'md5': hashes,
+            'tamano': pa.array(columnas['tamano'], mask=~tiene_stat),
+            'modo': pa.array(columnas['modo'], mask=~tiene_stat),
+            'uid': pa.array(columnas['uid'], mask=~tiene_stat),
+            'gid': pa.array(columnas['gid'], mask=~tiene_stat),
+            'atime': tiempo(columnas['atime']),
+            'mtime': tiempo(columnas['mtime']),
+            'tipo': pa.DictionaryArray.from_arrays(columnas['tipo'], self._tipos.values),
+            'razones': pa.LargeListArray.from_arrays(
+                np.concatenate([[0], np.frombuffer(self._razones_fin, dtype=np.uint64)]).astype(np.int64)
+                if len(self) else np.zeros(1, dtype=np.int64),
+                pa.DictionaryArray.from_arrays(vista_razon, self._razones.values)),
+            'sospechoso': pa.array(columnas['razones'] != 0),
+        })
+
+    def to_parquet(self, path: str):
+        """Exporta los hallazgos a Parquet (requiere pyarrow)"""
+        import pyarrow.parquet as pq
+
+        pq.write_table(self.to_arrow(), path, compression='zstd')
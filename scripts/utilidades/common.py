@@ -8,11 +8,18 @@ Este módulo contiene funciones y clases utilizadas por múltiples scripts.
 
 import os
 import sys
+import csv
 import json
+import time
 import yaml
 import logging
+import mmap
+import fnmatch
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, List, Iterable, Iterator, NamedTuple, Tuple, Union
 from datetime import datetime
 import hashlib
 import magic
@@ -70,19 +77,111 @@ class Logger:
         """Retorna el logger configurado"""
         return logger.bind(name=self.name)
 
+DEFAULT_HASH_ALGORITHMS = ["md5", "sha1", "sha256"]
+
+class HashEngine:
+    """
+    Motor de hashing que calcula todos los digests de un archivo en una sola lectura.
+    
+    Los archivos se leen con readinto sobre un buffer reutilizable (uno por hilo)
+    y los que superan mmap_threshold se mapean en memoria, de modo que el consumo
+    de RAM no depende del tamaño de la muestra.
+    """
+    
+    def __init__(self, algorithms: Optional[List[str]] = None,
+                 buffer_size: int = 1024 * 1024,
+                 mmap_threshold: int = 64 * 1024 * 1024):
+        """
+        Args:
+            algorithms: Algoritmos a calcular (por defecto security.hash_algorithms)
+            buffer_size: Tamaño del buffer de lectura en bytes
+            mmap_threshold: Tamaño a partir del cual el archivo se mapea en memoria
+        """
+        if algorithms is None:
+            algorithms = Config().get("security.hash_algorithms") or DEFAULT_HASH_ALGORITHMS
+        self.algorithms = [algorithm.lower() for algorithm in algorithms]
+        for algorithm in self.algorithms:
+            hashlib.new(algorithm)  # Falla pronto si el algoritmo no existe
+        self.buffer_size = buffer_size
+        self.mmap_threshold = mmap_threshold
+        self._local = threading.local()
+        
+    def _get_buffer(self) -> memoryview:
+        """Devuelve el buffer de lectura del hilo actual"""
+        buffer = getattr(self._local, "buffer", None)
+        if buffer is None:
+            buffer = memoryview(bytearray(self.buffer_size))
+            self._local.buffer = buffer
+        return buffer
+        
+    def _feed(self, data: memoryview, targets: List[Any]):
+        """Entrega un buffer completo a los digests en bloques de buffer_size"""
+        for offset in range(0, len(data), self.buffer_size):
+            chunk = data[offset:offset + self.buffer_size]
+            for target in targets:
+                target.update(chunk)
+                
+    def hash_file(self, file_path: str, consumers: Iterable[Any] = ()) -> Dict[str, str]:
+        """
+        Calcula todos los digests configurados de un archivo
+        
+        Args:
+            file_path: Ruta al archivo
+            consumers: Objetos adicionales con método update(bytes) que reciben
+                los mismos bloques que los algoritmos de hash
+                
+        Returns:
+            Dict[str, str]: Digest hexadecimal por algoritmo
+        """
+        hashers = [hashlib.new(algorithm) for algorithm in self.algorithms]
+        targets = hashers + list(consumers)
+        
+        with open(file_path, "rb", buffering=0) as f:
+            size = os.fstat(f.fileno()).st_size
+            if size and size >= self.mmap_threshold:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    with memoryview(mapped) as view:
+                        self._feed(view, targets)
+            else:
+                buffer = self._get_buffer()
+                while True:
+                    read = f.readinto(buffer)
+                    if not read:
+                        break
+                    chunk = buffer[:read]
+                    for target in targets:
+                        target.update(chunk)
+                        
+        return {algorithm: hasher.hexdigest() for algorithm, hasher in zip(self.algorithms, hashers)}
+        
+    def hash_buffer(self, data, consumers: Iterable[Any] = ()) -> Dict[str, str]:
+        """Calcula todos los digests configurados de un buffer ya leído o mapeado"""
+        hashers = [hashlib.new(algorithm) for algorithm in self.algorithms]
+        with memoryview(data) as view:
+            self._feed(view, hashers + list(consumers))
+        return {algorithm: hasher.hexdigest() for algorithm, hasher in zip(self.algorithms, hashers)}
+
+@contextmanager
+def map_file(file_path: str) -> Iterator[Union[mmap.mmap, bytes]]:
+    """
+    Mapea un archivo en memoria de solo lectura para analizarlo con una sola apertura
+    
+    Los archivos vacíos no se pueden mapear y se entregan como b"".
+    """
+    with open(file_path, "rb", buffering=0) as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            yield b""
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            yield mapped
+
 class FileAnalyzer:
     """Clase para análisis básico de archivos"""
     
     @staticmethod
     def get_file_hash(file_path: str, algorithm: str = "sha256") -> str:
         """Calcula el hash de un archivo"""
-        hash_func = getattr(hashlib, algorithm)()
-        
-        with open(file_path, "rb") as f:
-            for chunk in iter(lambda: f.read(4096), b""):
-                hash_func.update(chunk)
-                
-        return hash_func.hexdigest()
+        return HashEngine([algorithm]).hash_file(file_path)[algorithm]
         
     @staticmethod
     def get_file_type(file_path: str) -> str:
@@ -90,10 +189,10 @@ class FileAnalyzer:
         return magic.from_file(file_path)
         
     @staticmethod
-    def get_file_metadata(file_path: str) -> Dict[str, Any]:
-        """Obtiene metadatos básicos de un archivo"""
+    def get_file_metadata(file_path: str, st: Optional[os.stat_result] = None) -> Dict[str, Any]:
+        """Obtiene metadatos básicos de un archivo (reutiliza st si ya está disponible)"""
         path = Path(file_path)
-        stat = path.stat()
+        stat = st if st is not None else path.stat()
         
         return {
             "name": path.name,
@@ -104,6 +203,156 @@ class FileAnalyzer:
             "permissions": oct(stat.st_mode)[-3:]
         }
 
+class FileRecord(NamedTuple):
+    """Archivo encontrado por DirectoryWalker"""
+    path: str
+    name: str
+    depth: int
+    stat: os.stat_result
+
+class DirectoryWalker:
+    """
+    Recorrido de directorios basado en os.scandir
+    
+    Cada directorio se lista una sola vez y el stat de cada archivo se obtiene
+    de su DirEntry y viaja en el registro, para que los análisis no repitan la
+    llamada. Con varios hilos los subdirectorios se listan en paralelo, lo que
+    oculta la latencia de los montajes NFS/SMB; el orden de los archivos solo
+    es determinista con un único hilo.
+    """
+    
+    def __init__(self, include: Optional[Iterable[str]] = None, exclude: Optional[Iterable[str]] = None,
+                 max_depth: Optional[int] = None, one_filesystem: bool = False,
+                 min_size: int = 0, max_size: Optional[int] = None, threads: Optional[int] = None):
+        """
+        Args:
+            include: Patrones glob de archivos a incluir (todos si se omite)
+            exclude: Patrones glob de archivos y directorios a omitir
+            max_depth: Profundidad máxima de descenso (0 = solo el directorio raíz)
+            one_filesystem: No cruzar puntos de montaje
+            min_size: Tamaño mínimo de archivo en bytes
+            max_size: Tamaño máximo de archivo en bytes
+            threads: Hilos de listado (por defecto analysis.walk_threads)
+            
+        Los patrones con "/" se comparan con la ruta relativa a la raíz y el
+        resto con el nombre del archivo o directorio.
+        """
+        self.include = list(include or [])
+        self.exclude = list(exclude or [])
+        self.max_depth = max_depth
+        self.one_filesystem = one_filesystem
+        self.min_size = min_size
+        self.max_size = max_size
+        self.threads = threads or Config().get("analysis.walk_threads", 8)
+        
+    @staticmethod
+    def _matches(patterns: List[str], name: str, relpath: str) -> bool:
+        return any(fnmatch.fnmatch(relpath if "/" in pattern else name, pattern) for pattern in patterns)
+        
+    def scan(self, root: str, directory: str, depth: int,
+             root_dev: int) -> Tuple[List[FileRecord], List[Tuple[str, int]]]:
+        """
+        Lista un directorio del recorrido
+        
+        Args:
+            root: Directorio raíz del recorrido
+            directory: Directorio a listar
+            depth: Profundidad del directorio respecto a la raíz
+            root_dev: Dispositivo de la raíz (para one_filesystem)
+            
+        Returns:
+            Tuple: Archivos aceptados y subdirectorios a visitar con su profundidad
+        """
+        files = []
+        subdirs = []
+        try:
+            with os.scandir(directory) as it:
+                for entry in it:
+                    try:
+                        relpath = entry.path[len(root):].lstrip(os.sep)
+                        if entry.is_dir(follow_symlinks=False):
+                            if self.max_depth is not None and depth >= self.max_depth:
+                                continue
+                            if self.exclude and self._matches(self.exclude, entry.name, relpath):
+                                continue
+                            if self.one_filesystem and entry.stat(follow_symlinks=False).st_dev != root_dev:
+                                continue
+                            subdirs.append((entry.path, depth + 1))
+                        elif entry.is_file():
+                            if self.include and not self._matches(self.include, entry.name, relpath):
+                                continue
+                            if self.exclude and self._matches(self.exclude, entry.name, relpath):
+                                continue
+                            st = entry.stat()
+                            if st.st_size < self.min_size or (self.max_size is not None and st.st_size > self.max_size):
+                                continue
+                            files.append(FileRecord(entry.path, entry.name, depth, st))
+                    except OSError:
+                        continue
+        except OSError as e:
+            logger.warning(f"No se puede listar {directory}: {e}")
+        return files, subdirs
+        
+    def walk(self, root: Union[str, Path]) -> Iterator[FileRecord]:
+        """
+        Recorre un árbol de directorios
+        
+        Args:
+            root: Directorio raíz
+            
+        Yields:
+            FileRecord: Archivos que cumplen los filtros, con su stat
+        """
+        root = os.fspath(root)
+        root_dev = os.stat(root).st_dev
+        
+        if self.threads <= 1:
+            pendientes = [(root, 0)]
+            while pendientes:
+                directory, depth = pendientes.pop()
+                files, subdirs = self.scan(root, directory, depth, root_dev)
+                yield from files
+                pendientes.extend(reversed(subdirs))
+            return
+            
+        executor = ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix="walker")
+        try:
+            pendientes = {executor.submit(self.scan, root, root, 0, root_dev)}
+            while pendientes:
+                listos, pendientes = wait(pendientes, return_when=FIRST_COMPLETED)
+                for future in listos:
+                    files, subdirs = future.result()
+                    for directory, depth in subdirs:
+                        pendientes.add(executor.submit(self.scan, root, directory, depth, root_dev))
+                    yield from files
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+def add_walker_arguments(parser):
+    """Agrega a un parser de argparse las opciones de filtrado del recorrido"""
+    grupo = parser.add_argument_group('recorrido')
+    grupo.add_argument('--include', action='append', metavar='GLOB',
+                       help='Analizar solo archivos que coincidan con el patrón (repetible)')
+    grupo.add_argument('--exclude', action='append', metavar='GLOB',
+                       help='Omitir archivos y directorios que coincidan con el patrón (repetible)')
+    grupo.add_argument('--max-depth', type=int, help='Profundidad máxima de descenso')
+    grupo.add_argument('--one-filesystem', action='store_true', help='No cruzar puntos de montaje')
+    grupo.add_argument('--min-size', type=int, default=0, help='Tamaño mínimo de archivo en bytes')
+    grupo.add_argument('--max-size', type=int, help='Tamaño máximo de archivo en bytes')
+    grupo.add_argument('--walk-threads', type=int, help='Hilos usados para listar directorios')
+
+def walker_from_args(args, include: Optional[Iterable[str]] = None) -> DirectoryWalker:
+    """Crea un DirectoryWalker a partir de las opciones de add_walker_arguments"""
+    return DirectoryWalker(
+        include=args.include or include,
+        exclude=args.exclude,
+        max_depth=args.max_depth,
+        one_filesystem=args.one_filesystem,
+        min_size=args.min_size,
+        max_size=args.max_size,
+        threads=args.walk_threads
+    )
+
 class NetworkUtils:
     """Clase para utilidades de red"""
     
@@ -145,4 +394,137 @@ class ReportGenerator:
         with open(report_path, 'w') as f:
             json.dump(data, f, indent=2)
             
-        return str(report_path) 
\ No newline at end of file
+        return str(report_path)
+
+class StreamingReportWriter:
+    """
+    Escribe los resultados por archivo a medida que llegan
+    
+    Cada resultado se agrega como una línea JSON (y una fila CSV) sin
+    acumularlos en memoria, los archivos se sincronizan a disco periódicamente
+    y close() agrega un registro final de resumen.
+    """
+    
+    def __init__(self, base_path: str, formats: Iterable[str] = ("jsonl", "csv"),
+                 csv_fields: Optional[List[str]] = None, fsync_every: int = 1000,
+                 fsync_seconds: float = 5.0, resume_state: Optional[Dict[str, Any]] = None):
+        """
+        Args:
+            base_path: Ruta base de los archivos (se agrega .jsonl / .csv)
+            formats: Formatos a escribir ("jsonl", "csv")
+            csv_fields: Columnas del CSV (por defecto las claves del primer resultado)
+            fsync_every: Número de resultados entre sincronizaciones a disco
+            fsync_seconds: Tiempo máximo entre sincronizaciones a disco
+            resume_state: Estado devuelto por state() en una ejecución anterior; los
+                archivos se truncan a ese punto y se continúa escribiendo
+        """
+        self.base_path = str(base_path)
+        self.formats = tuple(formats)
+        self.csv_fields = csv_fields
+        self.fsync_every = fsync_every
+        self.fsync_seconds = fsync_seconds
+        self.count = 0
+        self._desde_sync = 0
+        self._ultimo_sync = time.monotonic()
+        self._jsonl = None
+        self._csv = None
+        self._csv_writer = None
+        
+        Path(self.base_path).parent.mkdir(parents=True, exist_ok=True)
+        offsets = {}
+        if resume_state:
+            offsets = resume_state.get("offsets", {})
+            self.csv_fields = self.csv_fields or resume_state.get("csv_fields")
+            self.count = resume_state.get("count", 0)
+        if "jsonl" in self.formats:
+            self._jsonl = self._open(self.base_path + ".jsonl", offsets.get("jsonl"))
+        if "csv" in self.formats:
+            self._csv = self._open(self.base_path + ".csv", offsets.get("csv"), newline="")
+            
+    @staticmethod
+    def _open(path: str, offset: Optional[int], **kwargs):
+        """Abre un archivo de salida, truncándolo al desplazamiento indicado al reanudar"""
+        if offset is None or not os.path.exists(path):
+            return open(path, "w", encoding="utf-8", **kwargs)
+        f = open(path, "r+", encoding="utf-8", **kwargs)
+        # Se descartan las filas escritas después del último punto de control
+        f.truncate(offset)
+        f.seek(offset)
+        return f
+            
+    @property
+    def paths(self) -> List[str]:
+        """Rutas de los archivos generados"""
+        return [f"{self.base_path}.{fmt}" for fmt in self.formats]
+        
+    def _csv_row(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        """Aplana los valores anidados como JSON para el CSV"""
+        return {
+            key: json.dumps(value, default=str) if isinstance(value, (dict, list, tuple)) else value
+            for key, value in record.items()
+        }
+        
+    def write(self, record: Dict[str, Any]):
+        """Escribe el resultado de un archivo"""
+        if self._jsonl is not None:
+            self._jsonl.write(json.dumps(record, default=str) + "\n")
+        if self._csv is not None:
+            if self._csv_writer is None:
+                self.csv_fields = self.csv_fields or list(record.keys())
+                self._csv_writer = csv.DictWriter(self._csv, fieldnames=self.csv_fields,
+                                                  extrasaction="ignore")
+                if self._csv.tell() == 0:
+                    self._csv_writer.writeheader()
+            self._csv_writer.writerow(self._csv_row(record))
+            
+        self.count += 1
+        self._desde_sync += 1
+        if (self._desde_sync >= self.fsync_every
+                or time.monotonic() - self._ultimo_sync >= self.fsync_seconds):
+            self.sync()
+            
+    def state(self) -> Dict[str, Any]:
+        """
+        Sincroniza los archivos y devuelve el estado necesario para reanudarlos
+        
+        Returns:
+            Dict[str, Any]: Desplazamientos de cada archivo, columnas CSV y resultados escritos
+        """
+        self.sync()
+        offsets = {}
+        if self._jsonl is not None:
+            offsets["jsonl"] = self._jsonl.tell()
+        if self._csv is not None:
+            offsets["csv"] = self._csv.tell()
+        return {"offsets": offsets, "csv_fields": self.csv_fields, "count": self.count}
+        
+    def sync(self):
+        """Vacía los buffers y sincroniza los archivos con el disco"""
+        for f in (self._jsonl, self._csv):
+            if f is not None:
+                f.flush()
+                os.fsync(f.fileno())
+        self._desde_sync = 0
+        self._ultimo_sync = time.monotonic()
+        
+    def close(self, summary: Optional[Dict[str, Any]] = None):
+        """
+        Cierra el reporte
+        
+        Args:
+            summary: Resumen del análisis, escrito como última línea del JSONL
+        """
+        if self._jsonl is not None and summary is not None:
+            self._jsonl.write(json.dumps({"resumen": summary}, default=str) + "\n")
+        self.sync()
+        for f in (self._jsonl, self._csv):
+            if f is not None:
+                f.close()
+        self._jsonl = self._csv = None
+        
+    def __enter__(self):
+        return self
+        
+    def __exit__(self, exc_type, exc, tb):
+        if self._jsonl is not None or self._csv is not None:
+            self.close()
@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Extracción de contenedores en memoria
+Este módulo recorre los miembros de archivos ZIP (incluidos JAR, APK y
+documentos OOXML), TAR, GZIP, 7z (si py7zr está instalado) y correos EML sin
+escribir nada en disco: cada miembro se descomprime por bloques a memoria y
+se entrega al escáner, con límites de tamaño por miembro, de bytes totales
+por archivo y de ratio de compresión para detener las bombas ZIP.
+"""
+
+import io
+import gzip
+import email
+import tarfile
+import zipfile
+from email import policy
+from typing import IO, Iterator, List, NamedTuple, Optional
+
+try:
+    import py7zr
+except ImportError:
+    py7zr = None
+
+READ_CHUNK = 1024 * 1024
+
+class ContainerLimits(NamedTuple):
+    """Límites de la extracción recursiva"""
+    max_depth: int = 3                          # Niveles de contenedores anidados
+    max_ratio: float = 100.0                    # Tamaño descomprimido / comprimido
+    max_member_size: int = 64 * 1024 * 1024     # Bytes de un miembro
+    max_total_bytes: int = 512 * 1024 * 1024    # Bytes descomprimidos por archivo de nivel superior
+    max_members: int = 10000                    # Miembros por archivo de nivel superior
+
+class ContainerMember(NamedTuple):
+    """Miembro extraído de un contenedor"""
+    name: str
+    data: bytes
+
+class ExtractionBudget:
+    """
+    Presupuesto compartido por todos los niveles de un archivo de nivel superior
+
+    Guarda también los avisos de los miembros omitidos por superar un límite.
+    """
+
+    def __init__(self, limits: ContainerLimits):
+        self.limits = limits
+        self.remaining = limits.max_total_bytes
+        self.members = 0
+        self.warnings: List[str] = []
+        self.ratio_exceeded = False
+
+    def warn(self, message: str):
+        if message not in self.warnings:
+            self.warnings.append(message)
+
+class _BufferReader(io.RawIOBase):
+    """Vista de archivo de solo lectura sobre un buffer (p. ej. un mmap) sin copiarlo"""
+
+    def __init__(self, data):
+        self._view = memoryview(data)
+        self._pos = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        n = max(0, min(len(buffer), len(self._view) - self._pos))
+        buffer[:n] = self._view[self._pos:self._pos + n]
+        self._pos += n
+        return n
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self._pos, io.SEEK_END: len(self._view)}[whence]
+        self._pos = max(0, base + offset)
+        return self._pos
+
+    def tell(self) -> int:
+        return self._pos
+
+    def close(self):
+        if not self.closed:
+            self._view.release()
+        super().close()
+
+def container_kind(data, name: str = "") -> Optional[str]:
+    """
+    Identifica el formato de contenedor por su firma (o por la extensión en EML)
+
+    Returns:
+        Optional[str]: 'zip', 'tar', 'gzip', '7z', 'eml' o None
+    """
+    cabecera = bytes(data[:512])
+    if cabecera.startswith((b"PK\x03\x04", b"PK\x05\x06")):
+        return 'zip'
+    if cabecera.startswith(b"7z\xbc\xaf\x27\x1c"):
+        return '7z'
+    if cabecera.startswith(b"\x1f\x8b"):
+        return 'gzip'
+    if cabecera[257:262] == b"ustar":
+        return 'tar'
+    if name.lower().endswith('.eml'):
+        return 'eml'
+    return None
+
+def _read_limited(stream: IO[bytes], nombre: str, comprimido: int, budget: ExtractionBudget) -> Optional[bytes]:
+    """Lee un miembro por bloques deteniéndose en cuanto supera algún límite"""
+    limits = budget.limits
+    maximo = min(limits.max_member_size, budget.remaining)
+    partes = []
+    leidos = 0
+    while True:
+        bloque = stream.read(READ_CHUNK)
+        if not bloque:
+            break
+        leidos += len(bloque)
+        # El ratio solo se vigila a partir de 1 MiB: los miembros pequeños comprimen mucho legítimamente
+        if comprimido and leidos > READ_CHUNK and leidos > comprimido * limits.max_ratio:
+            budget.ratio_exceeded = True
+            budget.warn(f"Compression ratio above {limits.max_ratio:g} in {nombre} (possible zip bomb)")
+            return None
+        if leidos > maximo:
+            budget.warn(f"Member {nombre} exceeds the extraction size limit")
+            return None
+        partes.append(bloque)
+    budget.remaining -= leidos
+    return b"".join(partes)
+
+def _counted(budget: ExtractionBudget) -> bool:
+    budget.members += 1
+    if budget.members > budget.limits.max_members:
+        budget.warn(f"More than {budget.limits.max_members} members; the rest were skipped")
+        return False
+    return True
+
+def _zip_members(fileobj: IO[bytes], budget: ExtractionBudget) -> Iterator[ContainerMember]:
+    with zipfile.ZipFile(fileobj) as archivo:
+        for info in archivo.infolist():
+            if info.is_dir() or not _counted(budget):
+                continue
+            if info.flag_bits & 0x1:
+                budget.warn(f"Encrypted member {info.filename} was not scanned")
+                continue
+            if info.file_size > budget.limits.max_member_size:
+                budget.warn(f"Member {info.filename} exceeds the extraction size limit")
+                continue
+            with archivo.open(info) as stream:
+                data = _read_limited(stream, info.filename, max(info.compress_size, 1), budget)
+            if data is not None:
+                yield ContainerMember(info.filename, data)
+
+def _tar_members(fileobj: IO[bytes], budget: ExtractionBudget) -> Iterator[ContainerMember]:
+    with tarfile.open(fileobj=fileobj, mode="r:*") as archivo:
+        for info in archivo:
+            if not info.isfile() or not _counted(budget):
+                continue
+            stream = archivo.extractfile(info)
+            # El tamaño en el TAR es el descomprimido: el ratio se vigila en la capa de compresión
+            data = _read_limited(stream, info.name, 0, budget) if stream else None
+            if data is not None:
+                yield ContainerMember(info.name, data)
+
+def _gzip_members(fileobj: IO[bytes], size: int, name: str, budget: ExtractionBudget) -> Iterator[ContainerMember]:
+    # El miembro toma el nombre del archivo sin la extensión de compresión
+    base = name.rsplit('!', 1)[-1].replace('\\', '/').rsplit('/', 1)[-1]
+    if base.lower().endswith('.tgz'):
+        interno = base[:-4] + '.tar'
+    elif base.lower().endswith('.gz'):
+        interno = base[:-3]
+    else:
+        interno = base + '.out'
+    with gzip.GzipFile(fileobj=fileobj) as stream:
+        data = _read_limited(stream, interno, size, budget)
+    if data is not None and _counted(budget):
+        yield ContainerMember(interno, data)
+
+def _7z_members(fileobj: IO[bytes], size: int, budget: ExtractionBudget) -> Iterator[ContainerMember]:
+    if py7zr is None:
+        budget.warn("7z archive not scanned: py7zr is not installed")
+        return
+    limits = budget.limits
+    with py7zr.SevenZipFile(fileobj, mode="r") as archivo:
+        if archivo.needs_password():
+            budget.warn("Encrypted 7z archive was not scanned")
+            return
+        # Los bloques sólidos no permiten vigilar el ratio por miembro: se comprueban los tamaños declarados
+        seleccion, total = [], 0
+        for info in archivo.list():
+            if info.is_directory or not _counted(budget):
+                continue
+            if info.uncompressed > limits.max_member_size:
+                budget.warn(f"Member {info.filename} exceeds the extraction size limit")
+                continue
+            seleccion.append(info.filename)
+            total += info.uncompressed
+        if total > budget.remaining:
+            budget.warn("7z archive exceeds the total extraction limit")
+            return
+        if total > size * limits.max_ratio and total > READ_CHUNK:
+            budget.ratio_exceeded = True
+            budget.warn(f"Compression ratio above {limits.max_ratio:g} (possible zip bomb)")
+            return
+        if hasattr(archivo, "readall"):
+            productos = {nombre: contenido.read() for nombre, contenido in archivo.read(seleccion).items()}
+        else:
+            fabrica = py7zr.io.BytesIOFactory(limits.max_member_size)
+            archivo.extract(targets=seleccion, factory=fabrica)
+            productos = {}
+            for nombre in seleccion:
+                contenido = fabrica.products.get(nombre)
+                if contenido is not None:
+                    contenido.seek(0)
+                    productos[nombre] = contenido.read()
+    for nombre, data in productos.items():
+        budget.remaining -= len(data)
+        yield ContainerMember(nombre, data)
+
+def _eml_members(data: bytes, budget: ExtractionBudget) -> Iterator[ContainerMember]:
+    mensaje = email.message_from_bytes(data, policy=policy.default)
+    for n, parte in enumerate(mensaje.walk()):
+        if parte.is_multipart() or parte.get_content_disposition() not in ('attachment', 'inline'):
+            continue
+        nombre = parte.get_filename() or f"part{n}"
+        contenido = parte.get_payload(decode=True)
+        if not contenido or not _counted(budget):
+            continue
+        if len(contenido) > min(budget.limits.max_member_size, budget.remaining):
+            budget.warn(f"Attachment {nombre} exceeds the extraction size limit")
+            continue
+        budget.remaining -= len(contenido)
+        yield ContainerMember(nombre, contenido)
+
+def iter_members(data, name: str, budget: ExtractionBudget, kind: Optional[str] = None) -> Iterator[ContainerMember]:
+    """
+    Recorre los miembros de un contenedor (un solo nivel)
+
+    Args:
+        data: Contenido del contenedor (bytes o mmap, que se lee sin copiarlo)
+        name: Nombre del contenedor (para EML y los nombres de GZIP)
+        budget: Presupuesto y avisos compartidos por todo el árbol de contenedores
+        kind: Formato ya identificado con container_kind
+
+    Yields:
+        ContainerMember: Nombre y contenido de cada miembro dentro de los límites
+    """
+    kind = kind or container_kind(data, name)
+    if kind is None:
+        return
+    # Los miembros se leen directamente del buffer o del mmap, sin copiar el contenedor
+    fileobj = _BufferReader(data)
+    try:
+        if kind == 'zip':
+            yield from _zip_members(fileobj, budget)
+        elif kind == 'tar':
+            yield from _tar_members(fileobj, budget)
+        elif kind == 'gzip':
+            yield from _gzip_members(fileobj, len(data), name, budget)
+        elif kind == '7z':
+            yield from _7z_members(fileobj, len(data), budget)
+        elif kind == 'eml':
+            yield from _eml_members(bytes(data), budget)
+    except (zipfile.BadZipFile, tarfile.TarError, gzip.BadGzipFile, EOFError, OSError) as e:
+        budget.warn(f"Malformed {kind} container {name}: {e}")
+    except Exception as e:
+        if py7zr is not None and isinstance(e, py7zr.exceptions.ArchiveError):
+            budget.warn(f"Malformed {kind} container {name}: {e}")
+        else:
+            raise
+    finally:
+        fileobj.close()
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Entropía de Shannon en streaming
+Este módulo calcula la entropía de un archivo mientras se hashea: recibe los
+mismos bloques que los digests (método update) y acumula con NumPy el
+histograma de bytes y un mapa de entropía por ventanas para localizar
+regiones cifradas o comprimidas embebidas en archivos que no lo están.
+"""
+
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Umbral a partir del cual un bloque se considera cifrado o comprimido (bits por byte)
+HIGH_ENTROPY = 7.2
+
+_ROW_OFFSETS = (np.arange(256, dtype=np.uint16) << 8)[:, None]
+
+def _xlogx(limit: int) -> np.ndarray:
+    """Tabla de c * log2(c) para c en [0, limit]"""
+    c = np.arange(limit + 1, dtype=np.float64)
+    return c * np.log2(np.maximum(c, 1))
+
+# Los histogramas de ventana (recuentos pequeños) se resuelven por tabla en lugar de con log2
+_XLOGX = _xlogx(4096)
+
+def shannon_entropy(counts: np.ndarray) -> np.ndarray:
+    """
+    Entropía de Shannon de uno o varios histogramas de bytes
+
+    Usa H = log2(n) - sum(c * log2(c)) / n, con c * log2(c) tomado de una tabla
+    cuando los recuentos son pequeños.
+
+    Args:
+        counts: Histograma(s) con 256 bins en el último eje
+
+    Returns:
+        np.ndarray: Entropía en bits por byte (0 para histogramas vacíos)
+    """
+    counts = np.asarray(counts)
+    totales = counts.sum(axis=-1).astype(np.float64)
+    if counts.size and counts.max() < len(_XLOGX):
+        suma = _XLOGX[counts].sum(axis=-1)
+    else:
+        c = counts.astype(np.float64)
+        suma = (c * np.log2(np.maximum(c, 1))).sum(axis=-1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        entropia = np.where(totales > 0, np.log2(np.maximum(totales, 1)) - suma / np.maximum(totales, 1), 0.0)
+    # Evita -0.0 y errores de redondeo mínimos en histogramas de un solo valor
+    return np.maximum(entropia, 0.0)
+
+def byte_histogram(data) -> np.ndarray:
+    """
+    Histograma de bytes de un buffer
+
+    Los bytes se cuentan por pares (bincount sobre uint16), lo que reduce a la
+    mitad los elementos que recorre bincount, y los 65536 bins se pliegan
+    después en los 256 de cada byte.
+    """
+    arr = np.frombuffer(data, dtype=np.uint8)
+    pares = len(arr) // 2
+    hist = np.bincount(arr[:pares * 2].view(np.uint16), minlength=65536).reshape(256, 256)
+    counts = hist.sum(axis=0) + hist.sum(axis=1)
+    if len(arr) % 2:
+        counts[arr[-1]] += 1
+    return counts
+
+def section_entropy(data, ranges: Sequence[Tuple[int, int]]) -> List[float]:
+    """Entropía de rangos (offset, tamaño) de un buffer ya mapeado, sin copiarlos"""
+    with memoryview(data) as view:
+        return [round(float(shannon_entropy(byte_histogram(view[offset:offset + size]))), 4)
+                if size > 0 and offset < len(view) else 0.0
+                for offset, size in ranges]
+
+class EntropyProfile:
+    """
+    Consumidor de HashEngine que calcula la entropía del archivo y el mapa por ventanas
+
+    La entropía del archivo es exacta. El mapa divide el archivo en ventanas
+    de window bytes y estima la entropía de cada una con uno de cada
+    sample_stride bytes, lo que basta para distinguir regiones cifradas
+    (cerca de 8 bits por byte) del código o los datos normales con una
+    fracción del coste. El paso por defecto es impar para que las tablas de
+    enteros de 2, 4 u 8 bytes no se muestreen siempre en el mismo byte.
+    """
+
+    def __init__(self, window: int = 3072, sample_stride: int = 3):
+        """
+        Args:
+            window: Tamaño de cada ventana del mapa en bytes
+            sample_stride: Se usa uno de cada sample_stride bytes de cada ventana
+        """
+        if window % sample_stride:
+            raise ValueError("window debe ser múltiplo de sample_stride")
+        self.window = window
+        self.sample_stride = sample_stride
+        self.size = 0
+        self.counts = np.zeros(256, dtype=np.int64)
+        # Entropía de cada ventana completa (8 bytes por ventana, no su histograma)
+        self._windows: List[np.ndarray] = []
+        self._pending = bytearray()
+        self._final: Optional[np.ndarray] = None
+
+    def _window_counts(self, arr: np.ndarray) -> np.ndarray:
+        """Histogramas muestreados de un bloque con un número entero de ventanas"""
+        muestras = arr.reshape(-1, self.window)[:, ::self.sample_stride]
+        bloques = []
+        # Cada ventana usa su propio rango de 256 bins: con índices uint16 caben
+        # 256 ventanas por bincount
+        for inicio in range(0, len(muestras), 256):
+            indices = muestras[inicio:inicio + 256].astype(np.uint16)
+            indices |= _ROW_OFFSETS[:len(indices)]
+            bloques.append(np.bincount(indices.ravel(), minlength=len(indices) * 256).reshape(-1, 256))
+        return bloques[0] if len(bloques) == 1 else np.concatenate(bloques)
+
+    def update(self, chunk):
+        """Agrega un bloque del archivo"""
+        arr = np.frombuffer(chunk, dtype=np.uint8)
+        if not len(arr):
+            return
+        self.size += len(arr)
+        self.counts += byte_histogram(arr)
+
+        # Completa la ventana que quedó a medias en el bloque anterior
+        if self._pending:
+            faltan = self.window - len(self._pending)
+            self._pending += arr[:faltan].tobytes()
+            arr = arr[faltan:]
+            if len(self._pending) < self.window:
+                return
+            self._windows.append(shannon_entropy(self._window_counts(np.frombuffer(bytes(self._pending),
+                                                                                dtype=np.uint8))))
+            self._pending.clear()
+
+        completas = len(arr) - len(arr) % self.window
+        if completas:
+            self._windows.append(shannon_entropy(self._window_counts(arr[:completas])))
+        self._pending += arr[completas:].tobytes()
+
+    def _window_entropy(self) -> np.ndarray:
+        if self._final is None:
+            bloques = list(self._windows)
+            # La última ventana incompleta solo cuenta si tiene muestras suficientes
+            if len(self._pending) >= self.window // 2:
+                resto = np.frombuffer(bytes(self._pending), dtype=np.uint8)[::self.sample_stride]
+                bloques.append(shannon_entropy(np.bincount(resto, minlength=256)[None, :]))
+            self._final = np.concatenate(bloques) if bloques else np.zeros(0, dtype=np.float64)
+        return self._final
+
+    @property
+    def entropy(self) -> float:
+        """Entropía del archivo completo en bits por byte"""
+        return float(shannon_entropy(self.counts))
+
+    def entropy_map(self) -> np.ndarray:
+        """Entropía estimada de cada ventana, en orden de offset"""
+        return self._window_entropy()
+
+    def high_entropy_regions(self, threshold: float = HIGH_ENTROPY,
+                             min_size: int = 16384) -> List[Dict[str, float]]:
+        """
+        Regiones contiguas de ventanas con entropía alta
+
+        Args:
+            threshold: Entropía mínima de cada ventana
+            min_size: Tamaño mínimo de la región en bytes
+
+        Returns:
+            List[Dict[str, float]]: offset, size y entropía media de cada región
+        """
+        mapa = self._window_entropy()
+        altas = np.concatenate([[False], mapa >= threshold, [False]])
+        cambios = np.flatnonzero(altas[1:] != altas[:-1])
+        regiones = []
+        for inicio, fin in zip(cambios[::2], cambios[1::2]):
+            offset = int(inicio) * self.window
+            size = min(int(fin) * self.window, self.size) - offset
+            if size >= min_size:
+                regiones.append({'offset': offset, 'size': size,
+                                 'entropy': round(float(mapa[inicio:fin].mean()), 4)})
+        return regiones
+
+    def summary(self, threshold: float = HIGH_ENTROPY, min_size: int = 16384) -> Dict[str, object]:
+        """Resumen para el reporte: entropía del archivo y regiones de entropía alta"""
+        return {'file': round(self.entropy, 4),
+                'high_entropy_regions': self.high_entropy_regions(threshold, min_size)}
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Detección de tipo de archivo
+Este módulo identifica el tipo de un archivo a partir de su cabecera, ya leída
+por la pasada de hashing, sin volver a abrirlo. Los formatos más comunes
+(PE, ELF, ZIP/OOXML/JAR, PDF y scripts) se reconocen con una tabla de firmas
+propia; el resto se delega en libmagic con una instancia por hilo. Los
+resultados se guardan por hash de la muestra.
+"""
+
+import re
+import struct
+import threading
+from collections import OrderedDict
+from typing import Callable, List, Optional, Tuple
+
+import magic
+
+# Bytes de cabecera usados para identificar el tipo
+HEADER_SIZE = 8192
+
+PE_MACHINES = {
+    0x14c: "Intel 80386",
+    0x8664: "x86-64",
+    0xaa64: "Aarch64",
+    0x1c0: "ARM",
+}
+
+PE_SUBSYSTEMS = {
+    1: "(native)",
+    2: "(GUI)",
+    3: "(console)",
+}
+
+# ET_DYN se delega en libmagic: distinguir PIE de biblioteca requiere la sección dinámica
+ELF_TYPES = {
+    1: "relocatable",
+    2: "executable",
+    4: "core file",
+}
+
+ELF_OSABI = {
+    0: "SYSV",
+    3: "GNU/Linux",
+}
+
+ELF_MACHINES = {
+    3: "Intel 80386",
+    40: "ARM",
+    62: "x86-64",
+    183: "ARM aarch64",
+}
+
+OOXML_DIRECTORIES = (
+    (b"word/", "Microsoft Word 2007+"),
+    (b"xl/", "Microsoft Excel 2007+"),
+    (b"ppt/", "Microsoft PowerPoint 2007+"),
+)
+
+SCRIPT_INTERPRETERS = (
+    ("python", "Python script, ASCII text executable"),
+    ("bash", "Bourne-Again shell script, ASCII text executable"),
+    ("sh", "POSIX shell script, ASCII text executable"),
+    ("perl", "Perl script text executable"),
+    ("ruby", "Ruby script, ASCII text executable"),
+    ("node", "Node.js script, ASCII text executable"),
+)
+
+def _sniff_pe(header: bytes) -> Optional[str]:
+    """Cabecera MZ con cabecera PE dentro de los bytes disponibles"""
+    if len(header) < 0x40:
+        return None
+    e_lfanew = struct.unpack_from("<I", header, 0x3c)[0]
+    if e_lfanew + 24 + 96 > len(header) or header[e_lfanew:e_lfanew + 4] != b"PE\x00\x00":
+        return None
+
+    machine, secciones = struct.unpack_from("<HH", header, e_lfanew + 4)
+    caracteristicas = struct.unpack_from("<H", header, e_lfanew + 22)[0]
+    opcional = e_lfanew + 24
+    magic_opcional, = struct.unpack_from("<H", header, opcional)
+    if magic_opcional == 0x10b:
+        tipo, directorios = "PE32", opcional + 96
+    elif magic_opcional == 0x20b:
+        tipo, directorios = "PE32+", opcional + 112
+    else:
+        return None
+    subsistema = struct.unpack_from("<H", header, opcional + 68)[0]
+
+    # Los ensamblados .NET (directorio CLR) y los casos poco comunes se delegan en libmagic
+    clr = directorios + 14 * 8
+    if clr + 8 > len(header) or struct.unpack_from("<II", header, clr) != (0, 0):
+        return None
+    if machine not in PE_MACHINES or subsistema not in PE_SUBSYSTEMS:
+        return None
+
+    dll = " (DLL)" if caracteristicas & 0x2000 else ""
+    return (f"{tipo} executable{dll} {PE_SUBSYSTEMS[subsistema]} {PE_MACHINES[machine]}, "
+            f"for MS Windows, {secciones} sections")
+
+def _sniff_elf(header: bytes) -> Optional[str]:
+    if len(header) < 20 or header[4] not in (1, 2) or header[5] not in (1, 2):
+        return None
+    orden = "<" if header[5] == 1 else ">"
+    tipo, machine = struct.unpack_from(orden + "HH", header, 16)
+    if tipo not in ELF_TYPES or machine not in ELF_MACHINES or header[7] not in ELF_OSABI:
+        return None
+    bits = 32 if header[4] == 1 else 64
+    endian = "LSB" if header[5] == 1 else "MSB"
+    return (f"ELF {bits}-bit {endian} {ELF_TYPES[tipo]}, {ELF_MACHINES[machine]}, "
+            f"version {header[6]} ({ELF_OSABI[header[7]]})")
+
+def _sniff_zip(header: bytes) -> Optional[str]:
+    """ZIP genérico, documentos OOXML y archivos JAR según sus primeras entradas"""
+    if b"[Content_Types].xml" in header:
+        for directorio, descripcion in OOXML_DIRECTORIES:
+            if directorio in header:
+                return descripcion
+        return None
+    if b"META-INF/MANIFEST.MF" in header[:1024]:
+        return "Java archive data (JAR)"
+    return "Zip archive data"
+
+def _sniff_pdf(header: bytes) -> Optional[str]:
+    version = re.match(rb"%PDF-(\d\.\d)", header)
+    return f"PDF document, version {version.group(1).decode()}" if version else None
+
+def _sniff_script(header: bytes) -> Optional[str]:
+    """Scripts con shebang en texto ASCII"""
+    if not header.isascii():
+        return None
+    linea = header.split(b"\n", 1)[0][2:].decode().split()
+    if not linea:
+        return None
+    interprete = linea[0].rsplit("/", 1)[-1]
+    if interprete == "env" and len(linea) > 1:
+        interprete = linea[1]
+    for prefijo, descripcion in SCRIPT_INTERPRETERS:
+        if interprete.startswith(prefijo):
+            return descripcion
+    return None
+
+# Tabla de firmas: prefijo de la cabecera y función que construye la descripción
+SIGNATURES: List[Tuple[bytes, Callable[[bytes], Optional[str]]]] = [
+    (b"MZ", _sniff_pe),
+    (b"\x7fELF", _sniff_elf),
+    (b"PK\x03\x04", _sniff_zip),
+    (b"%PDF-", _sniff_pdf),
+    (b"#!", _sniff_script),
+]
+
+class HeaderCapture:
+    """Consumidor de HashEngine que conserva los primeros bytes del archivo"""
+
+    def __init__(self, size: int = HEADER_SIZE):
+        self.size = size
+        self._buffer = bytearray()
+
+    def update(self, chunk):
+        faltan = self.size - len(self._buffer)
+        if faltan > 0:
+            self._buffer += chunk[:faltan]
+
+    @property
+    def data(self) -> bytes:
+        return bytes(self._buffer)
+
+class FileTypeDetector:
+    """Identificación de tipos por cabecera con caché por hash"""
+
+    def __init__(self, max_entries: int = 65536):
+        """
+        Args:
+            max_entries: Número máximo de tipos guardados en la caché
+        """
+        self.max_entries = max_entries
+        self._cache: "OrderedDict[str, str]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._local = threading.local()
+
+    def _magic(self) -> magic.Magic:
+        """Instancia de libmagic del hilo actual (las instancias no son seguras entre hilos)"""
+        instancia = getattr(self._local, "magic", None)
+        if instancia is None:
+            instancia = self._local.magic = magic.Magic()
+        return instancia
+
+    @staticmethod
+    def sniff(header: bytes) -> Optional[str]:
+        """
+        Identifica los formatos comunes sin libmagic
+
+        Returns:
+            Optional[str]: Descripción del tipo o None si hay que consultar libmagic
+        """
+        for prefijo, identificar in SIGNATURES:
+            if header.startswith(prefijo):
+                try:
+                    return identificar(header)
+                except (struct.error, UnicodeDecodeError):
+                    return None
+        return None
+
+    def capture(self) -> HeaderCapture:
+        """Consumidor para obtener la cabecera durante la pasada de hashing"""
+        return HeaderCapture()
+
+    def from_buffer(self, data, digest: Optional[str] = None) -> str:
+        """
+        Identifica el tipo de un archivo a partir de sus primeros bytes
+
+        Args:
+            data: Cabecera o contenido del archivo (bytes o mmap ya abierto)
+            digest: Hash del archivo usado como clave de caché
+
+        Returns:
+            str: Descripción del tipo en el formato de libmagic
+        """
+        if digest:
+            with self._cache_lock:
+                tipo = self._cache.get(digest)
+                if tipo is not None:
+                    self._cache.move_to_end(digest)
+                    return tipo
+
+        header = bytes(data[:HEADER_SIZE])
+        tipo = self.sniff(header) or self._magic().from_buffer(header)
+
+        if digest:
+            with self._cache_lock:
+                self._cache[digest] = tipo
+                while len(self._cache) > self.max_entries:
+                    self._cache.popitem(last=False)
+        return tipo
+
+    def from_file(self, file_path: str, digest: Optional[str] = None) -> str:
+        """Identifica el tipo leyendo solo la cabecera del archivo"""
+        if digest:
+            with self._cache_lock:
+                if digest in self._cache:
+                    return self._cache[digest]
+        with open(file_path, "rb") as f:
+            return self.from_buffer(f.read(HEADER_SIZE), digest)
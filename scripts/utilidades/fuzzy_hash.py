@@ -0,0 +1,468 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Hash difuso TLSH e índice de similitud
+Este módulo calcula digests TLSH mientras se hashea el archivo (método update,
+como los demás consumidores de HashEngine) y los guarda en un índice LSH en
+disco para encontrar en milisegundos las muestras conocidas más parecidas a
+una nueva, aunque sea una variante recompilada con otro MD5.
+
+Si está instalado py-tlsh se usa la implementación nativa; si no, el mismo
+algoritmo se calcula con NumPy. Ambas producen el mismo digest "T1" con el
+checksum a cero (la variante "private" de TLSH), porque el checksum es una
+recurrencia byte a byte que no se puede vectorizar.
+"""
+
+import os
+import json
+import argparse
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from loguru import logger
+
+from scripts.utilidades.common import Config, DirectoryWalker, HashEngine
+
+try:
+    import tlsh
+except ImportError:
+    tlsh = None
+
+# Tabla de Pearson de TLSH y límites superiores de cada valor de longitud (l_capturing)
+_PEARSON = (
+    1, 87, 49, 12, 176, 178, 102, 166, 121, 193, 6, 84, 249, 230, 44, 163,
+    14, 197, 213, 181, 161, 85, 218, 80, 64, 239, 24, 226, 236, 142, 38, 200,
+    110, 177, 104, 103, 141, 253, 255, 50, 77, 101, 81, 18, 45, 96, 31, 222,
+    25, 107, 190, 70, 86, 237, 240, 34, 72, 242, 20, 214, 244, 227, 149, 235,
+    97, 234, 57, 22, 60, 250, 82, 175, 208, 5, 127, 199, 111, 62, 135, 248,
+    174, 169, 211, 58, 66, 154, 106, 195, 245, 171, 17, 187, 182, 179, 0, 243,
+    132, 56, 148, 75, 128, 133, 158, 100, 130, 126, 91, 13, 153, 246, 216, 219,
+    119, 68, 223, 78, 83, 88, 201, 99, 122, 11, 92, 32, 136, 114, 52, 10,
+    138, 30, 48, 183, 156, 35, 61, 26, 143, 74, 251, 94, 129, 162, 63, 152,
+    170, 7, 115, 167, 241, 206, 3, 150, 55, 59, 151, 220, 90, 53, 23, 131,
+    125, 173, 15, 238, 79, 95, 89, 16, 105, 137, 225, 224, 217, 160, 37, 123,
+    118, 73, 2, 157, 46, 116, 9, 145, 134, 228, 207, 212, 202, 215, 69, 229,
+    27, 188, 67, 124, 168, 252, 42, 4, 29, 108, 21, 247, 19, 205, 39, 203,
+    233, 40, 186, 147, 198, 192, 155, 33, 164, 191, 98, 204, 165, 180, 117, 76,
+    140, 36, 210, 172, 41, 54, 159, 8, 185, 232, 113, 196, 231, 47, 146, 120,
+    51, 65, 28, 144, 254, 221, 93, 189, 194, 139, 112, 43, 71, 109, 184, 209,
+)
+
+_TOPVAL = (
+    1, 2, 3, 5, 7, 11, 17, 25, 38, 57,
+    86, 129, 194, 291, 437, 656, 854, 1110, 1443, 1876,
+    2439, 3171, 3475, 3823, 4205, 4626, 5088, 5597, 6157, 6772,
+    7450, 8195, 9014, 9916, 10907, 11998, 13198, 14518, 15970, 17567,
+    19323, 21256, 23382, 25720, 28292, 31121, 34233, 37656, 41422, 45564,
+    50121, 55133, 60646, 66711, 73382, 80721, 88793, 97672, 107439, 118183,
+    130002, 143002, 157302, 173032, 190335, 209369, 230306, 253337, 278670, 306538,
+    337191, 370911, 408002, 448802, 493682, 543050, 597356, 657091, 722800, 795081,
+    874589, 962048, 1058252, 1164078, 1280486, 1408534, 1549388, 1704327, 1874759, 2062236,
+    2268459, 2495305, 2744836, 3019320, 3321252, 3653374, 4018711, 4420582, 4862641, 5348905,
+    5883796, 6472176, 7119394, 7831333, 8614467, 9475909, 10423501, 11465851, 12612437, 13873681,
+    15261050, 16787154, 18465870, 20312458, 22343706, 24578077, 27035886, 29739474, 32713425, 35984770,
+    39583245, 43541573, 47895730, 52685306, 57953837, 63749221, 70124148, 77136564, 84850228, 93335252,
+    102668779, 112935659, 124229227, 136652151, 150317384, 165349128, 181884040, 200072456, 220079703, 242087671,
+    266296456, 292926096, 322218735, 354440623, 389884688, 428873168, 471760495, 518936559, 570830240, 627913311,
+    690704607, 759775136, 835752671, 919327967, 1011260767, 1112386880, 1223623232, 1345985727, 1480584256, 1628642751,
+    1791507135, 1970657856, 2167723648, 2384496256, 2622945920, 2885240448, 3173764736, 3491141248, 3840255616, 4224281216,
+)
+
+
+MIN_DATA_LENGTH = 50
+CODE_SIZE = 32
+DIGEST_BYTES = 3 + CODE_SIZE
+# Distancia máxima por defecto para considerar dos muestras de la misma familia
+DEFAULT_THRESHOLD = 70
+# Bandas LSH: 16 grupos de 8 cubetas (2 bytes del código) cada uno
+BANDS = 16
+BAND_BYTES = CODE_SIZE // BANDS
+# Digests nuevos que se acumulan sin ordenar antes de reconstruir el índice:
+# como mínimo esta cantidad y como máximo un octavo de las muestras indexadas
+DELTA_MIN_ROWS = 4096
+
+_TABLE = np.array(_PEARSON, dtype=np.uint8)
+_LIMITS = np.array(_TOPVAL, dtype=np.uint64)
+# Sales de los seis tripletes de la ventana de 5 bytes: (sal, j, k) sobre w0, w[j], w[k]
+_TRIPLETS = ((2, 1, 2), (3, 1, 3), (5, 2, 3), (7, 2, 4), (11, 1, 4), (13, 3, 4))
+
+def _pair_tables() -> List[np.ndarray]:
+    """Resuelve los dos primeros pasos de Pearson de cada triplete en tablas de 65536 entradas"""
+    pares = np.arange(65536, dtype=np.uint32)
+    w0, wj = (pares >> 8).astype(np.uint8), (pares & 0xFF).astype(np.uint8)
+    return [_TABLE[_TABLE[_TABLE[sal] ^ w0] ^ wj] for sal, _, _ in _TRIPLETS]
+
+_PAIR_TABLES = _pair_tables()
+
+def _diff_table() -> np.ndarray:
+    """Distancia entre dos bytes del código: suma por pares de bits (0, 1, 2 o 6)"""
+    valores = np.arange(256)
+    distancia = np.zeros((256, 256), dtype=np.uint8)
+    for desplazamiento in range(0, 8, 2):
+        a = (valores[:, None] >> desplazamiento) & 3
+        b = (valores[None, :] >> desplazamiento) & 3
+        d = np.abs(a - b)
+        distancia += np.where(d == 3, 6, d).astype(np.uint8)
+    return distancia
+
+_CODE_DIFF = _diff_table()
+
+def _swap(byte: int) -> int:
+    return ((byte & 0x0F) << 4) | (byte >> 4)
+
+class TLSHDigest:
+    """Consumidor de HashEngine que calcula el digest TLSH de un archivo"""
+
+    def __init__(self, native: Optional[bool] = None):
+        """
+        Args:
+            native: Usar py-tlsh (por defecto si está instalado)
+        """
+        self.native = tlsh is not None if native is None else native
+        self.size = 0
+        self._tlsh = tlsh.Tlsh() if self.native else None
+        self.buckets = np.zeros(256, dtype=np.int64)
+        self._window = np.empty(0, dtype=np.uint8)
+
+    def update(self, chunk):
+        """Agrega un bloque del archivo"""
+        if not len(chunk):
+            return
+        self.size += len(chunk)
+        if self._tlsh is not None:
+            # py-tlsh solo acepta objetos bytes
+            self._tlsh.update(chunk if isinstance(chunk, bytes) else bytes(chunk))
+            return
+
+        datos = np.frombuffer(chunk, dtype=np.uint8)
+        if len(self._window):
+            datos = np.concatenate([self._window, datos])
+        self._window = datos[-4:].copy()
+        if len(datos) < 5:
+            return
+        # w[d] es el byte d posiciones antes del actual en la ventana deslizante
+        w = [datos[4 - d:len(datos) - d] for d in range(5)]
+        w0 = w[0].astype(np.intp) << 8
+        pares = {j: w0 | w[j] for j in (1, 2, 3)}
+        # Último paso de Pearson sin aplicar: se aplica después permutando el histograma
+        x = np.empty((len(_TRIPLETS), len(w0)), dtype=np.uint8)
+        for fila, ((_, j, k), tabla) in zip(x, zip(_TRIPLETS, _PAIR_TABLES)):
+            np.take(tabla, pares[j], out=fila)
+            fila ^= w[k]
+        # Se cuentan los valores por pares (6n bytes siempre es par) y se pliegan
+        pares_x = np.bincount(x.reshape(-1).view(np.uint16), minlength=65536).reshape(256, 256)
+        self.buckets[_TABLE] += pares_x.sum(axis=0) + pares_x.sum(axis=1)
+
+    def hexdigest(self) -> Optional[str]:
+        """
+        Digest TLSH ("T1" + 70 hexadecimales) o None si el archivo es demasiado
+        corto o uniforme para tener uno
+        """
+        if self._tlsh is not None:
+            try:
+                self._tlsh.final()
+                digest = self._tlsh.hexdigest()
+            except ValueError:  # Datos demasiado cortos o sin variación suficiente
+                return None
+            if not digest or digest == "TNULL":
+                return None
+            return digest[:2] + "00" + digest[4:]
+
+        if self.size < MIN_DATA_LENGTH:
+            return None
+        cubetas = self.buckets[:CODE_SIZE * 4]
+        ordenadas = np.sort(cubetas)
+        q1, q2, q3 = (int(ordenadas[i]) for i in (31, 63, 95))
+        if q3 == 0 or np.count_nonzero(cubetas) <= CODE_SIZE * 2:
+            return None
+
+        cuartil = ((cubetas > q1).astype(np.uint8) + (cubetas > q2) + (cubetas > q3)).reshape(CODE_SIZE, 4)
+        codigo = (cuartil << np.array([0, 2, 4, 6], dtype=np.uint8)).sum(axis=1).astype(np.uint8)
+        lvalue = int(np.searchsorted(_LIMITS, min(self.size, int(_LIMITS[-1])), side='left'))
+        qb = ((q1 * 100 // q3) % 16) | (((q2 * 100 // q3) % 16) << 4)
+        cabecera = bytes([0, _swap(lvalue), _swap(qb)])
+        return "T1" + (cabecera + codigo[::-1].tobytes()).hex().upper()
+
+def tlsh_file(file_path: str, hash_engine: Optional[HashEngine] = None) -> Optional[str]:
+    """Calcula el digest TLSH de un archivo"""
+    digest = TLSHDigest()
+    (hash_engine or HashEngine(["md5"])).hash_file(file_path, [digest])
+    return digest.hexdigest()
+
+def _parse(digests: Iterable[str]) -> np.ndarray:
+    """Convierte digests "T1..." en filas de 35 bytes (checksum, L, Q y código)"""
+    filas = [bytes.fromhex(d[2:] if d[:2].upper() == "T1" else d) for d in digests]
+    if any(len(fila) != DIGEST_BYTES for fila in filas):
+        raise ValueError("Digest TLSH inválido")
+    return np.frombuffer(b"".join(filas), dtype=np.uint8).reshape(-1, DIGEST_BYTES)
+
+def _mod_diff(x: np.ndarray, y: int, rango: int) -> np.ndarray:
+    d = np.abs(x.astype(np.int32) - y)
+    return np.minimum(d, rango - d)
+
+def _swap_array(columna: np.ndarray) -> np.ndarray:
+    return ((columna & 0x0F) << 4) | (columna >> 4)
+
+def _distances(filas: np.ndarray, consulta: np.ndarray) -> np.ndarray:
+    """Distancia TLSH (con longitud) de cada fila a la consulta, vectorizada"""
+    lvalue, qb = _swap_array(filas[:, 1]), _swap_array(filas[:, 2])
+    c_lvalue, c_qb = _swap(int(consulta[1])), _swap(int(consulta[2]))
+
+    ldiff = _mod_diff(lvalue, c_lvalue, 256)
+    distancia = np.where(ldiff <= 1, ldiff, ldiff * 12)
+    for q, c_q in ((qb & 0x0F, c_qb & 0x0F), (qb >> 4, c_qb >> 4)):
+        qdiff = _mod_diff(q, c_q, 16)
+        distancia += np.where(qdiff <= 1, qdiff, (qdiff - 1) * 12)
+    distancia += filas[:, 0] != consulta[0]
+    distancia += _CODE_DIFF[filas[:, 3:], consulta[None, 3:]].sum(axis=1, dtype=np.int32)
+    return distancia
+
+def tlsh_distance(a: str, b: str) -> int:
+    """Distancia TLSH entre dos digests (0 = idénticos; < 70 suele indicar la misma familia)"""
+    filas = _parse([a, b])
+    return int(_distances(filas[:1], filas[1])[0])
+
+def _band_keys(filas: np.ndarray) -> np.ndarray:
+    """Claves LSH de cada fila: banda en los 16 bits altos y 2 bytes del código en los bajos"""
+    codigo = filas[:, 3:].reshape(len(filas), BANDS, BAND_BYTES).astype(np.uint32)
+    valores = (codigo[:, :, 0] << 8) | codigo[:, :, 1]
+    return (np.arange(BANDS, dtype=np.uint32) << 16) | valores
+
+class FuzzyHashIndex:
+    """
+    Índice persistente de digests TLSH con búsqueda de vecinos por LSH
+
+    Cada digest se guarda como fila de 35 bytes y se reparte en 16 bandas de
+    8 cubetas. Dos muestras parecidas comparten casi siempre alguna banda
+    completa, así que una consulta solo calcula la distancia exacta con las
+    muestras de sus bandas, que se buscan por búsqueda binaria en un arreglo
+    de claves ordenado y mapeado en memoria.
+
+    Los digests agregados van primero a un segmento delta sin ordenar, que
+    las consultas recorren completo, y se integran en el índice ordenado
+    cuando el delta crece; así cada agregado cuesta en proporción a lo que
+    agrega y no al tamaño del índice.
+    """
+
+    def __init__(self, index_dir: Optional[str] = None):
+        """
+        Args:
+            index_dir: Directorio del índice (por defecto analysis.fuzzy_index_dir)
+        """
+        self.index_dir = Path(index_dir or Config().get("analysis.fuzzy_index_dir", "data/fuzzy_index"))
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+        self.meta_path = self.index_dir / "index.json"
+        self.meta = {'version': 0, 'labels': [], 'delta_rows': 0}
+        if self.meta_path.exists():
+            with open(self.meta_path) as f:
+                self.meta.update(json.load(f))
+        self._label_ids = {label: i for i, label in enumerate(self.meta['labels'])}
+        # Filas del delta como bytes, creado en el primer agregado y mantenido después
+        self._delta_set: Optional[set] = None
+        self._open()
+
+    def _path(self, nombre: str) -> Path:
+        return self.index_dir / nombre
+
+    def _load(self, nombre: str, dtype, columnas: int = 0, filas: Optional[int] = None) -> np.ndarray:
+        ruta = self._path(nombre)
+        forma = (-1, columnas) if columnas else (-1,)
+        if not ruta.exists() or not ruta.stat().st_size or filas == 0:
+            return np.empty((0, columnas) if columnas else 0, dtype=dtype)
+        arreglo = np.memmap(ruta, dtype=dtype, mode='r').reshape(forma)
+        return arreglo if filas is None else arreglo[:filas]
+
+    def _open(self):
+        self.digests = self._load("digests.bin", np.uint8, DIGEST_BYTES)
+        self.labels = self._load("labels.bin", '<u4')
+        self.keys = self._load("bands.keys", '<u4')
+        self.rows = self._load("bands.rows", '<u4')
+        # Solo cuentan las filas del delta confirmadas en index.json (una escritura
+        # interrumpida deja filas de más al final, que se ignoran y se sobrescriben)
+        filas = self.meta['delta_rows']
+        self.delta = self._load("delta.bin", np.uint8, DIGEST_BYTES, filas)
+        self.delta_labels = self._load("delta_labels.bin", '<u4', filas=filas)
+
+    @property
+    def version(self) -> int:
+        """Versión del índice, incrementada en cada actualización"""
+        return self.meta['version']
+
+    def __len__(self) -> int:
+        return len(self.digests) + len(self.delta)
+
+    def _label_id(self, label: str) -> int:
+        if label not in self._label_ids:
+            self._label_ids[label] = len(self.meta['labels'])
+            self.meta['labels'].append(label)
+        return self._label_ids[label]
+
+    def _indexed(self, filas: np.ndarray) -> np.ndarray:
+        """Qué filas están ya en el índice ordenado, buscando sus claves de la banda 0"""
+        presentes = np.zeros(len(filas), dtype=bool)
+        if not len(self.digests):
+            return presentes
+        claves = _band_keys(filas)[:, 0]
+        inicios = np.searchsorted(self.keys, claves, side='left')
+        fines = np.searchsorted(self.keys, claves, side='right')
+        for i, (inicio, fin) in enumerate(zip(inicios, fines)):
+            if fin > inicio:
+                presentes[i] = (self.digests[self.rows[inicio:fin]] == filas[i]).all(axis=1).any()
+        return presentes
+
+    def _write_meta(self):
+        temporal = self.meta_path.with_suffix('.json.tmp')
+        with open(temporal, 'w') as f:
+            json.dump(self.meta, f)
+        os.replace(temporal, self.meta_path)
+
+    def add(self, entries: Iterable[Tuple[str, str]]) -> int:
+        """
+        Agrega digests al índice
+
+        Los digests ya presentes conservan su etiqueta original.
+
+        Args:
+            entries: Pares (digest TLSH, etiqueta)
+
+        Returns:
+            int: Número de digests nuevos
+        """
+        nuevos: Dict[bytes, int] = {}
+        for digest, label in entries:
+            try:
+                fila = _parse([digest])[0].tobytes()
+            except ValueError:
+                continue
+            if fila not in nuevos:
+                nuevos[fila] = self._label_id(label)
+        if not nuevos:
+            return 0
+
+        filas = np.frombuffer(b"".join(nuevos), dtype=np.uint8).reshape(-1, DIGEST_BYTES)
+        labels = np.fromiter(nuevos.values(), dtype='<u4', count=len(nuevos))
+        # Se descartan los ya indexados (búsqueda binaria) y los que están en el delta
+        if self._delta_set is None:
+            self._delta_set = {fila.tobytes() for fila in self.delta}
+        mantener = ~self._indexed(filas) & np.fromiter((fila not in self._delta_set for fila in nuevos),
+                                                       dtype=bool, count=len(filas))
+        filas, labels = filas[mantener], labels[mantener]
+        if not len(filas):
+            return 0
+
+        filas_delta = self.meta['delta_rows']
+        self.close()
+        for nombre, arreglo, tamano in (("delta.bin", filas, DIGEST_BYTES), ("delta_labels.bin", labels, 4)):
+            with open(self._path(nombre), 'ab') as f:
+                f.truncate(filas_delta * tamano)
+                arreglo.tofile(f)
+        self._delta_set.update(fila.tobytes() for fila in filas)
+        self.meta['delta_rows'] = filas_delta + len(filas)
+        self.meta['version'] += 1
+        self._write_meta()
+        self._open()
+
+        if len(self.delta) > max(DELTA_MIN_ROWS, len(self.digests) // 8):
+            self.merge()
+        return len(filas)
+
+    def merge(self):
+        """Integra el segmento delta en el índice ordenado"""
+        if not len(self.delta):
+            return
+        digests = np.concatenate([self.digests, self.delta])
+        labels = np.concatenate([self.labels, self.delta_labels])
+        claves = _band_keys(digests).ravel()
+        orden = np.argsort(claves, kind='stable')
+        # Cada fila aporta BANDS claves consecutivas
+        filas_claves = (orden // BANDS).astype('<u4')
+
+        self.close()
+        for nombre, arreglo in (("digests.bin", digests), ("labels.bin", labels),
+                                ("bands.keys", claves[orden].astype('<u4')), ("bands.rows", filas_claves)):
+            temporal = self._path(nombre + ".tmp")
+            arreglo.tofile(temporal)
+            os.replace(temporal, self._path(nombre))
+
+        self.meta['delta_rows'] = 0
+        self._delta_set = set()
+        self._write_meta()
+        for nombre in ("delta.bin", "delta_labels.bin"):
+            self._path(nombre).unlink(missing_ok=True)
+        self._open()
+
+    def query(self, digest: str, threshold: int = DEFAULT_THRESHOLD, limit: int = 5) -> List[Dict[str, Any]]:
+        """
+        Busca las muestras conocidas más parecidas a un digest
+
+        Args:
+            digest: Digest TLSH de la muestra
+            threshold: Distancia máxima
+            limit: Número máximo de resultados
+
+        Returns:
+            List[Dict[str, Any]]: label, tlsh y distance de cada muestra, de la más cercana a la más lejana
+        """
+        if not len(self) or not digest:
+            return []
+        consulta = _parse([digest])
+        claves = _band_keys(consulta)[0]
+        inicios = np.searchsorted(self.keys, claves, side='left')
+        fines = np.searchsorted(self.keys, claves, side='right')
+        candidatas = np.unique(np.concatenate([self.rows[a:b] for a, b in zip(inicios, fines)]))
+        filas = np.concatenate([self.digests[candidatas], self.delta])
+        labels = np.concatenate([self.labels[candidatas], self.delta_labels])
+        if not len(filas):
+            return []
+
+        distancias = _distances(filas, consulta[0])
+        cercanas = np.flatnonzero(distancias <= threshold)
+        cercanas = cercanas[np.argsort(distancias[cercanas], kind='stable')][:limit]
+        return [{'label': self.meta['labels'][int(labels[i])],
+                 'tlsh': "T1" + filas[i].tobytes().hex().upper(),
+                 'distance': int(distancias[i])}
+                for i in cercanas]
+
+    def close(self):
+        self.digests = self.labels = self.keys = self.rows = self.delta = self.delta_labels = None
+
+def main():
+    parser = argparse.ArgumentParser(description='Índice de similitud TLSH de muestras de malware')
+    parser.add_argument('--indice', help='Directorio del índice')
+    subparsers = parser.add_subparsers(dest='comando', required=True)
+
+    agregar = subparsers.add_parser('agregar', help='Agrega muestras (archivos o directorios) al índice')
+    agregar.add_argument('etiqueta', help='Familia o etiqueta de las muestras')
+    agregar.add_argument('rutas', nargs='+', help='Archivos o directorios de muestras')
+
+    buscar = subparsers.add_parser('buscar', help='Busca las muestras conocidas más parecidas')
+    buscar.add_argument('archivos', nargs='+', help='Archivos a consultar')
+    buscar.add_argument('--umbral', type=int, default=DEFAULT_THRESHOLD, help='Distancia máxima')
+
+    args = parser.parse_args()
+    indice = FuzzyHashIndex(args.indice)
+    engine = HashEngine(["md5"])
+
+    if args.comando == 'agregar':
+        def digests():
+            walker = DirectoryWalker()
+            for ruta in args.rutas:
+                archivos = [r.path for r in walker.walk(ruta)] if os.path.isdir(ruta) else [ruta]
+                for archivo in archivos:
+                    digest = tlsh_file(archivo, engine)
+                    if digest:
+                        yield digest, args.etiqueta
+        nuevos = indice.add(digests())
+        logger.info(f"{nuevos} digests nuevos; índice con {len(indice)} muestras (versión {indice.version})")
+    else:
+        for archivo in args.archivos:
+            digest = tlsh_file(archivo, engine)
+            print(json.dumps({'archivo': archivo, 'tlsh': digest,
+                              'similares': indice.query(digest, args.umbral) if digest else []},
+                             ensure_ascii=False))
+    indice.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,401 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Índice de reputación de hashes
+Este módulo mantiene millones de hashes maliciosos conocidos (md5, sha1 y
+sha256) en archivos binarios ordenados que se mapean en memoria y se consultan
+por búsqueda binaria, con un filtro de Bloom en memoria delante para descartar
+casi todos los hashes limpios sin tocar el disco.
+"""
+
+import os
+import csv
+import json
+import math
+import mmap
+import shutil
+import argparse
+import tempfile
+from array import array
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+from loguru import logger
+
+from scripts.utilidades.common import Config
+
+# Longitud en bytes del digest de cada algoritmo
+DIGEST_BYTES = {'md5': 16, 'sha1': 20, 'sha256': 32}
+HEX_ALGORITHMS = {size * 2: algorithm for algorithm, size in DIGEST_BYTES.items()}
+MASK64 = (1 << 64) - 1
+
+def _hash_pairs(digests: np.ndarray, size: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Obtiene los dos enteros de 64 bits usados por el filtro de Bloom"""
+    dtype = np.dtype({'names': ['h1', 'h2'], 'formats': ['<u8', '<u8'],
+                      'offsets': [0, 8], 'itemsize': size})
+    pares = np.frombuffer(digests, dtype=dtype)
+    return pares['h1'], pares['h2'] | np.uint64(1)
+
+class BloomFilter:
+    """Filtro de Bloom sobre digests criptográficos (sus bytes ya son uniformes)"""
+
+    def __init__(self, bits: np.ndarray, m: int, k: int):
+        self.bits = bits
+        self.m = m
+        self.k = k
+
+    @classmethod
+    def for_capacity(cls, capacity: int, fp_rate: float = 0.01) -> "BloomFilter":
+        """Crea un filtro vacío dimensionado para la capacidad y tasa de falsos positivos"""
+        capacity = max(capacity, 1)
+        m = max(64, int(math.ceil(-capacity * math.log(fp_rate) / (math.log(2) ** 2))))
+        k = max(1, int(round(m / capacity * math.log(2))))
+        return cls(np.zeros((m + 7) // 8, dtype=np.uint8), m, k)
+
+    def add_many(self, digests: np.ndarray, size: int):
+        """Agrega un bloque de digests de forma vectorizada"""
+        h1, h2 = _hash_pairs(digests, size)
+        m = np.uint64(self.m)
+        with np.errstate(over='ignore'):
+            for i in range(self.k):
+                pos = (h1 + np.uint64(i) * h2) % m
+                np.bitwise_or.at(self.bits, pos >> np.uint64(3),
+                                 np.left_shift(1, (pos & np.uint64(7)).astype(np.uint8)).astype(np.uint8))
+
+    def __contains__(self, digest: bytes) -> bool:
+        h1 = int.from_bytes(digest[0:8], 'little')
+        h2 = int.from_bytes(digest[8:16], 'little') | 1
+        bits = self.bits
+        for i in range(self.k):
+            pos = ((h1 + i * h2) & MASK64) % self.m
+            if not bits[pos >> 3] & (1 << (pos & 7)):
+                return False
+        return True
+
+class _DigestTable:
+    """Digests ordenados de un algoritmo y sus etiquetas, mapeados en memoria"""
+
+    def __init__(self, directory: Path, algorithm: str, bloom: Optional[Dict] = None):
+        self.algorithm = algorithm
+        self.size = DIGEST_BYTES[algorithm]
+        self.digests_path = directory / f"{algorithm}.digests"
+        self.labels_path = directory / f"{algorithm}.labels"
+        self.bloom_path = directory / f"{algorithm}.bloom"
+        self._maps = []
+        self.count = 0
+        self.digests = np.empty(0, dtype=f'S{self.size}')
+        self.labels = np.empty(0, dtype='<u4')
+        self._raw = b""
+        self.bloom = None
+
+        if self.digests_path.exists() and self.digests_path.stat().st_size:
+            self._raw = self._map(self.digests_path)
+            self.digests = np.frombuffer(self._raw, dtype=f'S{self.size}')
+            self.labels = np.frombuffer(self._map(self.labels_path), dtype='<u4')
+            self.count = len(self.digests)
+            if bloom and self.bloom_path.exists():
+                bits = np.fromfile(self.bloom_path, dtype=np.uint8)
+                self.bloom = BloomFilter(bits, bloom['m'], bloom['k'])
+
+    def _map(self, path: Path) -> mmap.mmap:
+        with open(path, 'rb') as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._maps.append(mapped)
+        return mapped
+
+    def close(self):
+        self.digests = self.labels = self.bloom = None
+        self._raw = b""
+        for mapped in self._maps:
+            try:
+                mapped.close()
+            except BufferError:
+                # Aún hay vistas vivas; el mapeo se libera con ellas
+                pass
+        self._maps = []
+
+    def find(self, digest: bytes) -> Optional[int]:
+        """Devuelve el identificador de etiqueta de un digest o None"""
+        if not self.count:
+            return None
+        if self.bloom is not None and digest not in self.bloom:
+            return None
+        i = int(np.searchsorted(self.digests, digest))
+        if i < self.count and self._raw[i * self.size:(i + 1) * self.size] == digest:
+            return int(self.labels[i])
+        return None
+
+class HashReputationIndex:
+    """Índice persistente de hashes maliciosos con filtro de Bloom en memoria"""
+
+    def __init__(self, index_dir: Optional[str] = None, fp_rate: float = 0.01,
+                 chunk_size: int = 2_000_000):
+        """
+        Args:
+            index_dir: Directorio del índice (por defecto analysis.hash_index_dir)
+            fp_rate: Tasa de falsos positivos del filtro de Bloom
+            chunk_size: Hashes acumulados en memoria antes de volcarlos ordenados a un tramo temporal
+        """
+        self.index_dir = Path(index_dir or Config().get("analysis.hash_index_dir", "data/hash_index"))
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+        self.meta_path = self.index_dir / "index.json"
+        self.fp_rate = fp_rate
+        self.chunk_size = chunk_size
+        self.meta = {'version': 0, 'labels': [], 'bloom': {}}
+        if self.meta_path.exists():
+            with open(self.meta_path) as f:
+                self.meta = json.load(f)
+        self._label_ids = {label: i for i, label in enumerate(self.meta['labels'])}
+        self.tables = {}
+        self._open_tables()
+
+    @property
+    def version(self) -> int:
+        """Versión del índice, incrementada en cada actualización"""
+        return self.meta['version']
+
+    def _open_tables(self):
+        for table in self.tables.values():
+            table.close()
+        self.tables = {
+            algorithm: _DigestTable(self.index_dir, algorithm, self.meta['bloom'].get(algorithm))
+            for algorithm in DIGEST_BYTES
+        }
+
+    def __len__(self) -> int:
+        return sum(table.count for table in self.tables.values())
+
+    def lookup(self, digest_hex: str) -> Optional[str]:
+        """
+        Consulta la reputación de un hash
+
+        Args:
+            digest_hex: Hash md5, sha1 o sha256 en hexadecimal
+
+        Returns:
+            Optional[str]: Etiqueta del hash si es conocido
+        """
+        algorithm = HEX_ALGORITHMS.get(len(digest_hex))
+        if algorithm is None:
+            return None
+        try:
+            digest = bytes.fromhex(digest_hex)
+        except ValueError:
+            return None
+        label_id = self.tables[algorithm].find(digest)
+        return self.meta['labels'][label_id] if label_id is not None else None
+
+    def __contains__(self, digest_hex: str) -> bool:
+        return self.lookup(digest_hex) is not None
+
+    def _label_id(self, label: str) -> int:
+        if label not in self._label_ids:
+            self._label_ids[label] = len(self.meta['labels'])
+            self.meta['labels'].append(label)
+        return self._label_ids[label]
+
+    def add(self, entries: Iterable[Tuple[str, str]]) -> int:
+        """
+        Agrega hashes al índice de forma incremental
+
+        Los hashes se acumulan en buffers compactos; cada chunk_size se ordenan
+        y se vuelcan a un tramo temporal, y al final los tramos se mezclan una
+        sola vez con el índice existente. Los hashes ya presentes conservan su
+        etiqueta original.
+
+        Args:
+            entries: Pares (hash hexadecimal, etiqueta)
+
+        Returns:
+            int: Número de hashes nuevos
+        """
+        pendientes = {algorithm: (bytearray(), array('I')) for algorithm in DIGEST_BYTES}
+        tramos: Dict[str, List[Tuple[np.ndarray, np.ndarray]]] = {algorithm: [] for algorithm in DIGEST_BYTES}
+        acumulados = 0
+        temporal = Path(tempfile.mkdtemp(prefix="tramos_", dir=self.index_dir))
+        try:
+            for digest_hex, label in entries:
+                algorithm = HEX_ALGORITHMS.get(len(digest_hex))
+                if algorithm is None:
+                    continue
+                try:
+                    digest = bytes.fromhex(digest_hex)
+                except ValueError:
+                    continue
+                digests, labels = pendientes[algorithm]
+                digests += digest
+                labels.append(self._label_id(label))
+                acumulados += 1
+                if acumulados >= self.chunk_size:
+                    for algorithm, (digests, labels) in pendientes.items():
+                        if digests:
+                            tramos[algorithm].append(self._spill(temporal, algorithm, len(tramos[algorithm]),
+                                                                 digests, labels))
+                    pendientes = {algorithm: (bytearray(), array('I')) for algorithm in DIGEST_BYTES}
+                    acumulados = 0
+
+            # El último bloque se mezcla directamente desde memoria
+            for algorithm, (digests, labels) in pendientes.items():
+                if digests:
+                    tramos[algorithm].append(self._sort_pending(algorithm, digests, labels))
+            return self._flush(tramos)
+        finally:
+            shutil.rmtree(temporal, ignore_errors=True)
+
+    @staticmethod
+    def _sort_pending(algorithm: str, digests: bytearray, labels: array) -> Tuple[np.ndarray, np.ndarray]:
+        """Ordena los hashes pendientes quedándose con la primera aparición de cada uno"""
+        ordenados, first = np.unique(np.frombuffer(digests, dtype=f'S{DIGEST_BYTES[algorithm]}'),
+                                     return_index=True)
+        return ordenados, np.frombuffer(labels, dtype=np.uint32)[first].astype('<u4')
+
+    def _spill(self, directory: Path, algorithm: str, n: int, digests: bytearray,
+               labels: array) -> Tuple[np.ndarray, np.ndarray]:
+        """Vuelca un bloque de hashes ordenado a un tramo temporal y lo devuelve mapeado"""
+        ordenados, etiquetas = self._sort_pending(algorithm, digests, labels)
+        base = directory / f"{algorithm}_{n:05d}"
+        ordenados.tofile(base.with_suffix('.digests'))
+        etiquetas.tofile(base.with_suffix('.labels'))
+        return (np.memmap(base.with_suffix('.digests'), dtype=ordenados.dtype, mode='r'),
+                np.memmap(base.with_suffix('.labels'), dtype='<u4', mode='r'))
+
+    def _flush(self, tramos: Dict[str, List[Tuple[np.ndarray, np.ndarray]]]) -> int:
+        """Mezcla los tramos de hashes nuevos con los archivos del índice"""
+        nuevos = 0
+        for algorithm, fuentes in tramos.items():
+            if not fuentes:
+                continue
+            table = self.tables[algorithm]
+            antes = table.count
+            total, bloom = self._merge(table, fuentes)
+            nuevos += total - antes
+
+            # Reemplazo atómico una vez liberadas las vistas del índice anterior
+            table.close()
+            os.replace(table.digests_path.with_suffix('.digests.tmp'), table.digests_path)
+            os.replace(table.labels_path.with_suffix('.labels.tmp'), table.labels_path)
+            bloom.bits.tofile(table.bloom_path)
+            self.meta['bloom'][algorithm] = {'m': bloom.m, 'k': bloom.k}
+
+        if nuevos:
+            self.meta['version'] += 1
+        self._save_meta()
+        self._open_tables()
+        return nuevos
+
+    def _merge(self, table: _DigestTable, tramos: List[Tuple[np.ndarray, np.ndarray]],
+               block: int = 1 << 20) -> Tuple[int, BloomFilter]:
+        """
+        Mezcla de k vías por bloques del índice existente con los tramos ordenados
+
+        En cada ronda se toma de cada fuente lo que no supera el menor de los
+        últimos hashes de sus bloques, así que los duplicados entre fuentes
+        coinciden en la misma ronda. Ante duplicados gana el índice existente
+        y después el tramo más antiguo.
+        """
+        tmp_digests = table.digests_path.with_suffix('.digests.tmp')
+        tmp_labels = table.labels_path.with_suffix('.labels.tmp')
+        fuentes = [(table.digests, table.labels)] + tramos
+        bloom = BloomFilter.for_capacity(sum(len(digests) for digests, _ in fuentes), self.fp_rate)
+        # La memoria de cada ronda no crece con el número de tramos
+        block = max(1 << 16, block // len(fuentes))
+        posiciones = [0] * len(fuentes)
+        total = 0
+
+        with open(tmp_digests, 'wb') as fd, open(tmp_labels, 'wb') as fl:
+            while True:
+                activas = [i for i, (digests, _) in enumerate(fuentes) if posiciones[i] < len(digests)]
+                if not activas:
+                    break
+                limite = min(fuentes[i][0][min(posiciones[i] + block, len(fuentes[i][0])) - 1] for i in activas)
+                partes_d, partes_l = [], []
+                for i in activas:
+                    digests, labels = fuentes[i]
+                    inicio = posiciones[i]
+                    fin = inicio + int(np.searchsorted(digests[inicio:inicio + block], limite, side='right'))
+                    partes_d.append(digests[inicio:fin])
+                    partes_l.append(labels[inicio:fin])
+                    posiciones[i] = fin
+                digests = np.concatenate(partes_d)
+                labels = np.concatenate(partes_l)
+                # Orden estable: ante duplicados se conserva la fuente de mayor prioridad
+                orden = np.argsort(digests, kind='stable')
+                digests, labels = digests[orden], labels[orden]
+                if len(digests) > 1:
+                    unicos = np.concatenate([[True], digests[1:] != digests[:-1]])
+                    digests, labels = digests[unicos], labels[unicos]
+                digests.tofile(fd)
+                labels.tofile(fl)
+                bloom.add_many(digests, table.size)
+                total += len(digests)
+
+        return total, bloom
+
+    def _save_meta(self):
+        temporal = self.meta_path.with_suffix('.json.tmp')
+        with open(temporal, 'w') as f:
+            json.dump(self.meta, f)
+        os.replace(temporal, self.meta_path)
+
+    @staticmethod
+    def parse_feed(feed_path: str, label: Optional[str] = None) -> Iterator[Tuple[str, str]]:
+        """
+        Lee un feed de hashes en CSV o lista plana
+
+        Cada línea aporta los campos con forma de hash md5/sha1/sha256; el
+        primer campo restante se usa como etiqueta si no se indica una.
+
+        Args:
+            feed_path: Ruta al feed
+            label: Etiqueta para todos los hashes del feed
+
+        Yields:
+            Tuple[str, str]: (hash hexadecimal en minúsculas, etiqueta)
+        """
+        etiqueta_defecto = label or Path(feed_path).stem
+        with open(feed_path, newline='', encoding='utf-8', errors='replace') as f:
+            for fila in csv.reader(f):
+                if not fila or fila[0].lstrip().startswith('#'):
+                    continue
+                campos = [campo.strip() for campo in fila]
+                if len(campos) == 1:
+                    campos = campos[0].split()
+                hashes, otros = [], []
+                for campo in campos:
+                    normalizado = campo.lower()
+                    if len(normalizado) in HEX_ALGORITHMS and all(c in '0123456789abcdef' for c in normalizado):
+                        hashes.append(normalizado)
+                    elif campo:
+                        otros.append(campo)
+                etiqueta = label or (otros[0] if otros else etiqueta_defecto)
+                for digest_hex in hashes:
+                    yield digest_hex, etiqueta
+
+    def import_feed(self, feed_path: str, label: Optional[str] = None) -> int:
+        """Importa un feed de hashes en CSV o lista plana"""
+        nuevos = self.add(self.parse_feed(feed_path, label))
+        logger.info(f"{nuevos} hashes nuevos importados desde {feed_path}")
+        return nuevos
+
+    def close(self):
+        for table in self.tables.values():
+            table.close()
+
+def main():
+    parser = argparse.ArgumentParser(description='Importador de feeds de hashes maliciosos')
+    parser.add_argument('feeds', nargs='+', help='Archivos CSV o listas de hashes')
+    parser.add_argument('--indice', help='Directorio del índice')
+    parser.add_argument('--etiqueta', help='Etiqueta para todos los hashes importados')
+
+    args = parser.parse_args()
+
+    indice = HashReputationIndex(args.indice)
+    for feed in args.feeds:
+        indice.import_feed(feed, args.etiqueta)
+    logger.info(f"Índice con {len(indice)} hashes (versión {indice.version})")
+    indice.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Recuento de las direcciones IP más frecuentes con memoria acotada
+Este módulo cuenta las apariciones de direcciones IP de un flujo de logs sin
+guardar cada aparición: el modo exacto empaqueta las IPv4 en enteros de 32
+bits y las IPv6 en 16 bytes y acumula los recuentos con NumPy por bloques;
+los modos aproximados (Space-Saving y Count-Min Sketch) usan memoria fija
+según el error admitido. Todos los contadores se pueden combinar, para
+procesar un archivo por rangos en paralelo.
+"""
+
+import math
+import heapq
+import socket
+from typing import Dict, List, Sequence, Tuple, Union
+
+import numpy as np
+
+IPKey = Union[int, bytes]
+
+# Claves de IPv6 en el espacio de 64 bits del sketch: el bit alto las separa de las IPv4
+_IPV6_FLAG = np.uint64(1 << 63)
+
+def pack_ipv4(addresses: Sequence[str]) -> Tuple[np.ndarray, int]:
+    """
+    Empaqueta IPv4 en notación decimal con puntos como enteros uint32
+
+    Las cadenas con algún octeto mayor que 255 no son direcciones y se descartan.
+
+    Returns:
+        Tuple[np.ndarray, int]: Direcciones empaquetadas y número de descartadas
+    """
+    if not addresses:
+        return np.zeros(0, dtype=np.uint32), 0
+    octetos = np.array(".".join(addresses).split("."), dtype=np.uint32).reshape(-1, 4)
+    validas = (octetos <= 255).all(axis=1)
+    octetos = octetos[validas]
+    claves = (octetos[:, 0] << 24) | (octetos[:, 1] << 16) | (octetos[:, 2] << 8) | octetos[:, 3]
+    return claves.astype(np.uint32), int(len(validas) - validas.sum())
+
+def pack_ipv6(addresses: Sequence[str]) -> Tuple[np.ndarray, int]:
+    """
+    Empaqueta IPv6 como valores de 16 bytes (orden de red) validándolas con inet_pton
+
+    Returns:
+        Tuple[np.ndarray, int]: Direcciones empaquetadas (dtype V16) y número de descartadas
+    """
+    empaquetadas = []
+    for address in addresses:
+        try:
+            empaquetadas.append(socket.inet_pton(socket.AF_INET6, address))
+        except OSError:
+            pass
+    datos = np.frombuffer(b"".join(empaquetadas), dtype="V16")
+    return datos, len(addresses) - len(empaquetadas)
+
+def format_ip(key: IPKey) -> str:
+    """Texto de una dirección empaquetada (entero IPv4 o 16 bytes IPv6)"""
+    if isinstance(key, bytes):
+        return socket.inet_ntop(socket.AF_INET6, key)
+    key = int(key)
+    return f"{key >> 24}.{(key >> 16) & 255}.{(key >> 8) & 255}.{key & 255}"
+
+def _ipv6_fingerprints(keys: np.ndarray) -> np.ndarray:
+    """Reduce direcciones IPv6 de 16 bytes a claves de 63 bits con el bit alto activado"""
+    partes = keys.view(">u8").reshape(-1, 2).astype(np.uint64)
+    mezcla = partes[:, 0] * np.uint64(0x9E3779B97F4A7C15) ^ partes[:, 1]
+    return mezcla | _IPV6_FLAG
+
+class ExactCounter:
+    """
+    Recuento exacto con claves empaquetadas
+
+    Los bloques de claves se acumulan y se combinan con np.unique cuando el
+    pendiente supera a las claves ya distintas, así que la memoria depende
+    del número de direcciones distintas (4 u 16 bytes más 8 del recuento
+    cada una) y no del número de apariciones.
+    """
+
+    def __init__(self):
+        self._keys = {np.dtype(np.uint32): np.zeros(0, dtype=np.uint32),
+                      np.dtype("V16"): np.zeros(0, dtype="V16")}
+        self._counts = {dtype: np.zeros(0, dtype=np.int64) for dtype in self._keys}
+        self._pending: Dict[np.dtype, List[Tuple[np.ndarray, np.ndarray]]] = {dtype: [] for dtype in self._keys}
+        self._pending_size = {dtype: 0 for dtype in self._keys}
+        self.total = 0
+
+    def add(self, keys: np.ndarray, counts: np.ndarray = None):
+        """Suma apariciones de claves uint32 (IPv4) o V16 (IPv6), con recuentos opcionales"""
+        if not len(keys):
+            return
+        dtype = keys.dtype
+        if counts is None:
+            counts = np.ones(len(keys), dtype=np.int64)
+        self._pending[dtype].append((keys, counts))
+        self._pending_size[dtype] += len(keys)
+        self.total += int(counts.sum())
+        if self._pending_size[dtype] > max(len(self._keys[dtype]), 1 << 20):
+            self._compact(dtype)
+
+    def _compact(self, dtype: np.dtype):
+        if not self._pending[dtype]:
+            return
+        claves = np.concatenate([self._keys[dtype]] + [k for k, _ in self._pending[dtype]])
+        recuentos = np.concatenate([self._counts[dtype]] + [c for _, c in self._pending[dtype]])
+        self._keys[dtype], inversa = np.unique(claves, return_inverse=True)
+        self._counts[dtype] = np.bincount(inversa.ravel(), weights=recuentos,
+                                          minlength=len(self._keys[dtype])).astype(np.int64)
+        self._pending[dtype] = []
+        self._pending_size[dtype] = 0
+
+    def merge(self, other: "ExactCounter"):
+        """Combina los recuentos de otro contador"""
+        for dtype in self._keys:
+            other._compact(dtype)
+            self.add(other._keys[dtype], other._counts[dtype])
+
+    def __len__(self) -> int:
+        for dtype in self._keys:
+            self._compact(dtype)
+        return sum(len(claves) for claves in self._keys.values())
+
+    def most_common(self, k: int) -> List[Tuple[IPKey, int, int]]:
+        """
+        Las k direcciones más frecuentes
+
+        Returns:
+            List[Tuple[IPKey, int, int]]: (clave, recuento, error), con error siempre 0
+        """
+        candidatos = []
+        for dtype in self._keys:
+            self._compact(dtype)
+            claves, recuentos = self._keys[dtype], self._counts[dtype]
+            if len(claves) > k:
+                seleccion = np.argpartition(-recuentos, k - 1)[:k]
+                claves, recuentos = claves[seleccion], recuentos[seleccion]
+            candidatos.extend((c.tobytes() if dtype.kind == "V" else int(c), int(n))
+                              for c, n in zip(claves, recuentos))
+        # A igual recuento, orden por dirección (las IPv4 antes) para que el resultado sea estable
+        candidatos.sort(key=lambda item: (-item[1], isinstance(item[0], bytes), item[0]))
+        return [(clave, n, 0) for clave, n in candidatos[:k]]
+
+class SpaceSaving:
+    """
+    Algoritmo Space-Saving (Metwally et al.) con capacity contadores
+
+    Cada recuento sobreestima el real como mucho en total / capacity, y toda
+    clave con más apariciones que ese límite está entre los contadores. Las
+    actualizaciones se agregan por bloque con np.unique y se aplican con
+    peso; el contador mínimo se localiza con un heap perezoso.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._counts: Dict[IPKey, int] = {}
+        self._errors: Dict[IPKey, int] = {}
+        self._heap: List[Tuple[int, int, IPKey]] = []
+        self._seq = 0
+        self.total = 0
+
+    def _pop_min(self) -> Tuple[IPKey, int]:
+        """Saca la clave de menor recuento, corrigiendo entradas del heap desactualizadas"""
+        while True:
+            recuento, _, clave = heapq.heappop(self._heap)
+            actual = self._counts[clave]
+            if actual == recuento:
+                return clave, recuento
+            self._seq += 1
+            heapq.heappush(self._heap, (actual, self._seq, clave))
+
+    def update(self, counts: Dict[IPKey, int]):
+        """Suma las apariciones agregadas de un bloque"""
+        for clave, n in counts.items():
+            self.total += n
+            if clave in self._counts:
+                self._counts[clave] += n
+                continue
+            error = 0
+            if len(self._counts) >= self.capacity:
+                expulsada, error = self._pop_min()
+                del self._counts[expulsada]
+                del self._errors[expulsada]
+            self._counts[clave] = error + n
+            self._errors[clave] = error
+            self._seq += 1
+            heapq.heappush(self._heap, (error + n, self._seq, clave))
+
+    def add(self, keys: np.ndarray):
+        """Suma apariciones de claves uint32 (IPv4) o V16 (IPv6)"""
+        if len(keys):
+            unicas, recuentos = np.unique(keys, return_counts=True)
+            self.update(dict(zip(unicas.tolist(), recuentos.tolist())))
+
+    def _floor(self) -> int:
+        """Recuento máximo de una clave ausente: el mínimo si el resumen está lleno, si no 0"""
+        return min(self._counts.values()) if len(self._counts) >= self.capacity else 0
+
+    def merge(self, other: "SpaceSaving"):
+        """
+        Combina otro resumen (Agarwal et al.): a la clave ausente en uno de los
+        dos se le suma el mínimo de ese resumen, como recuento y como error, y
+        se conservan los capacity mayores
+        """
+        minimo, minimo_otro = self._floor(), other._floor()
+        for clave in set(self._counts) | set(other._counts):
+            self._counts[clave] = self._counts.get(clave, minimo) + other._counts.get(clave, minimo_otro)
+            self._errors[clave] = self._errors.get(clave, minimo) + other._errors.get(clave, minimo_otro)
+        self.total += other.total
+        if len(self._counts) > self.capacity:
+            conservadas = heapq.nlargest(self.capacity, self._counts.items(), key=lambda item: item[1])
+            self._counts = dict(conservadas)
+            self._errors = {clave: self._errors[clave] for clave in self._counts}
+        self._heap = [(n, i, clave) for i, (clave, n) in enumerate(self._counts.items())]
+        heapq.heapify(self._heap)
+        self._seq = len(self._heap)
+
+    def most_common(self, k: int) -> List[Tuple[IPKey, int, int]]:
+        """(clave, recuento estimado, sobreestimación máxima) de las k mayores"""
+        mayores = heapq.nlargest(k, self._counts.items(), key=lambda item: item[1])
+        return [(clave, n, self._errors[clave]) for clave, n in mayores]
+
+class CountMinSketch:
+    """
+    Count-Min Sketch (Cormode y Muthukrishnan) con candidatos a top-k
+
+    Con anchura ceil(e / epsilon) y profundidad ceil(ln(1 / delta)) cada
+    estimación sobreestima el recuento real como mucho epsilon * total con
+    probabilidad 1 - delta. Las claves son enteros de 64 bits y los bloques se
+    hashean y suman con NumPy; tras cada bloque se conservan como candidatas
+    las candidate_size claves de mayor estimación.
+    """
+
+    def __init__(self, epsilon: float = 1e-4, delta: float = 1e-3, candidate_size: int = 1000, seed: int = 0x5EED):
+        self.epsilon = epsilon
+        self.delta = delta
+        self.width = int(math.ceil(math.e / epsilon))
+        self.depth = int(math.ceil(math.log(1 / delta)))
+        self.candidate_size = candidate_size
+        self.seed = seed
+        self.table = np.zeros((self.depth, self.width), dtype=np.int64)
+        generador = np.random.default_rng(seed)
+        # Hash multiplicativo por fila: (a * x + b) >> 32, con a impar
+        self._a = generador.integers(1, 1 << 63, self.depth, dtype=np.uint64) | np.uint64(1)
+        self._b = generador.integers(0, 1 << 63, self.depth, dtype=np.uint64)
+        self._candidates: Dict[int, int] = {}
+        self._originals: Dict[int, IPKey] = {}
+        self.total = 0
+
+    def _columns(self, keys: np.ndarray) -> np.ndarray:
+        with np.errstate(over="ignore"):
+            mezcla = keys[None, :] * self._a[:, None] + self._b[:, None]
+        return ((mezcla >> np.uint64(32)) % np.uint64(self.width)).astype(np.intp)
+
+    def estimate(self, keys: np.ndarray) -> np.ndarray:
+        """Recuento estimado de cada clave (nunca menor que el real)"""
+        columnas = self._columns(keys)
+        return self.table[np.arange(self.depth)[:, None], columnas].min(axis=0)
+
+    def add(self, keys: np.ndarray):
+        """Suma apariciones de claves uint32 (IPv4) o V16 (IPv6)"""
+        if not len(keys):
+            return
+        if keys.dtype.kind == "V":
+            huellas = _ipv6_fingerprints(keys)
+            unicas, indices, recuentos = np.unique(huellas, return_index=True, return_counts=True)
+            for huella, indice in zip(unicas.tolist(), indices.tolist()):
+                self._originals.setdefault(huella, keys[indice].tobytes())
+        else:
+            unicas, recuentos = np.unique(keys.astype(np.uint64), return_counts=True)
+        self.total += int(recuentos.sum())
+        columnas = self._columns(unicas)
+        for fila in range(self.depth):
+            self.table[fila] += np.bincount(columnas[fila], weights=recuentos,
+                                            minlength=self.width).astype(np.int64)
+        self._refresh_candidates(unicas)
+
+    def _refresh_candidates(self, nuevas: np.ndarray):
+        claves = np.union1d(np.fromiter(self._candidates, dtype=np.uint64, count=len(self._candidates)), nuevas)
+        estimaciones = self.estimate(claves)
+        if len(claves) > self.candidate_size:
+            seleccion = np.argpartition(-estimaciones, self.candidate_size - 1)[:self.candidate_size]
+            claves, estimaciones = claves[seleccion], estimaciones[seleccion]
+        self._candidates = dict(zip(claves.tolist(), estimaciones.tolist()))
+        self._originals = {huella: original for huella, original in self._originals.items()
+                           if huella in self._candidates}
+
+    def merge(self, other: "CountMinSketch"):
+        """Combina otro sketch con las mismas dimensiones y semilla"""
+        if (self.width, self.depth, self.seed) != (other.width, other.depth, other.seed):
+            raise ValueError("Los sketches deben tener las mismas dimensiones y semilla")
+        self.table += other.table
+        self.total += other.total
+        self._originals.update(other._originals)
+        self._refresh_candidates(np.fromiter(other._candidates, dtype=np.uint64, count=len(other._candidates)))
+
+    def most_common(self, k: int) -> List[Tuple[IPKey, int, int]]:
+        """(clave, recuento estimado, sobreestimación máxima con probabilidad 1 - delta)"""
+        limite = int(math.ceil(self.epsilon * self.total))
+        mayores = heapq.nlargest(k, self._candidates.items(), key=lambda item: item[1])
+        return [(self._originals.get(huella, huella), n, limite) for huella, n in mayores]
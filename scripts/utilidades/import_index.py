@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Índice de imports de muestras PE
+Este módulo mantiene en SQLite un índice invertido de las funciones
+importadas y el imphash de cada muestra analizada, de modo que consultas
+como "todas las muestras que importan VirtualAllocEx, WriteProcessMemory y
+CreateRemoteThread" se resuelven intersectando listas de muestras por API
+en lugar de volver a analizar el corpus.
+"""
+
+import os
+import json
+import sqlite3
+import argparse
+from pathlib import Path
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from loguru import logger
+
+from scripts.utilidades.common import Config, DirectoryWalker, HashEngine, map_file
+from scripts.utilidades.pe_inspector import PEInspector
+
+def _normalizar_dll(dll: str) -> str:
+    return dll.lower()
+
+class ImportIndex:
+    """Índice invertido persistente de APIs importadas e imphash a muestras"""
+
+    def __init__(self, db_path: Optional[str] = None, commit_interval: int = 1000):
+        """
+        Args:
+            db_path: Ruta a la base de datos SQLite (por defecto analysis.import_index_db)
+            commit_interval: Número de muestras agregadas entre commits
+        """
+        db_path = db_path or Config().get("analysis.import_index_db", "data/cache/import_index.db")
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self.db_path = db_path
+        self.commit_interval = commit_interval
+        self._pendientes = 0
+
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS samples (
+                id INTEGER PRIMARY KEY,
+                sha256 TEXT NOT NULL UNIQUE,
+                imphash TEXT,
+                path TEXT,
+                added_at TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS samples_imphash ON samples (imphash);
+            CREATE TABLE IF NOT EXISTS apis (
+                id INTEGER PRIMARY KEY,
+                dll TEXT NOT NULL,
+                function TEXT NOT NULL,
+                UNIQUE (dll, function)
+            );
+            CREATE INDEX IF NOT EXISTS apis_function ON apis (function);
+            -- Lista de muestras de cada API, agrupada por api_id en la clave primaria
+            CREATE TABLE IF NOT EXISTS postings (
+                api_id INTEGER NOT NULL,
+                sample_id INTEGER NOT NULL,
+                PRIMARY KEY (api_id, sample_id)
+            ) WITHOUT ROWID;
+        """)
+        self.conn.commit()
+        self._api_ids: Dict[Tuple[str, str], int] = {}
+
+    def _api_id(self, dll: str, function: str) -> int:
+        clave = (dll, function)
+        api_id = self._api_ids.get(clave)
+        if api_id is None:
+            self.conn.execute("INSERT OR IGNORE INTO apis (dll, function) VALUES (?, ?)", clave)
+            api_id = self.conn.execute("SELECT id FROM apis WHERE dll = ? AND function = ?", clave).fetchone()[0]
+            self._api_ids[clave] = api_id
+        return api_id
+
+    def add(self, sha256: str, imphash: Optional[str], imports: Sequence[Tuple[str, Sequence[str]]],
+            path: Optional[str] = None) -> bool:
+        """
+        Agrega una muestra al índice (las ya indexadas se ignoran)
+
+        Args:
+            sha256: Hash SHA-256 de la muestra
+            imphash: Imphash de la muestra
+            imports: Pares (dll, funciones) como los devuelve PEInspector
+            path: Ruta de la muestra
+
+        Returns:
+            bool: True si la muestra es nueva
+        """
+        cursor = self.conn.execute(
+            "INSERT OR IGNORE INTO samples (sha256, imphash, path, added_at) VALUES (?, ?, ?, ?)",
+            (sha256.lower(), imphash or None, path, datetime.now().isoformat())
+        )
+        if not cursor.rowcount:
+            return False
+        sample_id = cursor.lastrowid
+        api_ids = {self._api_id(_normalizar_dll(dll), function.lower())
+                   for dll, functions in imports for function in functions}
+        self.conn.executemany("INSERT OR IGNORE INTO postings VALUES (?, ?)",
+                              ((api_id, sample_id) for api_id in api_ids))
+        self._pendientes += 1
+        if self._pendientes >= self.commit_interval:
+            self.commit()
+        return True
+
+    def __len__(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM samples").fetchone()[0]
+
+    def samples_importing(self, functions: Iterable[str], dll: Optional[str] = None) -> List[str]:
+        """
+        Muestras que importan todas las funciones indicadas
+
+        Args:
+            functions: Nombres de función (sin distinguir mayúsculas), de cualquier DLL
+            dll: Restringir a las funciones importadas de esta DLL
+
+        Returns:
+            List[str]: SHA-256 de las muestras
+        """
+        functions = sorted({function.lower() for function in functions})
+        if not functions:
+            return []
+        filtro_dll = " AND dll = ?" if dll else ""
+        # Una lista de muestras por función (unión de sus DLL) y la intersección de todas
+        consulta = " INTERSECT ".join(
+            "SELECT sample_id FROM postings WHERE api_id IN "
+            f"(SELECT id FROM apis WHERE function = ?{filtro_dll})"
+            for _ in functions
+        )
+        parametros = [p for function in functions for p in ((function, _normalizar_dll(dll)) if dll else (function,))]
+        filas = self.conn.execute(
+            f"SELECT sha256 FROM samples WHERE id IN ({consulta}) ORDER BY id", parametros
+        ).fetchall()
+        return [fila[0] for fila in filas]
+
+    def samples_with_imphash(self, imphash: str) -> List[str]:
+        """Muestras con el mismo imphash"""
+        filas = self.conn.execute("SELECT sha256 FROM samples WHERE imphash = ? ORDER BY id",
+                                  (imphash.lower(),)).fetchall()
+        return [fila[0] for fila in filas]
+
+    def commit(self):
+        """Confirma las escrituras pendientes"""
+        self.conn.commit()
+        self._pendientes = 0
+
+    def close(self):
+        """Confirma y cierra la base de datos"""
+        self.commit()
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+def index_file(index: ImportIndex, file_path: str, hash_engine: HashEngine,
+               inspector: PEInspector) -> bool:
+    """Agrega un archivo PE al índice; los que no son PE se ignoran"""
+    sha256 = hash_engine.hash_file(file_path)['sha256']
+    with map_file(file_path) as datos:
+        if datos[:2] != b"MZ":
+            return False
+        pe = inspector.inspect(datos, sha256, ('imports',))
+    return index.add(sha256, pe['imphash'], pe['imports'], file_path)
+
+def main():
+    parser = argparse.ArgumentParser(description='Índice de imports e imphash de muestras PE')
+    parser.add_argument('--db', help='Base de datos del índice')
+    subparsers = parser.add_subparsers(dest='comando', required=True)
+
+    agregar = subparsers.add_parser('agregar', help='Indexa muestras (archivos o directorios)')
+    agregar.add_argument('rutas', nargs='+', help='Archivos o directorios de muestras')
+
+    importan = subparsers.add_parser('importan', help='Muestras que importan todas las funciones')
+    importan.add_argument('funciones', nargs='+', help='Nombres de función, p. ej. VirtualAllocEx')
+    importan.add_argument('--dll', help='Restringir a funciones de esta DLL')
+
+    imphash = subparsers.add_parser('imphash', help='Muestras con un imphash')
+    imphash.add_argument('imphash', help='Imphash a buscar')
+
+    args = parser.parse_args()
+
+    with ImportIndex(args.db) as indice:
+        if args.comando == 'agregar':
+            engine, inspector, walker = HashEngine(["sha256"]), PEInspector(), DirectoryWalker()
+            nuevas = 0
+            for ruta in args.rutas:
+                archivos = [r.path for r in walker.walk(ruta)] if os.path.isdir(ruta) else [ruta]
+                for archivo in archivos:
+                    try:
+                        nuevas += index_file(indice, archivo, engine, inspector)
+                    except Exception as e:
+                        logger.warning(f"No se pudo indexar {archivo}: {e}")
+            logger.info(f"{nuevas} muestras nuevas; índice con {len(indice)} muestras")
+        elif args.comando == 'importan':
+            print(json.dumps(indice.samples_importing(args.funciones, args.dll), indent=2))
+        else:
+            print(json.dumps(indice.samples_with_imphash(args.imphash), indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -1,41 +1,128 @@
 #!/usr/bin/env python3
 import re
 import sys
-from collections import Counter
+import math
+import argparse
 from datetime import datetime
+from scripts.utilidades.heavy_hitters import (CountMinSketch, ExactCounter, SpaceSaving,
+                                              format_ip, pack_ipv4, pack_ipv6)
+from scripts.utilidades.common import map_file
+from scripts.utilidades.log_chunks import iter_file_line_blocks, iter_line_blocks, map_line_ranges
 
-def analyze_logs(log_file):
+IP_PATTERN = re.compile(r'\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}')
+# Every IPv6 address has "::" or four colon-separated groups in a row. The
+# hint starts with a literal colon, so the regex engine jumps between colons
+# instead of trying a match at each hex digit like a full IPv6 regex would
+IPV6_HINT = re.compile(r'::|:[0-9A-Fa-f]{1,4}:[0-9A-Fa-f]{1,4}:[0-9A-Fa-f]{1,4}:')
+# Start (searched backwards from a hint) and end of the address around a hint
+IPV6_START = re.compile(r'(?<![\w.])[0-9A-Fa-f:]{0,39}$')
+IPV6_END = re.compile(r'[0-9A-Fa-f:]*+(?![\w.])')
+ERROR_PATTERN = re.compile(r'ERROR|error|Error')
+
+# Text decoded and scanned at once; with the lines, the joined text and the
+# matches alive at the same time a block takes about ten times this in memory
+BLOCK_SIZE = 2 * 1024 * 1024
+
+# Only the first errors are shown, so only those are kept
+MAX_ERRORS = 10
+
+COUNTER_MODES = ('exact', 'space-saving', 'count-min')
+
+def new_counter(mode='exact', top=10, epsilon=1e-4, delta=1e-3):
+    """Creates the IP counter of a mode.
+
+    'exact' keeps a count per distinct IP (packed, 4 or 16 bytes each).
+    'space-saving' keeps ceil(1/epsilon) counters and 'count-min' a sketch of
+    ceil(e/epsilon) x ceil(ln(1/delta)) cells, whatever the number of IPs.
+    """
+    if mode == 'exact':
+        return ExactCounter()
+    if mode == 'space-saving':
+        return SpaceSaving(max(top, int(math.ceil(1 / epsilon))))
+    if mode == 'count-min':
+        return CountMinSketch(epsilon, delta, candidate_size=max(1000, 10 * top))
+    raise ValueError(f"Unknown counting mode: {mode}")
+
+def find_ipv6(text):
+    """Returns the IPv6 candidates of a text (inet_pton validates them later)."""
+    candidates = []
+    end = 0
+    for hint in IPV6_HINT.finditer(text):
+        if hint.start() < end:  # Another hint inside the last address
+            continue
+        start = IPV6_START.search(text, max(end, hint.start() - 39), hint.start())
+        stop = IPV6_END.match(text, hint.start())
+        if start is None or stop is None:
+            continue
+        end = stop.end()
+        candidates.append(text[start.start():end])
+    return candidates
+
+def scan_lines(lines, ip_counter, errors):
+    """Counts the IPs and collects the first errors of a block of lines."""
+    # IPs are searched in the whole block at once and added to the counter packed
+    text = ''.join(lines)
+    ip_counter.add(pack_ipv4(IP_PATTERN.findall(text))[0])
+    ip_counter.add(pack_ipv6(find_ipv6(text))[0])
+
+    # Search for errors
+    if len(errors) < MAX_ERRORS:
+        for line in lines:
+            if ERROR_PATTERN.search(line):
+                errors.append(line.strip())
+                if len(errors) == MAX_ERRORS:
+                    break
+
+def _scan_range(log_file, start, end, mode, top, epsilon, delta):
+    """Scans a byte range of the file in a pool process."""
+    ip_counter = new_counter(mode, top, epsilon, delta)
+    errors = []
+    for lines in iter_file_line_blocks(log_file, start, end, BLOCK_SIZE):
+        scan_lines(lines, ip_counter, errors)
+    return ip_counter, errors
+
+def analyze_logs(log_file, workers=1, mode='exact', top=10, epsilon=1e-4, delta=1e-3):
+    """Prints the most frequent IPs and the first errors of a log file.
+
+    The file is read in blocks and the IPs are counted by a streaming
+    counter (see new_counter), so memory does not grow with the number of
+    lines. With workers > 1 the file is mapped, split at line boundaries and
+    the ranges are scanned in a process pool; the counters are merged and the
+    errors kept in file order.
+    """
     print(f"\nAnalyzing file: {log_file}")
     print("-" * 50)
-    
-    ip_pattern = r'\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}'
-    error_pattern = r'ERROR|error|Error'
-    
-    ip_addresses = []
-    errors = []
-    
+
     try:
-        with open(log_file, 'r') as f:
-            for line in f:
-                # Search for IP addresses
-                ips = re.findall(ip_pattern, line)
-                ip_addresses.extend(ips)
-                
-                # Search for errors
-                if re.search(error_pattern, line):
-                    errors.append(line.strip())
-    
+        ip_counter = new_counter(mode, top, epsilon, delta)
+        errors = []
+        if workers > 1:
+            for range_ips, range_errors in map_line_ranges(log_file, _scan_range, workers,
+                                                           mode, top, epsilon, delta):
+                ip_counter.merge(range_ips)
+                errors.extend(range_errors[:MAX_ERRORS - len(errors)])
+        else:
+            with map_file(log_file) as data:
+                for lines in iter_line_blocks(data, 0, len(data), BLOCK_SIZE):
+                    scan_lines(lines, ip_counter, errors)
+
         # IP analysis
-        ip_counter = Counter(ip_addresses)
-        print("\nTop 10 most frequent IPs:")
-        for ip, count in ip_counter.most_common(10):
-            print(f"{ip}: {count} occurrences")
-            
+        print(f"\nTop {top} most frequent IPs:")
+        for ip, count, error in ip_counter.most_common(top):
+            bound = f" (overestimated by at most {error})" if error else ""
+            print(f"{format_ip(ip)}: {count} occurrences{bound}")
+        if mode == 'space-saving':
+            print(f"Counts exceed the real ones by at most {ip_counter.total // ip_counter.capacity} "
+                  f"of {ip_counter.total} occurrences; every IP above that is listed")
+        elif mode == 'count-min':
+            print(f"Counts exceed the real ones by at most {epsilon:g} x {ip_counter.total} occurrences "
+                  f"with probability {1 - delta:g}")
+
         # Error analysis
         print("\nErrors found:")
         for error in errors[:10]:  # Show only the first 10 errors
             print(f"- {error}")
-            
+
     except FileNotFoundError:
         print(f"Error: Could not find file {log_file}")
         sys.exit(1)
@@ -44,10 +131,20 @@ def analyze_logs(log_file):
         sys.exit(1)
 
 if __name__ == "__main__":
-    if len(sys.argv) != 2:
-        print("Usage: python log_analyzer.py <log_file>")
-        print("Example: python log_analyzer.py access.log")
-        sys.exit(1)
-        
-    log_file = sys.argv[1]
-    analyze_logs(log_file) 
\ No newline at end of file
+    parser = argparse.ArgumentParser(
+        description='Log analyzer',
+        epilog='Example: python log_analyzer.py access.log'
+    )
+    parser.add_argument('log_file', help='Log file to analyze')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Processes used to scan the file in ranges (default: 1)')
+    parser.add_argument('--mode', choices=COUNTER_MODES, default='exact',
+                        help='IP counting: exact, or bounded memory with space-saving/count-min (default: exact)')
+    parser.add_argument('--top', type=int, default=10, help='Most frequent IPs shown (default: 10)')
+    parser.add_argument('--epsilon', type=float, default=1e-4,
+                        help='Approximate modes: maximum overcount as a fraction of all occurrences (default: 1e-4)')
+    parser.add_argument('--delta', type=float, default=1e-3,
+                        help='count-min: probability of exceeding the epsilon bound (default: 1e-3)')
+    args = parser.parse_args()
+
+    analyze_logs(args.log_file, args.workers, args.mode, args.top, args.epsilon, args.delta)
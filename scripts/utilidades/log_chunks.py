@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Procesamiento de logs por rangos en paralelo
+Este módulo mapea en memoria un archivo de log, lo divide en rangos que
+empiezan y terminan en un salto de línea y reparte los rangos entre varios
+procesos. Cada proceso abre y mapea el archivo por su cuenta y recorre su
+rango en bloques de líneas; los resultados se devuelven en el orden de los
+rangos para que la combinación sea determinista.
+"""
+
+import io
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Iterator, List, Optional, Tuple
+
+from scripts.utilidades.common import map_file
+
+# Bytes de un bloque de líneas decodificado de una vez dentro de un rango
+BLOCK_SIZE = 16 * 1024 * 1024
+
+# Tamaño mínimo de un rango: por debajo no compensa repartir el archivo
+MIN_RANGE_SIZE = 1024 * 1024
+
+def _next_line_start(data, pos: int) -> int:
+    """Primera posición después del salto de línea en o tras pos"""
+    if pos >= len(data):
+        return len(data)
+    salto = data.find(b"\n", pos)
+    return len(data) if salto == -1 else salto + 1
+
+def line_ranges(data, parts: int, min_size: Optional[int] = None) -> List[Tuple[int, int]]:
+    """
+    Divide un buffer en rangos (inicio, fin) que no parten ninguna línea
+
+    Args:
+        data: Contenido del archivo (bytes o mmap)
+        parts: Número de rangos deseado
+        min_size: Tamaño mínimo de cada rango en bytes (por defecto MIN_RANGE_SIZE)
+
+    Returns:
+        List[Tuple[int, int]]: Rangos contiguos que cubren todo el buffer
+    """
+    total = len(data)
+    min_size = MIN_RANGE_SIZE if min_size is None else min_size
+    parts = max(1, min(parts, total // max(min_size, 1)))
+    rangos = []
+    inicio = 0
+    for i in range(1, parts + 1):
+        fin = total if i == parts else max(_next_line_start(data, total * i // parts), inicio)
+        if fin > inicio:
+            rangos.append((inicio, fin))
+        inicio = fin
+    return rangos
+
+def iter_line_blocks(data, start: int, end: int, block_size: int = BLOCK_SIZE,
+                     encoding: str = "utf-8") -> Iterator[List[str]]:
+    """
+    Recorre las líneas de un rango en bloques
+
+    Las líneas se separan como al iterar un archivo abierto en modo texto
+    ("\\r\\n" y "\\r" se convierten en "\\n") y conservan su salto final. Los
+    bytes que no son válidos en la codificación se sustituyen.
+    """
+    pos = start
+    while pos < end:
+        fin = min(end, _next_line_start(data, min(pos + block_size, end) - 1))
+        texto = bytes(data[pos:fin]).decode(encoding, errors="replace")
+        yield list(io.StringIO(texto, newline=None))
+        pos = fin
+
+def iter_file_line_blocks(path: str, start: int, end: int, block_size: int = BLOCK_SIZE,
+                          encoding: str = "utf-8") -> Iterator[List[str]]:
+    """Como iter_line_blocks, mapeando el archivo (pensado para los procesos del pool)"""
+    with map_file(path) as data:
+        yield from iter_line_blocks(data, start, end, block_size, encoding)
+
+def map_line_ranges(path: str, func: Callable[..., Any], workers: int, *args: Any) -> List[Any]:
+    """
+    Aplica func(path, inicio, fin, *args) a cada rango de un archivo en un pool de procesos
+
+    El archivo se divide en workers * 4 rangos para repartir mejor la carga.
+    func debe ser una función de nivel de módulo para poder enviarse a los
+    procesos.
+
+    Returns:
+        List[Any]: Resultado de cada rango, en el orden del archivo
+    """
+    with map_file(path) as data:
+        rangos = line_ranges(data, workers * 4)
+    if len(rangos) <= 1 or workers <= 1:
+        return [func(path, inicio, fin, *args) for inicio, fin in rangos]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futuros = [executor.submit(func, path, inicio, fin, *args) for inicio, fin in rangos]
+        return [futuro.result() for futuro in futuros]
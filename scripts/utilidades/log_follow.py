@@ -0,0 +1,352 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Seguimiento continuo de logs
+Este módulo sigue uno o varios archivos de log como tail -F: entrega cada
+línea nueva en cuanto se escribe, sobrevive a las rotaciones de logrotate
+(renombrado, truncado y copytruncate) comparando el inodo de la ruta con el
+del archivo abierto y guarda los offsets leídos para continuar tras un
+reinicio. En Linux espera los cambios con inotify (vía ctypes) en lugar de
+sondear; en otros sistemas revisa los archivos a intervalos.
+"""
+
+import os
+import json
+import time
+import errno
+import select
+import struct
+import ctypes
+import ctypes.util
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, Optional, Set, Tuple
+
+from loguru import logger
+
+from scripts.utilidades.common import Config
+
+# Constantes de <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+_EVENT = struct.Struct("iIII")
+READ_CHUNK = 1024 * 1024
+
+class Inotify:
+    """Envoltorio mínimo de inotify sobre la libc mediante ctypes"""
+
+    MASK = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+    def __init__(self):
+        """
+        Raises:
+            OSError: Si el sistema no tiene inotify
+        """
+        nombre = ctypes.util.find_library("c") or "libc.so.6"
+        self._libc = ctypes.CDLL(nombre, use_errno=True)
+        if not hasattr(self._libc, "inotify_init1"):
+            raise OSError(errno.ENOSYS, "inotify no disponible")
+        self.fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error))
+        self._dirs: Dict[int, str] = {}
+
+    def add_watch(self, directory: str, mask: int = MASK) -> int:
+        """Vigila un directorio; los eventos traen el nombre del archivo afectado"""
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(directory), mask)
+        if wd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error), directory)
+        self._dirs[wd] = directory
+        return wd
+
+    def read(self, timeout: float) -> Optional[Set[str]]:
+        """
+        Espera eventos como mucho timeout segundos
+
+        Returns:
+            Optional[Set[str]]: Rutas afectadas, o None si la cola se desbordó
+            y hay que revisar todos los archivos
+        """
+        listos, _, _ = select.select([self.fd], [], [], timeout)
+        if not listos:
+            return set()
+        rutas: Set[str] = set()
+        while True:
+            try:
+                datos = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                return rutas
+            pos = 0
+            while pos < len(datos):
+                wd, mask, _, longitud = _EVENT.unpack_from(datos, pos)
+                nombre = datos[pos + _EVENT.size:pos + _EVENT.size + longitud].rstrip(b"\0")
+                pos += _EVENT.size + longitud
+                if mask & IN_Q_OVERFLOW:
+                    return None
+                if wd in self._dirs and nombre:
+                    rutas.add(os.path.join(self._dirs[wd], os.fsdecode(nombre)))
+
+    def close(self):
+        os.close(self.fd)
+
+class _FollowedFile:
+    """Estado de un archivo seguido: archivo abierto, identidad y línea a medias"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.file = None
+        self.dev = self.ino = None
+        self.partial = b""
+        self.position = 0
+        # Archivo rotado que se termina de leer antes de volver a la ruta
+        self.draining = False
+
+    @property
+    def offset(self) -> int:
+        """Offset tras la última línea entregada"""
+        return self.position if self.file else 0
+
+    def open(self, path: Optional[str] = None, offset: int = 0) -> bool:
+        try:
+            archivo = open(path or self.path, "rb")
+        except OSError:
+            return False
+        self.close()
+        st = os.fstat(archivo.fileno())
+        self.file, self.dev, self.ino = archivo, st.st_dev, st.st_ino
+        self.rewind(min(offset, st.st_size))
+        return True
+
+    def rewind(self, offset: int = 0):
+        """Vuelve a leer desde offset descartando la línea a medias"""
+        self.file.seek(offset)
+        self.partial = b""
+        self.position = offset
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def iter_lines(self, flush: bool = False) -> Iterator[bytes]:
+        """
+        Lee hasta el final entregando las líneas completas (y la incompleta si flush)
+
+        El archivo se lee por bloques y el offset avanza con cada línea
+        entregada, así que si se deja de iterar a mitad de un bloque el offset
+        guardado es el de la última línea entregada.
+        """
+        if self.file is None:
+            return
+        if self.file.tell() - len(self.partial) != self.position:
+            # Se dejó de iterar a mitad de un bloque: se relee desde lo entregado
+            self.rewind(self.position)
+        while True:
+            bloque = self.file.read(READ_CHUNK)
+            if not bloque:
+                break
+            partes = (self.partial + bloque).split(b"\n")
+            self.partial = partes.pop()
+            for parte in partes:
+                self.position += len(parte) + 1
+                yield parte + b"\n"
+        if flush and self.partial:
+            linea, self.partial = self.partial, b""
+            self.position += len(linea)
+            yield linea
+
+class LogFollower:
+    """
+    Sigue varios archivos de log entregando las líneas nuevas
+
+    Cada revisión de un archivo compara el inodo de su ruta con el del
+    archivo abierto: si cambió (renombrado o borrado y recreado) se termina de
+    leer el archivo antiguo y se abre el nuevo desde el principio; si el
+    tamaño bajó del offset leído (truncado o copytruncate) se vuelve al
+    principio. Las líneas escritas entre la copia y el truncado de
+    copytruncate se pierden, como en cualquier lector de la ruta.
+    """
+
+    def __init__(self, paths: Iterable[str], state_path: Optional[str] = None,
+                 from_start: bool = False, interval: float = 1.0, save_interval: float = 5.0,
+                 use_inotify: bool = True):
+        """
+        Args:
+            paths: Archivos de log a seguir
+            state_path: JSON con los offsets guardados (por defecto analysis.log_follow_state)
+            from_start: Leer desde el principio los archivos sin offset guardado
+                (por defecto se empieza por el final, como tail)
+            interval: Espera máxima entre revisiones completas en segundos; con
+                inotify es solo una red de seguridad
+            save_interval: Segundos entre guardados de los offsets
+            use_inotify: Usar inotify si está disponible
+        """
+        self.paths = [os.path.abspath(path) for path in paths]
+        self.state_path = state_path or Config().get("analysis.log_follow_state",
+                                                     "data/cache/log_follow_state.json")
+        self.from_start = from_start
+        self.interval = interval
+        self.save_interval = save_interval
+        self._files = {path: _FollowedFile(path) for path in self.paths}
+        self._last_save = time.monotonic()
+        self._stopped = False
+        self.inotify: Optional[Inotify] = None
+        if use_inotify:
+            try:
+                self.inotify = Inotify()
+                for directorio in sorted({os.path.dirname(path) for path in self.paths}):
+                    self.inotify.add_watch(directorio)
+            except OSError as e:
+                logger.warning(f"inotify no disponible ({e}); se revisarán los archivos cada {interval}s")
+                if self.inotify is not None:
+                    self.inotify.close()
+                self.inotify = None
+        # Las posiciones de partida se fijan al crear el seguidor, no al empezar a iterar
+        self._open_initial(self._load_state())
+
+    def _load_state(self) -> Dict[str, Dict[str, int]]:
+        try:
+            with open(self.state_path, encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.warning(f"No se pudo leer el estado {self.state_path}: {e}")
+            return {}
+
+    def save_state(self):
+        """Guarda de forma atómica el offset de cada archivo abierto"""
+        estado = {path: {'dev': seguido.dev, 'ino': seguido.ino, 'offset': seguido.offset}
+                  for path, seguido in self._files.items() if seguido.file is not None}
+        Path(self.state_path).parent.mkdir(parents=True, exist_ok=True)
+        temporal = f"{self.state_path}.tmp"
+        with open(temporal, "w", encoding="utf-8") as f:
+            json.dump(estado, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporal, self.state_path)
+        self._last_save = time.monotonic()
+
+    def _find_rotated(self, path: str, dev: int, ino: int) -> Optional[str]:
+        """Busca junto a la ruta el archivo rotado que conserva el inodo guardado"""
+        directorio = os.path.dirname(path)
+        try:
+            with os.scandir(directorio) as entradas:
+                for entrada in entradas:
+                    if entrada.name.startswith(os.path.basename(path)) and entrada.is_file():
+                        st = entrada.stat()
+                        if (st.st_dev, st.st_ino) == (dev, ino):
+                            return entrada.path
+        except OSError:
+            pass
+        return None
+
+    def _open_initial(self, estado: Dict[str, Dict[str, int]]):
+        """Abre cada archivo en su offset guardado, o el rotado si quedó algo pendiente en él"""
+        for path, seguido in self._files.items():
+            guardado = estado.get(path)
+            try:
+                st = os.stat(path)
+            except OSError:
+                st = None
+            if guardado and st and (st.st_dev, st.st_ino) == (guardado['dev'], guardado['ino']):
+                # Si el archivo se truncó mientras no se seguía, se vuelve al principio
+                seguido.open(path, guardado['offset'] if st.st_size >= guardado['offset'] else 0)
+                continue
+            if guardado:
+                # Se rotó mientras no se seguía: se termina el archivo antiguo y se empieza el nuevo
+                rotado = self._find_rotated(path, guardado['dev'], guardado['ino'])
+                if rotado and seguido.open(rotado, guardado['offset']):
+                    logger.info(f"Recuperando el final de {rotado} antes de seguir {path}")
+                    seguido.draining = True
+                else:
+                    seguido.open(path, 0)
+            elif seguido.open(path) and not self.from_start:
+                seguido.rewind(os.fstat(seguido.file.fileno()).st_size)
+
+    def _check(self, seguido: _FollowedFile) -> Iterator[bytes]:
+        """Lee lo nuevo de un archivo, detectando rotaciones y truncados"""
+        if seguido.draining:
+            yield from seguido.iter_lines(flush=True)
+            seguido.draining = False
+            seguido.close()
+            seguido.open(seguido.path, 0)
+        try:
+            st = os.stat(seguido.path)
+        except OSError:
+            st = None
+        if seguido.file is None:
+            if st and seguido.open(seguido.path, 0):
+                yield from seguido.iter_lines()
+            return
+
+        if st is None or (st.st_dev, st.st_ino) != (seguido.dev, seguido.ino):
+            # Renombrado o borrado: se agota el archivo antiguo y se pasa al nuevo si existe
+            yield from seguido.iter_lines(flush=st is not None)
+            if st is not None and seguido.open(seguido.path, 0):
+                logger.info(f"Rotación detectada en {seguido.path}")
+                yield from seguido.iter_lines()
+            return
+
+        if st.st_size < seguido.file.tell():
+            logger.info(f"Truncado detectado en {seguido.path}")
+            seguido.rewind(0)
+        yield from seguido.iter_lines()
+
+    def follow(self) -> Iterator[Tuple[str, str]]:
+        """
+        Entrega (ruta, línea) por cada línea nueva hasta llamar a stop
+
+        Las líneas conservan su salto final. Los offsets se guardan
+        periódicamente y al terminar, y solo cuentan las líneas ya entregadas:
+        si se deja de iterar, el siguiente seguidor continúa en la línea
+        siguiente a la última recibida.
+        """
+        self._stopped = False
+        try:
+            pendientes: Optional[Set[str]] = None
+            while not self._stopped:
+                for path, seguido in self._files.items():
+                    if pendientes is None or path in pendientes or seguido.draining:
+                        for linea in self._check(seguido):
+                            yield path, linea.decode("utf-8", errors="replace")
+                            # Un archivo largo (--from-start, rotado) también guarda su avance
+                            if time.monotonic() - self._last_save >= self.save_interval:
+                                self.save_state()
+                if time.monotonic() - self._last_save >= self.save_interval:
+                    self.save_state()
+                if self._stopped:
+                    break
+                if self.inotify is not None:
+                    pendientes = self.inotify.read(self.interval)
+                    # Sin eventos en todo el intervalo se revisa todo por seguridad
+                    if not pendientes and pendientes is not None:
+                        pendientes = None
+                else:
+                    time.sleep(self.interval)
+                    pendientes = None
+        finally:
+            self.save_state()
+
+    def stop(self):
+        """Detiene follow tras la revisión en curso"""
+        self._stopped = True
+
+    def close(self):
+        """Libera los archivos abiertos e inotify (los offsets se guardan al terminar follow)"""
+        for seguido in self._files.values():
+            seguido.close()
+        if self.inotify is not None:
+            self.inotify.close()
+            self.inotify = None
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Búsqueda de varios patrones en líneas de log
+Este módulo compila una sola vez un conjunto de expresiones regulares con
+nombre y extrae de cada una el literal que toda coincidencia debe contener.
+Las líneas se filtran primero buscando esos literales con str.find sobre el
+bloque completo de líneas, de modo que la gran mayoría se descarta sin pasar
+por el motor de expresiones regulares.
+"""
+
+import re
+from typing import Dict, List, Mapping, Optional, Sequence
+
+import numpy as np
+
+try:
+    from re import _parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_parse
+
+# Literales más cortos filtran poco y no compensan la búsqueda
+MIN_LITERAL_LENGTH = 3
+
+def required_literal(pattern: str, flags: int = 0) -> Optional[str]:
+    """
+    Literal más largo que aparece en toda coincidencia de un patrón
+
+    Solo se consideran las secuencias de caracteres literales del nivel
+    superior del patrón, que son obligatorias; cualquier otro elemento
+    (clases, repeticiones, grupos, alternativas) corta la secuencia.
+
+    Returns:
+        Optional[str]: Literal o None si el patrón no tiene uno aprovechable
+    """
+    try:
+        elementos = sre_parse.parse(pattern, flags)
+    except re.error:
+        return None
+    mejor, actual = "", []
+    for op, arg in list(elementos) + [(None, None)]:
+        if op is sre_parse.LITERAL and arg != 10:  # Un salto de línea nunca está dentro de una línea
+            actual.append(chr(arg))
+            continue
+        if len(actual) > len(mejor):
+            mejor = "".join(actual)
+        actual = []
+    return mejor if len(mejor) >= MIN_LITERAL_LENGTH else None
+
+def _find_all(text: str, needle: str) -> List[int]:
+    posiciones = []
+    inicio = text.find(needle)
+    while inicio != -1:
+        posiciones.append(inicio)
+        inicio = text.find(needle, inicio + 1)
+    return posiciones
+
+class LogPatternMatcher:
+    """
+    Conjunto de patrones con nombre con prefiltro de literales
+
+    Cada patrón se confirma con su expresión compilada solo en las líneas que
+    contienen su literal obligatorio; los patrones que son un literal puro no
+    necesitan confirmación. El prefiltro se limita a texto ASCII, donde pasar
+    a minúsculas equivale a re.IGNORECASE; las líneas con otros caracteres se
+    evalúan directamente con las expresiones.
+    """
+
+    def __init__(self, patterns: Mapping[str, str], flags: int = re.IGNORECASE):
+        """
+        Args:
+            patterns: Expresiones regulares por nombre, en el orden del reporte
+            flags: Opciones de re aplicadas a todos los patrones
+        """
+        self.names = list(patterns)
+        self.flags = flags
+        self._nocase = bool(flags & re.IGNORECASE)
+        self._compiled = [re.compile(patterns[name], flags) for name in self.names]
+        self._literals: List[Optional[str]] = []
+        self._pure: List[bool] = []
+        for name in self.names:
+            literal = required_literal(patterns[name], flags)
+            if literal is not None and not literal.isascii():
+                literal = None
+            self._pure.append(literal is not None and re.escape(literal) == patterns[name]
+                              and not flags & re.VERBOSE)
+            self._literals.append(literal.lower() if literal and self._nocase else literal)
+
+    def match(self, line: str) -> List[str]:
+        """Nombres de los patrones presentes en una línea, en el orden definido"""
+        if not line.isascii():
+            return [name for name, regex in zip(self.names, self._compiled) if regex.search(line)]
+        texto = line.lower() if self._nocase else line
+        return [name for name, regex, literal, pure in zip(self.names, self._compiled, self._literals, self._pure)
+                if (literal is None or literal in texto) and (pure or regex.search(line))]
+
+    def match_lines(self, lines: Sequence[str]) -> Dict[str, List[int]]:
+        """
+        Índices de las líneas de un bloque donde aparece cada patrón
+
+        Los literales se buscan en el bloque unido (una llamada a str.find por
+        aparición en lugar de una búsqueda por línea) y sus posiciones se
+        traducen a líneas con searchsorted. Las líneas se unen con saltos de
+        línea, que ningún literal contiene, así que ninguno queda partido
+        entre dos de ellas.
+
+        Returns:
+            Dict[str, List[int]]: Líneas (en orden) por nombre de patrón con alguna coincidencia
+        """
+        resultado: Dict[str, List[int]] = {}
+        if not lines:
+            return resultado
+        texto = "\n".join(lines)
+        otras: List[int] = []
+        if not texto.isascii():
+            # Las líneas no ASCII se evalúan aparte y quedan vacías en el bloque
+            otras = [i for i, line in enumerate(lines) if not line.isascii()]
+            vacias = set(otras)
+            texto = "\n".join("" if i in vacias else line for i, line in enumerate(lines))
+            longitudes = [0 if i in vacias else len(line) for i, line in enumerate(lines[:-1])]
+        else:
+            longitudes = [len(line) for line in lines[:-1]]
+
+        busqueda = texto.lower() if self._nocase else texto
+        inicios = np.cumsum([0] + [n + 1 for n in longitudes])
+        for name, regex, literal, pure in zip(self.names, self._compiled, self._literals, self._pure):
+            if literal is None:
+                candidatas = range(len(lines))
+            else:
+                posiciones = _find_all(busqueda, literal)
+                candidatas = (np.unique(np.searchsorted(inicios, posiciones, side='right') - 1).tolist()
+                              if posiciones else [])
+                if otras:
+                    candidatas = sorted(candidatas + otras)
+            indices = [i for i in candidatas if (pure and lines[i].isascii()) or regex.search(lines[i])]
+            if indices:
+                resultado[name] = indices
+        return resultado
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Tiempo de los eventos de log
+Este módulo extrae la marca de tiempo de las líneas de log (syslog, ISO 8601
+y RFC 5424, journald y el formato común de Apache/nginx) sin strptime: cada
+archivo recuerda el último formato reconocido, los campos se convierten con
+int() y el epoch de cada hora se calcula una sola vez. También ofrece
+contadores de ventana deslizante por clave (IP, usuario) sobre anillos de
+intervalos de tiempo, con O(1) amortizado por evento y memoria acotada.
+"""
+
+import re
+import time
+import calendar
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, List, Optional, Tuple
+
+MONTHS = {nombre: n for n, nombre in enumerate(
+    ('Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec'), 1)}
+
+_SYSLOG = re.compile(r'([A-Z][a-z]{2}) {1,2}(\d{1,2}) (\d\d):(\d\d):(\d\d)(\.\d+)?')
+# ISO 8601 al inicio de la línea, también tras el <PRI>VERSION de RFC 5424
+_ISO = re.compile(r'(?:<\d{1,3}>\d{1,2} )?(\d{4})-(\d\d)-(\d\d)[T ](\d\d):(\d\d):(\d\d)([.,]\d+)?(Z|[+-]\d\d:?\d\d)?')
+_APACHE = re.compile(r'\[(\d\d)/([A-Z][a-z]{2})/(\d{4}):(\d\d):(\d\d):(\d\d) ([+-]\d{4})\]')
+_JOURNALD = re.compile(r'__REALTIME_TIMESTAMP"?[=:] ?"?(\d{16})')
+
+# Las horas cuyo epoch se recuerda; al superarse se vacía la caché
+_HOUR_CACHE_SIZE = 10000
+
+def _check_date(y: int, mo: int, d: int, h: int = 0):
+    """mktime y timegm normalizan fechas imposibles (31 de febrero); aquí se rechazan"""
+    if not (1 <= mo <= 12 and 1 <= d <= calendar.monthrange(y, mo)[1] and h < 24):
+        raise ValueError(f"Fecha no válida: {y}-{mo}-{d} {h}h")
+
+def _offset_seconds(zona: Optional[str]) -> Optional[int]:
+    """Desplazamiento de una zona "Z", "+0200" o "-05:00" en segundos (None si no hay zona)"""
+    if not zona:
+        return None
+    if zona == 'Z':
+        return 0
+    signo = -1 if zona[0] == '-' else 1
+    return signo * (int(zona[1:3]) * 3600 + int(zona[-2:]) * 60)
+
+class TimestampParser:
+    """
+    Extrae el epoch de las líneas de un archivo de log
+
+    El formato se detecta en la primera línea que lo tenga y se prueba primero
+    en las siguientes. Las horas sin zona (syslog) son hora local; a syslog le
+    falta además el año, que se toma del instante de referencia (por ejemplo
+    el mtime del archivo) y se retrocede uno si la fecha quedaría más de un
+    día por delante de él, como ocurre con los logs que cruzan el año nuevo.
+    """
+
+    def __init__(self, reference: Optional[float] = None):
+        """
+        Args:
+            reference: Epoch de referencia para el año de syslog (por defecto el actual)
+        """
+        self.reference = reference if reference is not None else time.time()
+        self._reference_year = time.localtime(self.reference).tm_year
+        self._local_hours: Dict[Tuple[int, int, int, int], float] = {}
+        self._utc_days: Dict[Tuple[int, int, int], int] = {}
+        self._formats: List[Callable[[str], Optional[float]]] = [
+            self._parse_syslog, self._parse_iso, self._parse_apache, self._parse_journald]
+        self._current = 0
+
+    def advance(self, reference: float):
+        """
+        Adelanta el instante de referencia (nunca lo retrasa)
+
+        Al seguir un log durante días la referencia debe avanzar con el reloj;
+        si no, pasadas 24 horas las fechas syslog se asignarían al año anterior.
+        """
+        if reference > self.reference:
+            self.reference = reference
+            self._reference_year = time.localtime(reference).tm_year
+
+    def _local_hour(self, y: int, mo: int, d: int, h: int) -> float:
+        clave = (y, mo, d, h)
+        base = self._local_hours.get(clave)
+        if base is None:
+            _check_date(y, mo, d, h)
+            if len(self._local_hours) >= _HOUR_CACHE_SIZE:
+                self._local_hours.clear()
+            base = self._local_hours[clave] = time.mktime((y, mo, d, h, 0, 0, 0, 0, -1))
+        return base
+
+    def _utc(self, y: int, mo: int, d: int, h: int, mi: int, s: int, offset: int) -> float:
+        clave = (y, mo, d)
+        dia = self._utc_days.get(clave)
+        if dia is None:
+            _check_date(y, mo, d)
+            if len(self._utc_days) >= _HOUR_CACHE_SIZE:
+                self._utc_days.clear()
+            dia = self._utc_days[clave] = calendar.timegm((y, mo, d, 0, 0, 0, 0, 0, 0))
+        if h > 23:
+            raise ValueError(f"Hora no válida: {h}")
+        return dia + h * 3600 + mi * 60 + s - offset
+
+    def _parse_syslog(self, line: str) -> Optional[float]:
+        m = _SYSLOG.match(line)
+        if m is None or m.group(1) not in MONTHS:
+            return None
+        mes, dia, h, mi, s, fraccion = m.groups()
+        mo = MONTHS[mes]
+        epoch = self._local_hour(self._reference_year, mo, int(dia), int(h)) + int(mi) * 60 + int(s)
+        if epoch > self.reference + 86400:
+            epoch = self._local_hour(self._reference_year - 1, mo, int(dia), int(h)) + int(mi) * 60 + int(s)
+        return epoch + float(fraccion) if fraccion else epoch
+
+    def _parse_iso(self, line: str) -> Optional[float]:
+        m = _ISO.match(line)
+        if m is None:
+            return None
+        y, mo, d, h, mi, s, fraccion, zona = m.groups()
+        offset = _offset_seconds(zona)
+        if offset is None:
+            epoch = self._local_hour(int(y), int(mo), int(d), int(h)) + int(mi) * 60 + int(s)
+        else:
+            epoch = self._utc(int(y), int(mo), int(d), int(h), int(mi), int(s), offset)
+        return epoch + float(fraccion.replace(',', '.')) if fraccion else epoch
+
+    def _parse_apache(self, line: str) -> Optional[float]:
+        m = _APACHE.search(line)
+        if m is None or m.group(2) not in MONTHS:
+            return None
+        d, mes, y, h, mi, s, zona = m.groups()
+        return self._utc(int(y), MONTHS[mes], int(d), int(h), int(mi), int(s), _offset_seconds(zona))
+
+    def _parse_journald(self, line: str) -> Optional[float]:
+        m = _JOURNALD.search(line)
+        return int(m.group(1)) / 1e6 if m else None
+
+    def parse(self, line: str) -> Optional[float]:
+        """
+        Epoch (UTC) del evento de una línea
+
+        Returns:
+            Optional[float]: Segundos desde 1970 o None si la línea no tiene una marca reconocible
+        """
+        try:
+            epoch = self._formats[self._current](line)
+            if epoch is not None:
+                return epoch
+            for n, formato in enumerate(self._formats):
+                if n != self._current:
+                    epoch = formato(line)
+                    if epoch is not None:
+                        self._current = n
+                        return epoch
+        except (ValueError, OverflowError):  # Fecha imposible como 31 de febrero
+            pass
+        return None
+
+class SlidingWindowCounter:
+    """
+    Recuentos por clave en una ventana deslizante de tiempo
+
+    Cada clave guarda un anillo de buckets intervalos de window / buckets
+    segundos y el total del anillo, así que sumar un evento y leer el total
+    de la ventana es O(1) amortizado. La ventana se mide en intervalos
+    completos: cubre entre window - window / buckets y window segundos. Los
+    eventos más antiguos que la ventana se ignoran y las claves menos
+    recientes se descartan al superar max_keys.
+    """
+
+    def __init__(self, window: float, buckets: int = 12, max_keys: int = 100000):
+        """
+        Args:
+            window: Duración de la ventana en segundos
+            buckets: Intervalos del anillo (resolución de la ventana)
+            max_keys: Claves recordadas como máximo
+        """
+        self.window = window
+        self.buckets = buckets
+        self.width = window / buckets
+        self.max_keys = max_keys
+        self._keys: 'OrderedDict[Hashable, list]' = OrderedDict()
+
+    def add(self, key: Hashable, timestamp: float, count: int = 1) -> int:
+        """
+        Suma eventos de una clave
+
+        Args:
+            key: Clave del contador (IP, usuario...)
+            timestamp: Epoch del evento
+            count: Número de eventos
+
+        Returns:
+            int: Eventos de la clave dentro de la ventana que termina en su evento más reciente
+        """
+        indice = int(timestamp // self.width)
+        estado = self._keys.get(key)
+        if estado is None:
+            estado = self._keys[key] = [[0] * self.buckets, 0, indice]
+            if len(self._keys) > self.max_keys:
+                self._keys.popitem(last=False)
+        else:
+            self._keys.move_to_end(key)
+
+        cubetas, total, ultimo = estado
+        if indice > ultimo:
+            if indice - ultimo >= self.buckets:
+                cubetas[:] = [0] * self.buckets
+                total = 0
+            else:
+                # Se vacían los intervalos que salen de la ventana
+                for i in range(ultimo + 1, indice + 1):
+                    total -= cubetas[i % self.buckets]
+                    cubetas[i % self.buckets] = 0
+            estado[2] = indice
+        elif indice <= ultimo - self.buckets:
+            return total
+        cubetas[indice % self.buckets] += count
+        estado[1] = total + count
+        return estado[1]
+
+    def count(self, key: Hashable) -> int:
+        """Eventos de una clave en la ventana de su evento más reciente"""
+        estado = self._keys.get(key)
+        return estado[1] if estado else 0
+
+    def __len__(self) -> int:
+        return len(self._keys)
@@ -1,22 +1,60 @@
 #!/usr/bin/env python3
 import os
 import sys
-import hashlib
-import pefile
-import magic
+import argparse
 import json
 import yara
-import pandas as pd
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor, wait, FIRST_COMPLETED
 from datetime import datetime
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional, Iterator, Tuple
+from scripts.utilidades.common import (DirectoryWalker, FileRecord, HashEngine, StreamingReportWriter,
+                                       add_walker_arguments, map_file, walker_from_args)
+from scripts.utilidades.scan_cache import ScanCache, ruleset_version
+from scripts.utilidades.yara_rules import LiteralMatcher
+from scripts.utilidades.pe_inspector import PEInspector
+from scripts.utilidades.file_type import FileTypeDetector
+from scripts.utilidades.entropy import HIGH_ENTROPY, EntropyProfile, section_entropy
+from scripts.utilidades.fuzzy_hash import DEFAULT_THRESHOLD, FuzzyHashIndex, TLSHDigest
+from scripts.utilidades.containers import ContainerLimits, ExtractionBudget, container_kind, iter_members
+from scripts.utilidades.scan_priority import ScanScheduler, parse_duration
+
+REPORT_FIELDS = ['file_path', 'file_type', 'md5_hash', 'analysis_time', 'suspicious_strings',
+                 'yara_matches', 'pe_analysis', 'entropy', 'tlsh', 'similar_samples', 'container', 'risk_score']
+
+SUSPICIOUS_EXTENSIONS = ('.exe', '.dll', '.sys', '.bat', '.ps1', '.vbs', '.js', '.jar')
+
+# Archives and mail whose members are scanned recursively
+CONTAINER_EXTENSIONS = ('.zip', '.7z', '.gz', '.tgz', '.tar', '.eml', '.apk',
+                        '.docx', '.docm', '.xlsx', '.xlsm', '.pptx', '.pptm')
+
+# Number of inner-member verdicts kept in memory, keyed by MD5
+MEMBER_CACHE_SIZE = 4096
+
+# Formats whose content is compressed by design, so high entropy says nothing about them
+COMPRESSED_TYPES = ('zip', 'archive', 'compressed', '2007+', 'pdf', 'image data')
 
 class MalwareDetector:
-    def __init__(self):
+    def __init__(self, walker: Optional[DirectoryWalker] = None, fuzzy_index: Optional[str] = None,
+                 container_limits: Optional[ContainerLimits] = None):
+        self.walker = walker or DirectoryWalker()
+        # Archive members are scanned in memory within these limits (depth, zip-bomb ratio, bytes)
+        self.container_limits = container_limits or ContainerLimits()
+        self._member_cache: 'OrderedDict[Tuple[str, Optional[str]], Dict[str, Any]]' = OrderedDict()
+        # Known samples matched by TLSH similarity, so recompiled variants are still recognised
+        self.fuzzy_index_dir = fuzzy_index
+        self.fuzzy_index = FuzzyHashIndex(fuzzy_index) if fuzzy_index else None
+        self.hash_engine = HashEngine(["md5"])
+        # Feeds entropy and TLSH alone when the MD5 of a member is already known
+        self.consumer_engine = HashEngine([])
+        self.pe_inspector = PEInspector()
+        self.file_types = FileTypeDetector()
         self.suspicious_strings = [
             "http://", "https://", "cmd.exe", "powershell",
             "regsvr32", "schtasks", "wscript", "cscript",
             "net user", "net group", "net localgroup"
         ]
+        self.string_matcher = LiteralMatcher(self.suspicious_strings)
         
         # Basic YARA rules
         self.yara_rules = """
@@ -30,69 +68,92 @@ class MalwareDetector:
         }
         """
         
+        # Any change to the rules invalidates cached verdicts
+        self.ruleset_version = ruleset_version(self.yara_rules, self.suspicious_strings,
+                                               {'high_entropy': HIGH_ENTROPY},
+                                               self.container_limits._asdict(),
+                                               self.fuzzy_index.version if self.fuzzy_index else None)
         self.yara_rules = yara.compile(source=self.yara_rules)
 
-    def calculate_file_hash(self, file_path: str) -> str:
-        """Calculates the MD5 hash of a file."""
+    def calculate_file_hash(self, file_path: str, data=None, consumers=()) -> str:
+        """Calculates the MD5 hash of a file (or of its already mapped data).
+
+        Consumers (e.g. an EntropyProfile) receive the same chunks as the digest.
+        """
         try:
-            with open(file_path, 'rb') as f:
-                file_hash = hashlib.md5()
-                while chunk := f.read(8192):
-                    file_hash.update(chunk)
-            return file_hash.hexdigest()
+            if data is not None:
+                return self.hash_engine.hash_buffer(data, consumers)['md5']
+            return self.hash_engine.hash_file(file_path, consumers)['md5']
         except Exception as e:
             print(f"Error calculating hash: {e}")
             return ""
 
-    def analyze_strings(self, file_path: str) -> List[str]:
-        """Analyzes strings in an executable file."""
-        suspicious_found = []
+    def analyze_strings(self, file_path: str, data=None) -> List[str]:
+        """Analyzes strings in an executable file.
+
+        All suspicious strings are matched case-insensitively in a single pass
+        over the raw bytes; data can be an already mapped buffer of the file.
+        """
         try:
-            with open(file_path, 'rb') as f:
-                content = f.read()
-                for string in self.suspicious_strings:
-                    if string.encode() in content:
-                        suspicious_found.append(string)
+            if data is None:
+                with map_file(file_path) as data:
+                    return self.string_matcher.match(data)
+            return self.string_matcher.match(data)
         except Exception as e:
             print(f"Error analyzing strings: {e}")
-        return suspicious_found
+        return []
+
+    def analyze_pe_file(self, file_path: str, data=None, digest: str = None) -> Dict[str, Any]:
+        """Analyzes a PE file and extracts relevant information.
 
-    def analyze_pe_file(self, file_path: str) -> Dict[str, Any]:
-        """Analyzes a PE file and extracts relevant information."""
+        Only the headers and the import directory are parsed, from the already
+        mapped data when available; results are cached per digest.
+        """
         try:
-            pe = pefile.PE(file_path)
+            if data is None:
+                with map_file(file_path) as data:
+                    pe = self.pe_inspector.inspect(data, digest, directories=('imports',))
+            else:
+                pe = self.pe_inspector.inspect(data, digest, directories=('imports',))
             info = {
                 'file_type': 'PE',
-                'machine_type': hex(pe.FILE_HEADER.Machine),
-                'timestamp': datetime.fromtimestamp(pe.FILE_HEADER.TimeDateStamp).strftime('%Y-%m-%d %H:%M:%S'),
+                'machine_type': hex(pe['machine']),
+                'timestamp': datetime.fromtimestamp(pe['timestamp']).strftime('%Y-%m-%d %H:%M:%S'),
                 'sections': [],
                 'imports': [],
                 'suspicious_characteristics': []
             }
 
-            # Analyze sections
-            for section in pe.sections:
+            # Analyze sections (entropy is computed over the mapped raw data of each one)
+            ranges = [(section['raw_offset'], section['raw_size']) for section in pe['sections']]
+            if data is None:
+                with map_file(file_path) as data:
+                    entropies = section_entropy(data, ranges)
+            else:
+                entropies = section_entropy(data, ranges)
+            for section, entropy in zip(pe['sections'], entropies):
                 section_info = {
-                    'name': section.Name.decode().rstrip('\x00'),
-                    'virtual_address': hex(section.VirtualAddress),
-                    'virtual_size': hex(section.Misc_VirtualSize),
-                    'raw_size': hex(section.SizeOfRawData),
-                    'characteristics': hex(section.Characteristics)
+                    'name': section['name'],
+                    'virtual_address': hex(section['virtual_address']),
+                    'virtual_size': hex(section['virtual_size']),
+                    'raw_size': hex(section['raw_size']),
+                    'characteristics': hex(section['characteristics']),
+                    'entropy': entropy
                 }
                 info['sections'].append(section_info)
 
                 # Detect suspicious characteristics
-                if section.Characteristics & 0x20000000:  # IMAGE_SCN_MEM_EXECUTE
-                    if section.Characteristics & 0x40000000:  # IMAGE_SCN_MEM_WRITE
+                if section['characteristics'] & 0x20000000:  # IMAGE_SCN_MEM_EXECUTE
+                    if section['characteristics'] & 0x40000000:  # IMAGE_SCN_MEM_WRITE
                         info['suspicious_characteristics'].append('Executable and writable section')
+                    if entropy >= HIGH_ENTROPY:
+                        info['suspicious_characteristics'].append(
+                            f"High entropy executable section {section['name']} (possible packer)")
 
             # Analyze imports
-            if hasattr(pe, 'DIRECTORY_ENTRY_IMPORT'):
-                for entry in pe.DIRECTORY_ENTRY_IMPORT:
-                    dll_name = entry.dll.decode()
-                    for imp in entry.imports:
-                        if imp.name:
-                            info['imports'].append(f"{dll_name}:{imp.name.decode()}")
+            for dll_name, functions in pe['imports']:
+                for function in functions:
+                    info['imports'].append(f"{dll_name}:{function}")
 
             # Detect packers
             if len(info['sections']) < 3:
@@ -103,27 +164,74 @@ class MalwareDetector:
             print(f"Error analyzing PE file: {e}")
             return {}
 
+    def analyze_entropy(self, profile: EntropyProfile, file_type: str) -> Dict[str, Any]:
+        """Turns the entropy gathered while hashing into report findings.
+
+        A high overall entropy points to a packed or encrypted file, and a
+        high-entropy region inside an otherwise ordinary file to an embedded
+        encrypted payload. Formats that are compressed by design are not flagged.
+        """
+        info = profile.summary()
+        info['findings'] = []
+        if any(kind in file_type.lower() for kind in COMPRESSED_TYPES):
+            info['high_entropy_regions'] = []
+        elif info['file'] >= HIGH_ENTROPY:
+            info['findings'].append('High overall entropy (packed or encrypted content)')
+        elif info['high_entropy_regions']:
+            info['findings'].append('Embedded high-entropy region (possible encrypted payload)')
+        return info
+
     def scan_file(self, file_path: str) -> Dict[str, Any]:
         """Scans an individual file and generates a report."""
+        # The file is opened and mapped once for hashing, entropy, strings, YARA and PE parsing
+        with map_file(file_path) as data:
+            return self._scan_data(file_path, data, 0, ExtractionBudget(self.container_limits))
+
+    def _scan_data(self, file_path: str, data, depth: int, budget: ExtractionBudget,
+                   md5_hash: Optional[str] = None) -> Dict[str, Any]:
+        """Scans the content of a file or of an archive member already in memory.
+
+        md5_hash is the digest of data when the caller already computed it.
+        """
+        entropy = EntropyProfile()
+        fuzzy = TLSHDigest()
+        if md5_hash is None:
+            md5_hash = self.calculate_file_hash(file_path, data, [entropy, fuzzy])
+        else:
+            self.consumer_engine.hash_buffer(data, [entropy, fuzzy])
         report = {
             'file_path': file_path,
-            'file_type': magic.from_file(file_path),
-            'md5_hash': self.calculate_file_hash(file_path),
+            'file_type': self.file_types.from_buffer(data, md5_hash),
+            'md5_hash': md5_hash,
             'analysis_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
             'suspicious_strings': [],
             'yara_matches': [],
             'pe_analysis': {},
+            'entropy': {},
+            'tlsh': fuzzy.hexdigest(),
+            'similar_samples': [],
+            'container': {},
             'risk_score': 0
         }
 
+        # Similarity to known samples
+        if self.fuzzy_index is not None and report['tlsh']:
+            report['similar_samples'] = self.fuzzy_index.query(report['tlsh'], DEFAULT_THRESHOLD)
+            if report['similar_samples']:
+                report['risk_score'] += 25
+
+        # Entropy analysis
+        report['entropy'] = self.analyze_entropy(entropy, report['file_type'])
+        report['risk_score'] += len(report['entropy']['findings']) * 10
+
         # String analysis
-        report['suspicious_strings'] = self.analyze_strings(file_path)
+        report['suspicious_strings'] = self.analyze_strings(file_path, data)
         if report['suspicious_strings']:
             report['risk_score'] += len(report['suspicious_strings']) * 5
 
         # YARA analysis
         try:
-            matches = self.yara_rules.match(file_path)
+            matches = self.yara_rules.match(data=data) if len(data) else []
             report['yara_matches'] = [str(match) for match in matches]
             if matches:
                 report['risk_score'] += len(matches) * 10
@@ -132,32 +240,227 @@ class MalwareDetector:
 
         # PE analysis
         if report['file_type'].startswith('PE32'):
-            report['pe_analysis'] = self.analyze_pe_file(file_path)
+            report['pe_analysis'] = self.analyze_pe_file(file_path, data, report['md5_hash'])
             if report['pe_analysis'].get('suspicious_characteristics'):
                 report['risk_score'] += len(report['pe_analysis']['suspicious_characteristics']) * 15
 
+        # Container analysis
+        kind = container_kind(data, file_path)
+        if kind is not None:
+            report['container'] = self.analyze_container(file_path, data, kind, depth, budget)
+            report['risk_score'] += report['container'].pop('risk_score')
+
         return report
 
-    def scan_directory(self, directory: str) -> List[Dict[str, Any]]:
-        """Scans a directory for suspicious files."""
-        suspicious_extensions = ['.exe', '.dll', '.sys', '.bat', '.ps1', '.vbs', '.js', '.jar']
-        reports = []
+    def analyze_container(self, file_path: str, data, kind: str, depth: int,
+                          budget: ExtractionBudget) -> Dict[str, Any]:
+        """Scans the members of an archive recursively without writing them to disk.
+
+        Members are decompressed in chunks straight into memory and scanned
+        like any other file, under 'outer!inner' paths. The budget is shared by
+        the whole archive tree, so nesting cannot get around the limits.
+        Verdicts of inner members are cached by MD5, since the same payload is
+        often found in many archives. The container takes the risk of its
+        riskiest member, plus 20 when a zip bomb is detected.
+        """
+        info = {'type': kind, 'members_scanned': 0, 'flagged_members': [], 'warnings': [], 'risk_score': 0}
+        if depth >= self.container_limits.max_depth:
+            budget.warn(f"Nesting deeper than {self.container_limits.max_depth} levels was not scanned")
+        else:
+            for member in iter_members(data, file_path, budget, kind):
+                member_path = f"{file_path}!{member.name}"
+                member_report = self._scan_member(member_path, member.data, depth + 1, budget)
+                info['members_scanned'] += 1
+                if member_report['risk_score'] > 0:
+                    info['flagged_members'].append(member_report)
+                    info['risk_score'] = max(info['risk_score'], member_report['risk_score'])
+        if depth == 0:
+            # Warnings of every level are reported once, on the outermost archive
+            info['warnings'] = list(budget.warnings)
+            if budget.ratio_exceeded:
+                info['risk_score'] += 20
+        return info
 
-        for root, _, files in os.walk(directory):
-            for file in files:
-                if any(file.lower().endswith(ext) for ext in suspicious_extensions):
-                    file_path = os.path.join(root, file)
-                    try:
-                        report = self.scan_file(file_path)
-                        if report['risk_score'] > 0:  # Only include files with some risk
-                            reports.append(report)
-                    except Exception as e:
-                        print(f"Error analyzing {file_path}: {e}")
+    def _scan_member(self, member_path: str, data: bytes, depth: int, budget: ExtractionBudget) -> Dict[str, Any]:
+        """Scans an archive member, reusing the cached verdict of identical content."""
+        md5_hash = self.hash_engine.hash_buffer(data)['md5']
+        # The same bytes can be a container under one name only (e.g. a .eml member)
+        key = (md5_hash, container_kind(data, member_path))
+        cached = self._member_cache.get(key)
+        if cached is not None:
+            self._member_cache.move_to_end(key)
+            return dict(cached, file_path=member_path)
+        report = self._scan_data(member_path, data, depth, budget, md5_hash)
+        # Nested containers depend on the remaining budget, so only leaf verdicts are cached
+        if not report['container']:
+            self._member_cache[key] = report
+            if len(self._member_cache) > MEMBER_CACHE_SIZE:
+                self._member_cache.popitem(last=False)
+        return report
+
+    def iter_candidates(self, directory: str) -> Iterator[FileRecord]:
+        """Yields the files of a directory worth scanning, with the stat taken while walking.
 
+        Files are selected by extension unless the walker has its own include globs.
+        """
+        for record in self.walker.walk(directory):
+            name = record.name.lower()
+            if self.walker.include or name.endswith(SUSPICIOUS_EXTENSIONS) or name.endswith(CONTAINER_EXTENSIONS):
+                yield record
+
+    def scan_batch(self, file_paths: List[str]) -> List[Tuple[str, Optional[Dict[str, Any]], Optional[str]]]:
+        """Scans a batch of files, returning (path, report, error) for each one."""
+        results = []
+        for file_path in file_paths:
+            try:
+                results.append((file_path, self.scan_file(file_path), None))
+            except Exception as e:
+                results.append((file_path, None, str(e)))
+        return results
+
+    def iter_scan(self, directory: str, cache: Optional[ScanCache] = None, workers: int = 1,
+                  ordered: bool = False, batch_size: int = 16,
+                  scheduler: Optional[ScanScheduler] = None) -> Iterator[Dict[str, Any]]:
+        """Scans a directory, yielding every report as soon as it is available.
+
+        With workers > 1 the paths are streamed into a process pool in batches.
+        Each worker compiles the YARA rules once at start-up and at most
+        workers * 2 batches are in flight, so memory stays flat regardless of
+        the tree size. Reports follow walk order when ordered is True.
+
+        With a scheduler the whole tree is walked first and files are scanned
+        highest-risk first (ordered then keeps that order) until its time
+        budget runs out; batches already submitted are still completed.
+        """
+        stats = {}
+
+        def pending_batches():
+            # A batch holds the paths to scan and, when ordered, the cached reports
+            # walked between them, so those keep their place in the output
+            batch = []
+            paths = 0
+            records = self.iter_candidates(directory)
+            if scheduler is not None:
+                records = scheduler.schedule(records)
+            for record in records:
+                file_path = record.path
+                if cache is not None:
+                    report = cache.get(file_path, record.stat)
+                    if report is not None:
+                        if ordered and batch:
+                            batch.append(report)
+                        else:
+                            yield report
+                        continue
+                    stats[file_path] = record.stat
+                batch.append(file_path)
+                paths += 1
+                if paths >= batch_size:
+                    yield batch
+                    batch = []
+                    paths = 0
+            if batch:
+                yield batch
+
+        def scan_paths(batch):
+            return [item for item in batch if not isinstance(item, dict)]
+
+        def collect(batch, results):
+            results = iter(results)
+            for item in batch:
+                if isinstance(item, dict):
+                    yield item
+                    continue
+                file_path, report, error = next(results)
+                st = stats.pop(file_path, None)
+                if error is not None:
+                    print(f"Error analyzing {file_path}: {error}")
+                    continue
+                if st is not None:
+                    cache.put(file_path, st, report)
+                yield report
+
+        try:
+            if workers <= 1:
+                for item in pending_batches():
+                    if isinstance(item, dict):
+                        yield item
+                    else:
+                        yield from collect(item, self.scan_batch(scan_paths(item)))
+                return
+
+            max_in_flight = workers * 2
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                     initargs=(self.fuzzy_index_dir, self.container_limits)) as executor:
+                # Futures mapped to their batches, in submission order
+                in_flight: 'OrderedDict[Future, list]' = OrderedDict()
+                for item in pending_batches():
+                    if isinstance(item, dict):
+                        if ordered and in_flight:
+                            # Queue the cached report behind the batches walked before it
+                            cached = Future()
+                            cached.set_result([])
+                            in_flight[cached] = [item]
+                        else:
+                            yield item
+                        continue
+                    in_flight[executor.submit(_scan_batch_in_worker, scan_paths(item))] = item
+                    # Backpressure: wait for results before walking any further
+                    while len(in_flight) >= max_in_flight:
+                        if ordered:
+                            future, batch = in_flight.popitem(last=False)
+                            yield from collect(batch, future.result())
+                        else:
+                            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                            for future in done:
+                                yield from collect(in_flight.pop(future), future.result())
+                while in_flight:
+                    future, batch = in_flight.popitem(last=False)
+                    yield from collect(batch, future.result())
+        finally:
+            if cache is not None:
+                cache.commit()
+
+    def scan_directory(self, directory: str, cache: Optional[ScanCache] = None, workers: int = 1,
+                       ordered: bool = False, scheduler: Optional[ScanScheduler] = None) -> List[Dict[str, Any]]:
+        """Scans a directory for suspicious files.
+
+        When a cache is given, files whose stat fingerprint and ruleset version
+        are unchanged since the previous scan reuse their stored report.
+        """
+        reports = []
+        for report in self.iter_scan(directory, cache, workers, ordered, scheduler=scheduler):
+            if report['risk_score'] > 0:  # Only include files with some risk
+                reports.append(report)
         return reports
 
+    def stream_report(self, directory: str, output_file: str, cache: Optional[ScanCache] = None,
+                      workers: int = 1, ordered: bool = False,
+                      scheduler: Optional[ScanScheduler] = None) -> Dict[str, Any]:
+        """Scans a directory writing each risky report to JSONL and CSV as it arrives.
+
+        Nothing is accumulated in memory and the files are fsynced periodically,
+        so a crash keeps everything written so far. A summary record closes
+        the JSONL file, with the scheduler coverage when one is used.
+        """
+        summary = {'directory': directory, 'started': datetime.now().isoformat(),
+                   'scanned_files': 0, 'flagged_files': 0}
+        with StreamingReportWriter(output_file, csv_fields=REPORT_FIELDS) as writer:
+            for report in self.iter_scan(directory, cache, workers, ordered, scheduler=scheduler):
+                summary['scanned_files'] += 1
+                if report['risk_score'] > 0:  # Only include files with some risk
+                    summary['flagged_files'] += 1
+                    writer.write(report)
+            summary['finished'] = datetime.now().isoformat()
+            if scheduler is not None:
+                summary['coverage'] = scheduler.coverage()
+            writer.close(summary)
+        return summary
+
     def generate_report(self, reports: List[Dict[str, Any]], output_file: str):
         """Generates a report in JSON and CSV format."""
+        import pandas as pd
+
         # JSON report
         with open(output_file + '.json', 'w') as f:
             json.dump(reports, f, indent=4)
@@ -166,24 +469,73 @@ class MalwareDetector:
         df = pd.DataFrame(reports)
         df.to_csv(output_file + '.csv', index=False)
 
+# Per-process detector used by the scan pool, so YARA rules are compiled
+# once per worker instead of being pickled with every task.
+_worker_detector = None
+
+def _init_worker(fuzzy_index: Optional[str] = None, container_limits: Optional[ContainerLimits] = None):
+    global _worker_detector
+    _worker_detector = MalwareDetector(fuzzy_index=fuzzy_index, container_limits=container_limits)
+
+def _scan_batch_in_worker(file_paths: List[str]):
+    return _worker_detector.scan_batch(file_paths)
+
 def main():
-    if len(sys.argv) != 2:
-        print("Usage: python malware_detector.py <directory>")
-        sys.exit(1)
+    parser = argparse.ArgumentParser(description='Malware Detector')
+    parser.add_argument('directory', help='Directory to scan')
+    parser.add_argument('--cache', help='SQLite scan cache used to skip unchanged files')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Number of scanning processes (default: 1)')
+    parser.add_argument('--ordered', action='store_true',
+                        help='Keep reports in walk order when using several workers')
+    parser.add_argument('--stream', action='store_true',
+                        help='Write JSONL/CSV reports incrementally instead of at the end')
+    parser.add_argument('--fuzzy-index',
+                        help='TLSH similarity index of known samples (see fuzzy_hash.py)')
+    parser.add_argument('--prioritize', action='store_true',
+                        help='Scan the files most likely to be malicious first')
+    parser.add_argument('--budget', type=parse_duration,
+                        help='Time budget such as 30m or 2h; implies --prioritize and reports the coverage')
+    parser.add_argument('--container-depth', type=int, default=ContainerLimits().max_depth,
+                        help='Nesting levels of archives scanned in memory (0 disables it)')
+    add_walker_arguments(parser)
+    args = parser.parse_args()
 
-    directory = sys.argv[1]
+    directory = args.directory
     if not os.path.isdir(directory):
         print(f"Error: {directory} is not a valid directory")
         sys.exit(1)
 
-    detector = MalwareDetector()
-    reports = detector.scan_directory(directory)
-    
+    detector = MalwareDetector(walker_from_args(args), args.fuzzy_index,
+                               ContainerLimits(max_depth=args.container_depth))
+    cache = ScanCache(args.cache, detector.ruleset_version) if args.cache else None
+    scheduler = None
+    if args.prioritize or args.budget is not None:
+        scheduler = ScanScheduler(budget=args.budget, previous_risks=cache.risk_scores() if cache else None)
     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
     output_file = f"malware_scan_report_{timestamp}"
-    
-    detector.generate_report(reports, output_file)
-    print(f"Report generated: {output_file}.json and {output_file}.csv")
+
+    try:
+        if args.stream:
+            detector.stream_report(directory, output_file, cache, args.workers, args.ordered, scheduler)
+            print(f"Report generated: {output_file}.jsonl and {output_file}.csv")
+        else:
+            reports = detector.scan_directory(directory, cache, args.workers, args.ordered, scheduler)
+            detector.generate_report(reports, output_file)
+            print(f"Report generated: {output_file}.json and {output_file}.csv")
+    finally:
+        if cache is not None:
+            cache.close()
+
+    if scheduler is not None:
+        coverage = scheduler.coverage()
+        print(f"Coverage: {coverage['scheduled']} of {coverage['candidates']} files scanned "
+              f"in {coverage['elapsed_seconds']}s")
+        if not coverage['complete']:
+            print(f"Budget exhausted: {coverage['skipped']} files not scanned "
+                  f"(highest pending score {coverage['max_skipped_score']})")
+            with open(output_file + '_coverage.json', 'w') as f:
+                json.dump(coverage, f, indent=4)
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
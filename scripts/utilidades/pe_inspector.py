@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Inspección perezosa de archivos PE
+Este módulo parsea ejecutables PE con fast_load sobre los bytes ya mapeados
+por el escáner, procesa únicamente los directorios de datos que cada análisis
+necesita y guarda el resultado por hash para no repetir el trabajo.
+"""
+
+from collections import OrderedDict
+from typing import Dict, Any, Iterable, Optional
+
+import pefile
+
+# Directorios de datos soportados y su entrada en pefile
+PE_DIRECTORIES = {
+    'imports': 'IMAGE_DIRECTORY_ENTRY_IMPORT',
+    'exports': 'IMAGE_DIRECTORY_ENTRY_EXPORT',
+    'resources': 'IMAGE_DIRECTORY_ENTRY_RESOURCE',
+}
+
+class PEInspector:
+    """Parser PE perezoso con caché de resultados por hash de la muestra"""
+
+    def __init__(self, max_entries: int = 1024):
+        """
+        Args:
+            max_entries: Número máximo de muestras guardadas en la caché
+        """
+        self.max_entries = max_entries
+        self._cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+    @staticmethod
+    def _parse_headers(pe: pefile.PE) -> Dict[str, Any]:
+        """Extrae cabeceras y secciones, disponibles sin parsear directorios"""
+        return {
+            'machine': pe.FILE_HEADER.Machine,
+            'timestamp': pe.FILE_HEADER.TimeDateStamp,
+            'entry_point': pe.OPTIONAL_HEADER.AddressOfEntryPoint,
+            'image_base': pe.OPTIONAL_HEADER.ImageBase,
+            'sections': [
+                {
+                    'name': section.Name.decode(errors='replace').rstrip('\x00'),
+                    'virtual_address': section.VirtualAddress,
+                    'virtual_size': section.Misc_VirtualSize,
+                    'raw_offset': section.PointerToRawData,
+                    'raw_size': section.SizeOfRawData,
+                    'characteristics': section.Characteristics
+                }
+                for section in pe.sections
+            ]
+        }
+
+    @staticmethod
+    def _parse_directory(pe: pefile.PE, directory: str) -> Any:
+        """Extrae el contenido de un directorio de datos ya parseado"""
+        if directory == 'imports':
+            return [
+                (entry.dll.decode(errors='replace'),
+                 [imp.name.decode(errors='replace') for imp in entry.imports if imp.name])
+                for entry in getattr(pe, 'DIRECTORY_ENTRY_IMPORT', [])
+            ]
+        if directory == 'exports':
+            if not hasattr(pe, 'DIRECTORY_ENTRY_EXPORT'):
+                return []
+            return [exp.name.decode(errors='replace') for exp in pe.DIRECTORY_ENTRY_EXPORT.symbols if exp.name]
+        if directory == 'resources':
+            if not hasattr(pe, 'DIRECTORY_ENTRY_RESOURCE'):
+                return []
+            return [str(entry.name) for entry in pe.DIRECTORY_ENTRY_RESOURCE.entries if entry.name]
+        raise ValueError(f"Directorio PE no soportado: {directory}")
+
+    def inspect(self, data, digest: Optional[str] = None, directories: Iterable[str] = ()) -> Dict[str, Any]:
+        """
+        Inspecciona un PE parseando solo lo necesario
+
+        Args:
+            data: Bytes del archivo (bytes o mmap ya abierto por el escáner)
+            digest: Hash de la muestra usado como clave de caché
+            directories: Directorios requeridos ('imports', 'exports', 'resources')
+
+        Returns:
+            Dict[str, Any]: Cabeceras, secciones y los directorios solicitados
+                (con 'imports' se incluye también 'imphash')
+
+        Raises:
+            pefile.PEFormatError: Si los datos no son un PE válido
+        """
+        info = self._cache.get(digest) if digest else None
+        faltantes = [d for d in directories if info is None or d not in info]
+
+        if info is None or faltantes:
+            pe = pefile.PE(data=data, fast_load=True)
+            try:
+                if info is None:
+                    info = self._parse_headers(pe)
+                if faltantes:
+                    pe.parse_data_directories(directories=[
+                        pefile.DIRECTORY_ENTRY[PE_DIRECTORIES[d]] for d in faltantes
+                    ])
+                    for directory in faltantes:
+                        info[directory] = self._parse_directory(pe, directory)
+                    if 'imports' in faltantes:
+                        # Imphash de pefile (incluye los imports por ordinal)
+                        info['imphash'] = pe.get_imphash()
+            finally:
+                # El PE no debe sobrevivir al mapeo que le presta los bytes
+                pe.close()
+
+        if digest:
+            self._cache[digest] = info
+            self._cache.move_to_end(digest)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+        return info
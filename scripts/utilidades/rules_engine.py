@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Motor de reglas de atributos de archivo
+Este módulo evalúa reglas declarativas (definidas en config.yaml) sobre lotes
+de archivos. Los predicados numéricos (modo, tamaño) se evalúan con NumPy
+sobre columnas y los de nombre buscando cada literal con str.find sobre un
+único texto con los nombres de todo el lote, de modo que el coste depende del
+número de coincidencias y no del número de archivos.
+"""
+
+import re
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from scripts.utilidades.common import Config
+
+# Separador de nombres en el texto del lote: no puede aparecer en un nombre de archivo
+SEPARATOR = "\x00"
+
+RULE_KEYS = {'reason', 'extensions', 'name_contains', 'name_startswith', 'name_regex',
+             'path_contains', 'modes', 'mode_bits', 'min_size', 'max_size', 'case_sensitive'}
+
+class _CompiledRule:
+    """Regla con sus predicados ya compilados"""
+
+    def __init__(self, rule: Dict[str, Any]):
+        desconocidas = set(rule) - RULE_KEYS
+        if desconocidas or 'reason' not in rule:
+            raise ValueError(f"Regla inválida {rule}: claves desconocidas {sorted(desconocidas)}")
+        self.reason = rule['reason']
+        self.nocase = not rule.get('case_sensitive', False)
+
+        def literales(clave):
+            valores = rule.get(clave) or []
+            return [v.lower() if self.nocase else v for v in valores]
+
+        # Predicados de nombre: (modo de búsqueda, literales); basta con un literal por predicado
+        self.name_predicates: List[Tuple[str, List[str]]] = [
+            (modo, literales(clave))
+            for clave, modo in (('extensions', 'suffix'), ('name_startswith', 'prefix'),
+                                ('name_contains', 'contains'))
+            if rule.get(clave)
+        ]
+        self.path_contains = literales('path_contains')
+        self.name_regex = (re.compile(rule['name_regex'], 0 if not self.nocase else re.IGNORECASE)
+                           if rule.get('name_regex') else None)
+
+        self.modes = np.array([int(str(m), 8) for m in rule.get('modes') or []], dtype=np.uint32)
+        self.mode_bits = int(str(rule['mode_bits']), 8) if rule.get('mode_bits') else 0
+        self.min_size = rule.get('min_size')
+        self.max_size = rule.get('max_size')
+
+def _find_all(text: str, needle: str) -> List[int]:
+    """Posiciones de todas las apariciones de un literal (búsqueda en C)"""
+    positions = []
+    pos = text.find(needle)
+    while pos != -1:
+        positions.append(pos)
+        pos = text.find(needle, pos + 1)
+    return positions
+
+def _match_literals(mode: str, literals: List[str], text: str, starts: np.ndarray, size: int) -> np.ndarray:
+    """
+    Registros del lote cuyo valor contiene, empieza o termina por alguno de los literales
+
+    En modo 'suffix' hace falta al menos un carácter antes del literal, como en
+    Path.suffix, para que ".exe" no se considere la extensión de ".exe".
+    """
+    positions: List[int] = []
+    for literal in literals:
+        if mode == 'contains':
+            positions += _find_all(text, literal)
+        elif mode == 'prefix':
+            if text.startswith(literal):
+                positions.append(0)
+            positions += [p + 1 for p in _find_all(text, SEPARATOR + literal)]
+        else:
+            fin = _find_all(text, literal + SEPARATOR)
+            if text.endswith(literal):
+                fin.append(len(text) - len(literal))
+            positions += [p for p in fin if p > 0 and text[p - 1] != SEPARATOR]
+
+    mask = np.zeros(size, dtype=bool)
+    if positions:
+        mask[np.searchsorted(starts, np.array(positions, dtype=np.int64), side='right') - 1] = True
+    return mask
+
+class AttributeRuleEngine:
+    """Evaluación vectorizada de reglas de atributos sobre lotes de archivos"""
+
+    def __init__(self, rules: Optional[Iterable[Dict[str, Any]]] = None,
+                 default_rules: Optional[Iterable[Dict[str, Any]]] = None):
+        """
+        Args:
+            rules: Reglas a evaluar (por defecto la sección filesystem_rules de config.yaml)
+            default_rules: Reglas usadas si la configuración no define ninguna
+
+        Cada regla es un diccionario con 'reason' y uno o más predicados que se
+        deben cumplir a la vez: extensions, name_contains, name_startswith,
+        name_regex, path_contains, modes (octal, p. ej. "777"), mode_bits
+        (cualquier bit, p. ej. "4000"), min_size, max_size y case_sensitive.
+        """
+        if rules is None:
+            rules = Config().get("filesystem_rules") or default_rules or []
+        self.rules = [_CompiledRule(rule) for rule in rules]
+        self.reasons = [rule.reason for rule in self.rules]
+
+    @staticmethod
+    def _text(values: Sequence[str], lower: bool):
+        """Une los valores del lote en un solo texto y calcula el inicio de cada uno"""
+        text = SEPARATOR.join(values)
+        if lower:
+            if text.isascii():
+                text = text.lower()
+            else:
+                # lower() puede cambiar la longitud ('İ' pasa a dos caracteres): los
+                # inicios se calculan sobre los valores ya en minúsculas
+                values = [value.lower() for value in values]
+                text = SEPARATOR.join(values)
+        lengths = np.fromiter(map(len, values), dtype=np.int64, count=len(values))
+        starts = np.zeros(len(values), dtype=np.int64)
+        np.cumsum(lengths[:-1] + 1, out=starts[1:])
+        return text, starts
+
+    def evaluate(self, names: Sequence[str], modes: Optional[np.ndarray] = None,
+                 sizes: Optional[np.ndarray] = None, paths: Optional[Sequence[str]] = None) -> np.ndarray:
+        """
+        Evalúa todas las reglas sobre un lote
+
+        Args:
+            names: Nombres de archivo
+            modes: st_mode de cada archivo (los predicados de modo fallan si falta)
+            sizes: Tamaño de cada archivo
+            paths: Rutas completas (necesarias para path_contains)
+
+        Returns:
+            np.ndarray: Matriz booleana (archivos x reglas)
+        """
+        size = len(names)
+        result = np.ones((size, len(self.rules)), dtype=bool)
+        if not size:
+            return result
+        textos = {}
+
+        def texto(valores, clave, lower):
+            if (clave, lower) not in textos:
+                textos[(clave, lower)] = self._text(valores, lower)
+            return textos[(clave, lower)]
+
+        for j, rule in enumerate(self.rules):
+            columna = result[:, j]
+            for modo, literales in rule.name_predicates:
+                columna &= _match_literals(modo, literales, *texto(names, 'names', rule.nocase), size)
+            if rule.path_contains:
+                columna &= (_match_literals('contains', rule.path_contains,
+                                            *texto(paths, 'paths', rule.nocase), size)
+                            if paths is not None else False)
+            if rule.name_regex is not None:
+                columna &= np.fromiter((rule.name_regex.search(n) is not None for n in names),
+                                       dtype=bool, count=size)
+            if len(rule.modes) or rule.mode_bits:
+                if modes is None:
+                    columna[:] = False
+                else:
+                    if len(rule.modes):
+                        columna &= np.isin(modes & 0o777, rule.modes)
+                    if rule.mode_bits:
+                        columna &= (modes & rule.mode_bits) != 0
+            if rule.min_size is not None or rule.max_size is not None:
+                if sizes is None:
+                    columna[:] = False
+                else:
+                    if rule.min_size is not None:
+                        columna &= sizes >= rule.min_size
+                    if rule.max_size is not None:
+                        columna &= sizes <= rule.max_size
+        return result
+
+    def reasons_for(self, matches: np.ndarray) -> List[List[str]]:
+        """Convierte la matriz de evaluate() en la lista de razones de cada archivo"""
+        razones = [[] for _ in range(len(matches))]
+        for i, j in zip(*np.nonzero(matches)):
+            razones[i].append(self.reasons[j])
+        return razones
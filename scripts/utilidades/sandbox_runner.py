@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Ejecutor de muestras en sandbox
+Este módulo ejecuta muestras sospechosas fuera del bucle de escaneo, en una
+cola con varios trabajadores concurrentes. Cada muestra corre en un proceso
+con límites de CPU, memoria y tiempo (y en espacios de nombres de red, PID y
+montaje propios en Linux cuando unshare está disponible) y su comportamiento
+se entrega de forma asíncrona mediante futures.
+"""
+
+import os
+import sys
+import shutil
+import signal
+import tempfile
+import threading
+import subprocess
+from datetime import datetime
+from concurrent.futures import Future, ThreadPoolExecutor, wait as wait_futures
+from typing import Any, Callable, Dict, List, Optional
+
+import psutil
+from loguru import logger
+
+from scripts.utilidades.common import Config
+
+class SandboxRunner:
+    """Cola de ejecución de muestras con límites por muestra"""
+
+    def __init__(self, workers: Optional[int] = None, timeout: Optional[float] = None,
+                 cpu_time: Optional[int] = None, memory_limit: Optional[int] = None,
+                 interval: float = 1.0, isolate: bool = True):
+        """
+        Args:
+            workers: Muestras ejecutadas a la vez (por defecto sandbox.workers)
+            timeout: Tiempo de observación por muestra en segundos (sandbox.timeout)
+            cpu_time: Límite de tiempo de CPU en segundos (sandbox.cpu_time)
+            memory_limit: Límite de memoria virtual en bytes (sandbox.memory_limit)
+            interval: Intervalo de muestreo del proceso en segundos
+            isolate: Aislar red, PID y montajes con unshare cuando sea posible
+        """
+        config = Config()
+        self.workers = workers or config.get("sandbox.workers", 2)
+        self.timeout = timeout if timeout is not None else config.get("sandbox.timeout", 5)
+        self.cpu_time = cpu_time if cpu_time is not None else config.get("sandbox.cpu_time", 5)
+        self.memory_limit = (memory_limit if memory_limit is not None
+                             else config.get("sandbox.memory_limit", 256 * 1024 * 1024))
+        self.interval = interval
+        self.unshare = self._probe_unshare() if isolate and sys.platform.startswith("linux") else None
+        self.prlimit = shutil.which("prlimit") if os.name == "posix" else None
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="sandbox")
+        self._pendientes: List[Future] = []
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _probe_unshare() -> Optional[str]:
+        """Comprueba que se pueden crear espacios de nombres sin privilegios"""
+        unshare = shutil.which("unshare")
+        if unshare is None:
+            return None
+        try:
+            subprocess.run([unshare, "--user", "--map-root-user", "--net", "--pid", "--fork",
+                            "--mount", "--mount-proc", "true"],
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=5, check=True)
+            return unshare
+        except (OSError, subprocess.SubprocessError):
+            logger.warning("unshare no disponible: las muestras se ejecutarán sin aislamiento de red")
+            return None
+
+    def _command(self, path: str) -> List[str]:
+        """Comando de ejecución de la muestra, aislado y con límites si es posible"""
+        comando = [path]
+        if self.unshare:
+            comando = [self.unshare, "--user", "--map-root-user", "--net", "--pid",
+                       "--fork", "--mount", "--mount-proc"] + comando
+        # Los límites se fijan en el propio proceso antes de exec: preexec_fn no es
+        # seguro con hilos (la cola usa un ThreadPoolExecutor) y aplicarlos desde
+        # el padre tras crear el proceso dejaría correr la muestra sin ellos
+        if self.prlimit:
+            comando = [self.prlimit, f"--cpu={self.cpu_time}", f"--as={self.memory_limit}",
+                       "--core=0", "--"] + comando
+        elif os.name == "posix":
+            comando = ["/bin/sh", "-c",
+                       f'ulimit -t {self.cpu_time} && ulimit -v {self.memory_limit // 1024} '
+                       f'&& ulimit -c 0 && exec "$@"', "sh"] + comando
+        return comando
+
+    @staticmethod
+    def _tree(proceso: psutil.Process) -> List[psutil.Process]:
+        try:
+            return [proceso] + proceso.children(recursive=True)
+        except psutil.NoSuchProcess:
+            return []
+
+    def _observe(self, proceso: psutil.Process, comportamiento: Dict[str, Any]):
+        """Toma una muestra de recursos del árbol de procesos de la muestra"""
+        memoria = 0
+        handles = 0
+        conexiones = []
+        for p in self._tree(proceso):
+            try:
+                with p.oneshot():
+                    memoria += p.memory_info().rss
+                    handles += p.num_handles() if os.name == "nt" else p.num_fds()
+                    conexiones.extend(str(c) for c in getattr(p, 'net_connections', p.connections)())
+            except (psutil.NoSuchProcess, psutil.AccessDenied, AttributeError):
+                continue
+
+        if handles > 50:  # Umbral arbitrario
+            comportamiento['acciones'].append({'tipo': 'handles_excesivos', 'cantidad': handles})
+        if memoria > 100 * 1024 * 1024:  # 100MB
+            comportamiento['acciones'].append({'tipo': 'uso_memoria_alto', 'memoria': memoria})
+        if conexiones:
+            comportamiento['acciones'].append({'tipo': 'conexiones_red', 'conexiones': conexiones})
+
+    def _kill(self, proceso: psutil.Popen):
+        """Termina la muestra y todos sus descendientes"""
+        try:
+            if os.name == "posix":
+                os.killpg(proceso.pid, signal.SIGKILL)
+            else:
+                for p in reversed(self._tree(proceso)):
+                    p.kill()
+        except (ProcessLookupError, psutil.NoSuchProcess, PermissionError):
+            pass
+        try:
+            proceso.wait(timeout=self.interval)
+        except psutil.TimeoutExpired:
+            logger.warning(f"El proceso {proceso.pid} no terminó tras SIGKILL")
+
+    def run(self, path: str) -> Dict[str, Any]:
+        """
+        Ejecuta una muestra y observa su comportamiento
+
+        Args:
+            path: Ruta a la muestra
+
+        Returns:
+            Dict[str, Any]: Comportamiento observado
+        """
+        comportamiento = {
+            'pid': None,
+            'inicio': datetime.now().isoformat(),
+            'aislado': bool(self.unshare),
+            'acciones': []
+        }
+        with tempfile.TemporaryDirectory(prefix="sandbox_") as cwd:
+            proceso = psutil.Popen(
+                self._command(os.path.abspath(str(path))),
+                cwd=cwd,
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                start_new_session=os.name == "posix"
+            )
+            comportamiento['pid'] = proceso.pid
+            transcurrido = 0.0
+            try:
+                while transcurrido < self.timeout:
+                    self._observe(proceso, comportamiento)
+                    try:
+                        proceso.wait(timeout=self.interval)
+                        break
+                    except psutil.TimeoutExpired:
+                        transcurrido += self.interval
+            finally:
+                self._kill(proceso)
+
+            comportamiento['codigo_salida'] = proceso.returncode
+            comportamiento['fin'] = datetime.now().isoformat()
+        return comportamiento
+
+    def _run_safe(self, path: str) -> Optional[Dict[str, Any]]:
+        try:
+            return self.run(path)
+        except Exception as e:
+            logger.error(f"Error en análisis de comportamiento de {path}: {e}")
+            return None
+
+    def submit(self, path: str, callback: Optional[Callable[[Optional[Dict[str, Any]]], None]] = None) -> Future:
+        """
+        Encola una muestra sin bloquear al llamador
+
+        Args:
+            path: Ruta a la muestra
+            callback: Función que recibe el comportamiento (o None) al terminar
+
+        Returns:
+            Future: Resultado futuro del análisis
+        """
+        future = self._executor.submit(self._run_safe, str(path))
+        if callback is not None:
+            future.add_done_callback(lambda f: callback(f.result()))
+        with self._lock:
+            self._pendientes = [f for f in self._pendientes if not f.done()]
+            self._pendientes.append(future)
+        return future
+
+    def wait(self):
+        """Espera a que terminen todas las muestras encoladas"""
+        with self._lock:
+            pendientes = list(self._pendientes)
+        wait_futures(pendientes)
+
+    def shutdown(self, wait: bool = True):
+        """Detiene la cola de ejecución"""
+        self._executor.shutdown(wait=wait)
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Caché persistente de escaneos
+Este módulo guarda en SQLite el veredicto de cada archivo escaneado junto a
+su huella de stat (dispositivo, inodo, tamaño, mtime) y la versión del
+conjunto de reglas, para que los reescaneos solo procesen archivos nuevos
+o modificados.
+"""
+
+import os
+import json
+import sqlite3
+import hashlib
+from pathlib import Path
+from datetime import datetime
+from typing import Dict, Any, Optional, Tuple
+
+from loguru import logger
+
+def ruleset_version(*partes: Any) -> str:
+    """Calcula una versión estable a partir de las reglas y firmas de un escáner"""
+    contenido = json.dumps(partes, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha256(contenido).hexdigest()
+
+def stat_fingerprint(st: os.stat_result) -> Tuple[int, int, int, int]:
+    """Huella de un archivo: (dispositivo, inodo, tamaño, mtime en ns)"""
+    return (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns)
+
+class ScanCache:
+    """Caché de veredictos por ruta invalidada por huella de stat y versión de reglas"""
+
+    def __init__(self, db_path: str, ruleset: str, commit_interval: int = 1000):
+        """
+        Args:
+            db_path: Ruta a la base de datos SQLite
+            ruleset: Versión de las reglas del escáner (ver ruleset_version)
+            commit_interval: Número de escrituras entre commits
+        """
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self.db_path = db_path
+        self.ruleset = ruleset
+        self.commit_interval = commit_interval
+        self.hits = 0
+        self.misses = 0
+        self._pendientes = 0
+
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS scan_cache (
+                path TEXT PRIMARY KEY,
+                dev INTEGER NOT NULL,
+                ino INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                ruleset TEXT NOT NULL,
+                verdict TEXT NOT NULL,
+                scanned_at TEXT NOT NULL
+            )
+        """)
+        self.conn.commit()
+
+    def get(self, path: str, st: Optional[os.stat_result] = None) -> Optional[Dict[str, Any]]:
+        """
+        Obtiene el veredicto previo de un archivo si sigue siendo válido
+
+        Args:
+            path: Ruta del archivo
+            st: Resultado de stat ya disponible (evita un stat adicional)
+
+        Returns:
+            Optional[Dict[str, Any]]: Veredicto almacenado o None si hay que reescanear
+        """
+        if st is None:
+            st = os.stat(path)
+        fila = self.conn.execute(
+            "SELECT dev, ino, size, mtime_ns, ruleset, verdict FROM scan_cache WHERE path = ?",
+            (str(path),)
+        ).fetchone()
+
+        if fila and tuple(fila[:4]) == stat_fingerprint(st) and fila[4] == self.ruleset:
+            self.hits += 1
+            return json.loads(fila[5])
+
+        self.misses += 1
+        return None
+
+    def risk_scores(self) -> Dict[str, int]:
+        """
+        Riesgo del último veredicto de cada ruta, sea o no válido todavía
+
+        Sirve para priorizar un reescaneo: un archivo que fue sospechoso y ha
+        cambiado merece analizarse antes que uno que nunca lo fue.
+        """
+        filas = self.conn.execute(
+            "SELECT path, json_extract(verdict, '$.risk_score') FROM scan_cache"
+        )
+        return {path: riesgo for path, riesgo in filas if riesgo}
+
+    def put(self, path: str, st: os.stat_result, verdict: Dict[str, Any]):
+        """Guarda el veredicto de un archivo junto a su huella de stat"""
+        self.conn.execute(
+            "INSERT OR REPLACE INTO scan_cache VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (str(path), *stat_fingerprint(st), self.ruleset,
+             json.dumps(verdict, default=str), datetime.now().isoformat())
+        )
+        self._pendientes += 1
+        if self._pendientes >= self.commit_interval:
+            self.commit()
+
+    def commit(self):
+        """Confirma las escrituras pendientes"""
+        self.conn.commit()
+        self._pendientes = 0
+
+    def close(self):
+        """Confirma y cierra la base de datos"""
+        self.commit()
+        self.conn.close()
+        logger.info(f"Caché de escaneo: {self.hits} aciertos, {self.misses} fallos")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Priorización de escaneos
+Este módulo ordena los archivos pendientes de un escaneo por señales baratas
+(extensión, ubicación, antigüedad según mtime, tamaño y veredicto previo en
+la caché) para analizar primero los de más riesgo, y corta el escaneo al
+agotar un presupuesto de tiempo informando de lo que se cubrió.
+"""
+
+import re
+import time
+from collections import Counter
+from pathlib import PurePath
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional, Tuple
+
+from scripts.utilidades.common import FileRecord
+
+EXTENSION_WEIGHTS = {
+    '.exe': 40, '.scr': 40, '.dll': 35, '.sys': 35, '.com': 35, '.cpl': 35,
+    '.ps1': 30, '.vbs': 30, '.js': 30, '.hta': 30, '.bat': 30, '.cmd': 30, '.jar': 30, '.lnk': 25,
+    '.docm': 25, '.xlsm': 25, '.pptm': 25,
+    '.zip': 20, '.7z': 20, '.gz': 15, '.tgz': 15, '.tar': 10, '.eml': 20, '.apk': 20,
+    '.docx': 10, '.xlsx': 10, '.pptx': 10,
+}
+
+# Componentes de la ruta (en minúsculas) donde suele aterrizar el malware
+LOCATION_WEIGHTS = {
+    'startup': 30, 'downloads': 25, 'temp': 25, 'tmp': 25, 'appdata': 15,
+    '$recycle.bin': 15, 'public': 10, 'desktop': 10, 'programdata': 10,
+}
+
+# (antigüedad máxima en segundos, puntos)
+RECENCY_WEIGHTS = ((86400, 20), (7 * 86400, 10), (30 * 86400, 5))
+
+_DURACION = re.compile(r'(\d+(?:\.\d+)?)([smhd]?)')
+_SEGUNDOS = {'': 1, 's': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+def parse_duration(texto: str) -> float:
+    """
+    Convierte una duración como "30m", "2h", "1h30m" o "90" (segundos) a segundos
+
+    Raises:
+        ValueError: Si el texto no es una duración
+    """
+    texto = texto.strip().lower()
+    partes = _DURACION.findall(texto)
+    if not texto or ''.join(n + u for n, u in partes) != texto:
+        raise ValueError(f"Duración no válida: {texto!r}")
+    return sum(float(n) * _SEGUNDOS[u] for n, u in partes)
+
+class PriorityScorer:
+    """Puntuación de riesgo previa al escaneo, a partir de los metadatos del recorrido"""
+
+    def __init__(self, extension_weights: Optional[Mapping[str, int]] = None,
+                 location_weights: Optional[Mapping[str, int]] = None,
+                 now: Optional[float] = None):
+        """
+        Args:
+            extension_weights: Puntos por extensión (por defecto EXTENSION_WEIGHTS)
+            location_weights: Puntos por componente de la ruta (por defecto LOCATION_WEIGHTS)
+            now: Instante de referencia para la antigüedad (por defecto el actual)
+        """
+        self.extension_weights = dict(extension_weights or EXTENSION_WEIGHTS)
+        self.location_weights = dict(location_weights or LOCATION_WEIGHTS)
+        self.now = now if now is not None else time.time()
+
+    def score(self, record: FileRecord, previous_risk: Optional[int] = None) -> int:
+        """
+        Puntúa un archivo pendiente
+
+        Args:
+            record: Archivo del recorrido (con su stat)
+            previous_risk: Riesgo del último veredicto en caché, aunque ya no sea válido
+
+        Returns:
+            int: Puntuación; más alta se escanea antes
+        """
+        nombre = record.name.lower()
+        puntos = self.extension_weights.get(PurePath(nombre).suffix, 0)
+        # Doble extensión como factura.pdf.exe
+        if nombre.count('.') >= 2 and puntos >= 30:
+            puntos += 10
+
+        partes = {parte.lower() for parte in PurePath(record.path).parts[:-1]}
+        puntos += max((peso for parte, peso in self.location_weights.items() if parte in partes), default=0)
+
+        antiguedad = self.now - record.stat.st_mtime
+        for limite, peso in RECENCY_WEIGHTS:
+            if antiguedad <= limite:
+                puntos += peso
+                break
+
+        tamano = record.stat.st_size
+        if tamano == 0:
+            puntos -= 50
+        elif tamano > 100 * 1024 * 1024:
+            puntos -= 15
+
+        if previous_risk:
+            puntos += min(int(previous_risk), 50)
+        return puntos
+
+class ScanScheduler:
+    """
+    Orden de escaneo por prioridad con presupuesto de tiempo opcional
+
+    Recorre todos los candidatos (el listado es barato frente al análisis), los
+    ordena por puntuación y los entrega de mayor a menor riesgo hasta que se
+    agota el presupuesto. El tiempo cuenta desde que empieza el recorrido.
+    """
+
+    def __init__(self, scorer: Optional[PriorityScorer] = None, budget: Optional[float] = None,
+                 previous_risks: Optional[Mapping[str, int]] = None):
+        """
+        Args:
+            scorer: Puntuación de los archivos (por defecto PriorityScorer())
+            budget: Segundos disponibles para el escaneo (None sin límite)
+            previous_risks: Riesgo previo por ruta (ver ScanCache.risk_scores)
+        """
+        self.scorer = scorer or PriorityScorer()
+        self.budget = budget
+        self.previous_risks = previous_risks or {}
+        self.started: Optional[float] = None
+        self.candidates = 0
+        self.scheduled = 0
+        self.min_scheduled_score: Optional[int] = None
+        self._skipped: List[Tuple[int, FileRecord]] = []
+
+    def expired(self) -> bool:
+        """Indica si se agotó el presupuesto de tiempo"""
+        return (self.budget is not None and self.started is not None
+                and time.monotonic() - self.started >= self.budget)
+
+    def schedule(self, records: Iterable[FileRecord]) -> Iterator[FileRecord]:
+        """Entrega los archivos de mayor a menor puntuación mientras quede presupuesto"""
+        self.started = time.monotonic()
+        puntuados = [(self.scorer.score(record, self.previous_risks.get(record.path)), n, record)
+                     for n, record in enumerate(records)]
+        # A igual puntuación se conserva el orden del recorrido
+        puntuados.sort(key=lambda item: (-item[0], item[1]))
+        self.candidates = len(puntuados)
+
+        for posicion, (puntos, _, record) in enumerate(puntuados):
+            if self.expired():
+                self._skipped = [(p, r) for p, _, r in puntuados[posicion:]]
+                return
+            self.scheduled += 1
+            self.min_scheduled_score = puntos
+            yield record
+
+    def coverage(self, top: int = 20) -> Dict[str, Any]:
+        """
+        Resumen de la cobertura del escaneo
+
+        Args:
+            top: Número de archivos no escaneados de mayor puntuación a listar
+
+        Returns:
+            Dict[str, Any]: Candidatos, escaneados, omitidos por presupuesto y
+            los omitidos más prioritarios con sus extensiones
+        """
+        transcurrido = time.monotonic() - self.started if self.started is not None else 0.0
+        return {
+            'budget_seconds': self.budget,
+            'elapsed_seconds': round(transcurrido, 1),
+            'complete': not self._skipped,
+            'candidates': self.candidates,
+            'scheduled': self.scheduled,
+            'skipped': len(self._skipped),
+            'min_scheduled_score': self.min_scheduled_score,
+            'max_skipped_score': self._skipped[0][0] if self._skipped else None,
+            'skipped_by_extension': dict(Counter(PurePath(r.name.lower()).suffix or '(none)'
+                                                 for _, r in self._skipped).most_common(10)),
+            'top_skipped': [{'path': r.path, 'score': p} for p, r in self._skipped[:top]],
+        }
@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Línea de tiempo del sistema de archivos
+Este módulo genera un bodyfile (formato de The Sleuth Kit) y una línea de
+tiempo MACB ordenada a partir del stat de cada archivo. Los eventos se
+ordenan con un merge sort externo (tramos ordenados en disco y mezcla final),
+por lo que la memoria no depende del número de archivos, y se construye un
+índice disperso para consultar rangos de tiempo sin recorrer todo el archivo.
+"""
+
+import os
+import sys
+import time
+import heapq
+import shutil
+import calendar
+import argparse
+import tempfile
+from datetime import datetime, timezone
+from stat import filemode
+from typing import IO, Any, Dict, Iterator, List, Optional, Union
+
+import numpy as np
+from loguru import logger
+
+from scripts.utilidades.common import add_walker_arguments, walker_from_args
+
+TIMELINE_HEADER = "Date,Size,Type,Mode,UID,GID,Meta,File Name\n"
+DATE_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+# Tramos abiertos a la vez durante la mezcla (límite de descriptores de archivo)
+MAX_OPEN_RUNS = 128
+
+def _iso(epoch: float) -> str:
+    return time.strftime(DATE_FORMAT, time.gmtime(int(epoch)))
+
+def _epoch(fecha: Union[str, datetime, float, int]) -> int:
+    """Convierte una fecha ISO, datetime o epoch a segundos epoch UTC"""
+    if isinstance(fecha, (int, float)):
+        return int(fecha)
+    if isinstance(fecha, str):
+        fecha = datetime.fromisoformat(fecha.replace("Z", "+00:00"))
+    if fecha.tzinfo is None:
+        fecha = fecha.replace(tzinfo=timezone.utc)
+    return int(fecha.timestamp())
+
+class TimelineBuilder:
+    """
+    Generador de bodyfile y línea de tiempo MACB ordenada
+
+    Cada archivo produce un evento por marca de tiempo distinta, con las
+    letras MACB que coinciden en ese instante (por ejemplo "m.c."), como la
+    salida de mactime.
+    """
+
+    def __init__(self, output_path: str, run_size: int = 500_000, index_every: int = 1024,
+                 temp_dir: Optional[str] = None, bodyfile: bool = True,
+                 resume_state: Optional[Dict[str, Any]] = None):
+        """
+        Args:
+            output_path: Ruta de la línea de tiempo CSV (se crean también .body e .idx)
+            run_size: Eventos ordenados en memoria antes de volcarlos a un tramo en disco
+            index_every: Líneas entre entradas del índice disperso
+            temp_dir: Directorio para los tramos temporales
+            bodyfile: Escribir también el bodyfile sin ordenar
+            resume_state: Estado devuelto por state() en una ejecución anterior; se
+                conservan sus tramos y el bodyfile se trunca a ese punto
+        """
+        self.output_path = str(output_path)
+        self.index_path = self.output_path + ".idx"
+        self.run_size = run_size
+        self.index_every = index_every
+        self.events = 0
+        self._buffer: List[str] = []
+        self._runs: List[str] = []
+        os.makedirs(os.path.dirname(os.path.abspath(self.output_path)), exist_ok=True)
+        body_path = os.path.splitext(self.output_path)[0] + ".body"
+        body_offset = None
+        if resume_state and not (os.path.isdir(resume_state["temporal"])
+                                 and all(os.path.exists(tramo) for tramo in resume_state["tramos"])):
+            logger.warning(f"Faltan los tramos de {self.output_path} guardados en el punto de control: "
+                           f"la línea de tiempo se genera desde cero y no incluirá los archivos ya analizados")
+            resume_state = None
+        if resume_state:
+            self._temp_dir = resume_state["temporal"]
+            self._runs = list(resume_state["tramos"])
+            self.events = resume_state["eventos"]
+            body_offset = resume_state.get("body")
+        else:
+            self._temp_dir = tempfile.mkdtemp(prefix="timeline_", dir=temp_dir)
+        self._body: Optional[IO] = None
+        if bodyfile:
+            if body_offset is not None and os.path.exists(body_path):
+                self._body = open(body_path, "r+", encoding="utf-8", errors="surrogateescape")
+                # Se descartan las líneas escritas después del último punto de control
+                self._body.truncate(body_offset)
+                self._body.seek(body_offset)
+            else:
+                self._body = open(body_path, "w", encoding="utf-8", errors="surrogateescape")
+
+    def add(self, path: str, st: os.stat_result, md5: Optional[str] = None):
+        """
+        Agrega los eventos de un archivo
+
+        Args:
+            path: Ruta del archivo
+            st: Resultado de stat del archivo
+            md5: MD5 del archivo si ya se calculó (0 en el bodyfile si no)
+        """
+        nombre = str(path).replace("\n", "\\n")
+        modo = filemode(st.st_mode)
+        crtime = getattr(st, "st_birthtime", 0)
+        tiempos = (int(st.st_atime), int(st.st_mtime), int(st.st_ctime), int(crtime))
+
+        if self._body is not None:
+            # MD5|name|inode|mode_as_string|UID|GID|size|atime|mtime|ctime|crtime
+            self._body.write(f"{md5 or 0}|{nombre}|{st.st_ino}|{modo}|{st.st_uid}|{st.st_gid}|"
+                             f"{st.st_size}|{'|'.join(map(str, tiempos))}\n")
+
+        # Agrupa las marcas iguales en un solo evento con sus letras MACB
+        marcas = {}
+        atime, mtime, ctime, crtime = tiempos
+        for posicion, instante in enumerate((mtime, atime, ctime, crtime)):
+            if instante:
+                marcas.setdefault(instante, ["."] * 4)[posicion] = "macb"[posicion]
+        for instante, letras in marcas.items():
+            self._buffer.append(f"{_iso(instante)},{st.st_size},{''.join(letras)},{modo},"
+                                f"{st.st_uid},{st.st_gid},{st.st_ino},{nombre}\n")
+        self.events += len(marcas)
+        if len(self._buffer) >= self.run_size:
+            self._flush_run()
+
+    def state(self) -> Dict[str, Any]:
+        """
+        Vuelca a disco los eventos pendientes y devuelve el estado necesario para reanudar
+
+        Returns:
+            Dict[str, Any]: Tramos escritos, su directorio, eventos y desplazamiento del bodyfile
+        """
+        self._flush_run()
+        body = None
+        if self._body is not None:
+            self._body.flush()
+            body = self._body.tell()
+        return {"tramos": list(self._runs), "temporal": self._temp_dir, "eventos": self.events, "body": body}
+
+    def _flush_run(self):
+        """Ordena los eventos en memoria y los vuelca a un tramo temporal"""
+        if not self._buffer:
+            return
+        # La fecha ISO UTC de ancho fijo al inicio hace que el orden lexicográfico sea cronológico
+        self._buffer.sort()
+        tramo = os.path.join(self._temp_dir, f"run_{len(self._runs):05d}.csv")
+        with open(tramo, "w", encoding="utf-8", errors="surrogateescape") as f:
+            f.writelines(self._buffer)
+        self._runs.append(tramo)
+        self._buffer = []
+
+    def _reduce_runs(self):
+        """Mezcla tramos en grupos hasta que se puedan abrir todos a la vez"""
+        while len(self._runs) > MAX_OPEN_RUNS:
+            grupos = [self._runs[i:i + MAX_OPEN_RUNS] for i in range(0, len(self._runs), MAX_OPEN_RUNS)]
+            self._runs = []
+            for n, grupo in enumerate(grupos):
+                tramo = os.path.join(self._temp_dir, f"merge_{time.monotonic_ns()}_{n:05d}.csv")
+                entradas = [open(ruta, encoding="utf-8", errors="surrogateescape") for ruta in grupo]
+                try:
+                    with open(tramo, "w", encoding="utf-8", errors="surrogateescape") as f:
+                        f.writelines(heapq.merge(*entradas))
+                finally:
+                    for entrada in entradas:
+                        entrada.close()
+                for ruta in grupo:
+                    os.unlink(ruta)
+                self._runs.append(tramo)
+
+    def close(self) -> str:
+        """
+        Mezcla los tramos en la línea de tiempo final y escribe el índice disperso
+
+        Returns:
+            str: Ruta de la línea de tiempo
+        """
+        if self._body is not None:
+            self._body.close()
+            self._body = None
+        self._flush_run()
+        self._reduce_runs()
+
+        tramos = [open(tramo, encoding="utf-8", errors="surrogateescape") for tramo in self._runs]
+        indice = []
+        try:
+            with open(self.output_path, "w", encoding="utf-8", errors="surrogateescape", newline="") as salida:
+                salida.write(TIMELINE_HEADER)
+                offset = len(TIMELINE_HEADER)
+                for n, linea in enumerate(heapq.merge(*tramos)):
+                    if n % self.index_every == 0:
+                        indice.append((calendar.timegm(time.strptime(linea[:20], DATE_FORMAT)), offset))
+                    salida.write(linea)
+                    offset += len(linea.encode("utf-8", "surrogateescape"))
+        finally:
+            for tramo in tramos:
+                tramo.close()
+            shutil.rmtree(self._temp_dir, ignore_errors=True)
+
+        with open(self.index_path, "wb") as f:
+            np.save(f, np.array(indice, dtype=np.int64).reshape(-1, 2))
+        logger.info(f"Línea de tiempo con {self.events} eventos en {self.output_path} "
+                    f"({len(self._runs)} tramos ordenados)")
+        return self.output_path
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            if self._body is not None:
+                self._body.close()
+            shutil.rmtree(self._temp_dir, ignore_errors=True)
+
+def query_timeline(timeline_path: str, desde: Union[str, datetime, float, None] = None,
+                   hasta: Union[str, datetime, float, None] = None) -> Iterator[str]:
+    """
+    Devuelve los eventos de un rango de tiempo usando el índice disperso
+
+    Args:
+        timeline_path: Línea de tiempo generada por TimelineBuilder
+        desde: Inicio del rango (incluido); ISO 8601, datetime o epoch UTC
+        hasta: Fin del rango (incluido)
+
+    Yields:
+        str: Líneas de la línea de tiempo dentro del rango
+    """
+    inicio = _iso(_epoch(desde)) if desde is not None else ""
+    fin = _iso(_epoch(hasta)) if hasta is not None else None
+
+    offset = len(TIMELINE_HEADER)
+    if desde is not None and os.path.exists(timeline_path + ".idx"):
+        with open(timeline_path + ".idx", "rb") as f:
+            indice = np.load(f)
+        if len(indice):
+            # Última entrada estrictamente anterior al inicio: desde ahí todo está en orden
+            posicion = int(np.searchsorted(indice[:, 0], _epoch(desde), side="left")) - 1
+            if posicion >= 0:
+                offset = int(indice[posicion, 1])
+
+    with open(timeline_path, "rb") as f:
+        f.seek(offset)
+        for linea in f:
+            fecha = linea[:20].decode("ascii")
+            if fecha < inicio:
+                continue
+            if fin is not None and fecha > fin:
+                break
+            yield linea.decode("utf-8", "surrogateescape")
+
+def main():
+    parser = argparse.ArgumentParser(description='Línea de tiempo MACB del sistema de archivos')
+    subparsers = parser.add_subparsers(dest='comando', required=True)
+
+    crear = subparsers.add_parser('crear', help='Genera bodyfile y línea de tiempo ordenada')
+    crear.add_argument('directorio', help='Directorio a analizar')
+    crear.add_argument('salida', help='Ruta de la línea de tiempo CSV')
+    crear.add_argument('--tramo', type=int, default=500_000,
+                       help='Eventos ordenados en memoria por tramo')
+    crear.add_argument('--temp', help='Directorio para los tramos temporales')
+    add_walker_arguments(crear)
+
+    consultar = subparsers.add_parser('consultar', help='Muestra los eventos de un rango de tiempo')
+    consultar.add_argument('timeline', help='Línea de tiempo generada con "crear"')
+    consultar.add_argument('--desde', help='Inicio del rango (ISO 8601, UTC si no tiene zona)')
+    consultar.add_argument('--hasta', help='Fin del rango (ISO 8601, UTC si no tiene zona)')
+
+    args = parser.parse_args()
+
+    if args.comando == 'crear':
+        with TimelineBuilder(args.salida, run_size=args.tramo, temp_dir=args.temp) as timeline:
+            for registro in walker_from_args(args).walk(args.directorio):
+                timeline.add(registro.path, registro.stat)
+    else:
+        sys.stdout.writelines(query_timeline(args.timeline, args.desde, args.hasta))
+
+if __name__ == "__main__":
+    main()
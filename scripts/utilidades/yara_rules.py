@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Gestor de reglas YARA
+Este módulo compila una sola vez el directorio de reglas, guarda el conjunto
+compilado indexado por el hash de su contenido para cargarlo con yara.load en
+ejecuciones posteriores y permite recargarlo en caliente si las reglas cambian.
+"""
+
+import os
+import hashlib
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import yara
+from loguru import logger
+
+from scripts.utilidades.common import Config
+
+RULE_EXTENSIONS = ('.yar', '.yara')
+
+class YaraRulesManager:
+    """Compila, guarda en caché y recarga conjuntos de reglas YARA"""
+
+    _instances: Dict[Tuple[str, str], "YaraRulesManager"] = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, rules_path: Optional[str] = None, cache_dir: Optional[str] = None):
+        """
+        Args:
+            rules_path: Directorio (o archivo) de reglas (por defecto analysis.rules_dir)
+            cache_dir: Directorio de reglas compiladas (por defecto analysis.compiled_rules_dir)
+        """
+        config = Config()
+        self.rules_path = rules_path or config.get("analysis.rules_dir", "data/rules")
+        self.cache_dir = Path(cache_dir or config.get("analysis.compiled_rules_dir", "data/cache/yara"))
+        self.version: Optional[str] = None
+        self._rules: Optional[yara.Rules] = None
+        self._signature: Optional[Tuple] = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._watcher: Optional[threading.Thread] = None
+
+    @classmethod
+    def for_path(cls, rules_path: Optional[str] = None, cache_dir: Optional[str] = None) -> "YaraRulesManager":
+        """Devuelve el gestor compartido del proceso para un directorio de reglas"""
+        key = (os.path.abspath(rules_path) if rules_path else "", cache_dir or "")
+        with cls._instances_lock:
+            if key not in cls._instances:
+                cls._instances[key] = cls(rules_path, cache_dir)
+            return cls._instances[key]
+
+    def rule_files(self) -> List[str]:
+        """Lista ordenada de archivos de reglas"""
+        if os.path.isfile(self.rules_path):
+            return [self.rules_path]
+
+        files = []
+        for root, _, names in os.walk(self.rules_path):
+            for name in names:
+                if name.endswith(RULE_EXTENSIONS):
+                    files.append(os.path.join(root, name))
+        return sorted(files)
+
+    def _stat_signature(self, files: List[str]) -> Tuple:
+        """Firma barata del directorio de reglas para detectar cambios sin leerlas"""
+        signature = []
+        for path in files:
+            try:
+                st = os.stat(path)
+                signature.append((path, st.st_size, st.st_mtime_ns))
+            except OSError:
+                continue
+        return tuple(signature)
+
+    def content_hash(self, files: List[str]) -> str:
+        """Hash del contenido de todas las reglas y de la versión de YARA"""
+        digest = hashlib.sha256(yara.YARA_VERSION.encode())
+        for path in files:
+            digest.update(os.path.relpath(path, self.rules_path).encode("utf-8", "surrogateescape"))
+            with open(path, "rb") as f:
+                digest.update(hashlib.sha256(f.read()).digest())
+        return digest.hexdigest()
+
+    def _compile(self, files: List[str], compiled_path: Path) -> yara.Rules:
+        """Compila las reglas y guarda el resultado de forma atómica"""
+        base = self.rules_path if os.path.isdir(self.rules_path) else os.path.dirname(self.rules_path)
+        rules = yara.compile(filepaths={os.path.relpath(path, base): path for path in files})
+
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        temporal = compiled_path.with_suffix(f".{os.getpid()}.tmp")
+        rules.save(str(temporal))
+        os.replace(temporal, compiled_path)
+        return rules
+
+    def load(self) -> Optional[yara.Rules]:
+        """
+        Carga el conjunto compilado que corresponde al contenido actual de las reglas
+
+        Returns:
+            Optional[yara.Rules]: Reglas cargadas o None si no hay reglas
+        """
+        files = self.rule_files()
+        signature = self._stat_signature(files)
+        if not files:
+            logger.warning(f"No se encontraron reglas YARA en {self.rules_path}")
+            with self._lock:
+                self._rules, self.version, self._signature = None, None, signature
+            return None
+
+        version = self.content_hash(files)
+        if version == self.version and self._rules is not None:
+            self._signature = signature
+            return self._rules
+
+        compiled_path = self.cache_dir / f"{version}.yarc"
+        rules = None
+        if compiled_path.exists():
+            try:
+                rules = yara.load(str(compiled_path))
+            except yara.Error as e:
+                logger.warning(f"Reglas compiladas inválidas en {compiled_path}: {e}")
+        if rules is None:
+            logger.info(f"Compilando {len(files)} archivos de reglas YARA")
+            rules = self._compile(files, compiled_path)
+
+        # Intercambio atómico para los hilos que están usando las reglas
+        with self._lock:
+            self._rules, self.version, self._signature = rules, version, signature
+        return rules
+
+    @property
+    def rules(self) -> Optional[yara.Rules]:
+        """Conjunto de reglas vigente (se carga en el primer acceso)"""
+        if self._signature is None:
+            self.load()
+        return self._rules
+
+    def match(self, *args, **kwargs) -> List:
+        """Aplica el conjunto de reglas vigente (ver yara.Rules.match)"""
+        rules = self.rules
+        return rules.match(*args, **kwargs) if rules is not None else []
+
+    def reload_if_changed(self) -> bool:
+        """
+        Recarga las reglas si algún archivo cambió
+
+        Returns:
+            bool: True si se cargó un conjunto de reglas distinto
+        """
+        if self._stat_signature(self.rule_files()) == self._signature:
+            return False
+        anterior = self.version
+        try:
+            self.load()
+        except yara.Error as e:
+            # Se mantiene el conjunto anterior si las reglas nuevas no compilan
+            logger.error(f"Error al recargar reglas YARA: {e}")
+            return False
+        if self.version != anterior:
+            logger.info(f"Reglas YARA recargadas (versión {self.version})")
+            return True
+        return False
+
+    def start_watching(self, interval: float = 5.0):
+        """Vigila el directorio de reglas en segundo plano para monitores de larga duración"""
+        if self._watcher is not None:
+            return
+        self._stop.clear()
+
+        def vigilar():
+            while not self._stop.wait(interval):
+                self.reload_if_changed()
+
+        self._watcher = threading.Thread(target=vigilar, name="yara-rules-watcher", daemon=True)
+        self._watcher.start()
+
+    def stop_watching(self):
+        """Detiene la vigilancia del directorio de reglas"""
+        self._stop.set()
+        if self._watcher is not None:
+            self._watcher.join()
+            self._watcher = None
+
+class LiteralMatcher:
+    """
+    Busca muchas cadenas literales en una sola pasada sobre los bytes crudos
+
+    Las cadenas se compilan como reglas YARA, cuyo motor Aho-Corasick recorre
+    los datos una vez sin importar cuántos indicadores haya, sin decodificar
+    ni copiar el contenido del archivo.
+    """
+
+    def __init__(self, literals: Iterable[str], nocase: bool = True):
+        """
+        Args:
+            literals: Cadenas a buscar
+            nocase: Ignorar mayúsculas y minúsculas (solo ASCII)
+        """
+        self.literals = list(dict.fromkeys(literals))
+        modificadores = "ascii nocase" if nocase else "ascii"
+        source = "\n".join(
+            f'rule literal_{i} {{ strings: $s = "{self._escape(literal)}" {modificadores} condition: $s }}'
+            for i, literal in enumerate(self.literals)
+        )
+        self._rules = yara.compile(source=source) if self.literals else None
+
+    @staticmethod
+    def _escape(literal: str) -> str:
+        """Escapa una cadena para usarla como texto en una regla YARA"""
+        partes = []
+        for byte in literal.encode("utf-8"):
+            char = chr(byte)
+            if char in ('"', "\\"):
+                partes.append("\\" + char)
+            elif 0x20 <= byte < 0x7f:
+                partes.append(char)
+            else:
+                partes.append(f"\\x{byte:02x}")
+        return "".join(partes)
+
+    def match(self, data) -> List[str]:
+        """
+        Devuelve las cadenas presentes en los datos, en el orden en que se definieron
+
+        Args:
+            data: Buffer a analizar (bytes, bytearray o mmap)
+        """
+        if self._rules is None or not len(data):
+            return []
+        indices = sorted(int(m.rule.rsplit("_", 1)[1]) for m in self._rules.match(data=data, fast=True))
+        return [self.literals[i] for i in indices]
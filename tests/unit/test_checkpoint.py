@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Pruebas unitarias para los recorridos reanudables
+"""
+
+import json
+import pytest
+from pathlib import Path
+from scripts.utilidades.checkpoint import ResumableWalk
+from scripts.analisis.file_system_analyzer import FileSystemAnalyzer
+
+@pytest.fixture
+def arbol(tmp_path):
+    """Crea un árbol de directorios con archivos en varios niveles"""
+    raiz = tmp_path / "raiz"
+    for ruta in ["a.txt", "b.txt", "sub1/c.txt", "sub1/d.txt", "sub1/prof/e.txt", "sub2/f.txt"]:
+        archivo = raiz / ruta
+        archivo.parent.mkdir(parents=True, exist_ok=True)
+        archivo.write_text(ruta)
+    return raiz
+
+def test_resumable_walk(arbol, tmp_path):
+    """Prueba que un recorrido interrumpido continúa sin repetir archivos completados"""
+    checkpoint = tmp_path / "recorrido.json"
+    completo = [registro.path for registro in ResumableWalk(arbol, checkpoint)]
+    assert len(completo) == 6
+
+    # Se interrumpe tras entregar el cuarto archivo (el cuarto no se completa)
+    recorrido = ResumableWalk(arbol, checkpoint, every_files=1)
+    vistos = []
+    for registro in recorrido:
+        vistos.append(registro.path)
+        if len(vistos) == 4:
+            break
+    assert not recorrido.done
+
+    reanudado = ResumableWalk(arbol, checkpoint, resume=True)
+    assert reanudado.completed == 3
+    assert vistos[:3] + [registro.path for registro in reanudado] == completo
+
+    reanudado.finish()
+    assert not checkpoint.exists()
+
+def test_file_system_analyzer_resume(arbol, tmp_path):
+    """Prueba que la salida reanudada no contiene filas duplicadas"""
+    salida = tmp_path / "fs.json"
+    checkpoint = tmp_path / "fs.checkpoint.json"
+
+    analyzer = FileSystemAnalyzer(str(arbol), str(salida), checkpoint=str(checkpoint))
+    analyzer.recorrido.every_files = 2
+    for i, registro in enumerate(analyzer.recorrido):
+        analyzer.analizar_archivo(Path(registro.path), registro.stat)
+        if i == 4:
+            break  # Simula una interrupción tras el punto de control de 4 archivos
+    analyzer.stream.sync()
+
+    analyzer = FileSystemAnalyzer(str(arbol), str(salida), checkpoint=str(checkpoint), reanudar=True)
+    analyzer.analizar_directorio()
+    analyzer.generar_reporte()
+
+    with open(tmp_path / "fs.jsonl") as f:
+        lineas = [json.loads(linea) for linea in f]
+    rutas = [l["ruta"] for l in lineas[:-1]]
+    assert len(rutas) == len(set(rutas)) == 6
+    assert lineas[-1]["resumen"]["archivos_analizados"] == 6
+
+    with open(tmp_path / "fs.csv") as f:
+        assert len(f.readlines()) == 7  # Cabecera y seis filas
+    assert not checkpoint.exists()
+
+def test_file_system_analyzer_resume_timeline(arbol, tmp_path):
+    """Prueba que la línea de tiempo reanudada incluye los archivos anteriores a la interrupción"""
+    salida = tmp_path / "fs.json"
+    checkpoint = tmp_path / "fs.checkpoint.json"
+    timeline = tmp_path / "linea.csv"
+
+    analyzer = FileSystemAnalyzer(str(arbol), str(salida), checkpoint=str(checkpoint), timeline=str(timeline))
+    analyzer.recorrido.every_files = 2
+    for i, registro in enumerate(analyzer.recorrido):
+        analyzer.analizar_archivo(Path(registro.path), registro.stat)
+        if i == 4:
+            break  # El quinto archivo se escribe en el bodyfile después del punto de control
+    analyzer.timeline._body.flush()
+
+    analyzer = FileSystemAnalyzer(str(arbol), str(salida), checkpoint=str(checkpoint), reanudar=True,
+                                  timeline=str(timeline))
+    analyzer.analizar_directorio()
+    analyzer.generar_reporte()
+
+    cuerpo = [linea.split("|")[1] for linea in (tmp_path / "linea.body").read_text().splitlines()]
+    assert sorted(cuerpo) == sorted(str(ruta) for ruta in arbol.rglob("*.txt"))
+    eventos = timeline.read_text().splitlines()[1:]
+    assert {linea.split(",")[-1] for linea in eventos} == set(cuerpo)
+    assert eventos == sorted(eventos)
+    assert not list(tmp_path.glob("timeline_*"))
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Pruebas unitarias para el almacén columnar de hallazgos
+"""
+
+import os
+import hashlib
+import pytest
+from datetime import datetime
+from scripts.utilidades.columnar_store import FileFindingsStore
+
+@pytest.fixture
+def almacen(tmp_path):
+    """Crea un almacén con un archivo sospechoso y uno limpio"""
+    store = FileFindingsStore()
+    for nombre, razones in [(".oculto.exe", ["Extensión sospechosa", "Archivo oculto"]), ("notas.txt", [])]:
+        archivo = tmp_path / nombre
+        archivo.write_text(nombre)
+        store.append(str(archivo), hashlib.md5(nombre.encode()).hexdigest(), os.stat(archivo),
+                     "ASCII text", razones)
+    store.append(str(tmp_path / "sin_permisos"), None, None, "empty", [])
+    return store
+
+def test_record_materialization(almacen, tmp_path):
+    """Prueba que los resultados se reconstruyen con el formato del reporte"""
+    archivo = tmp_path / ".oculto.exe"
+    st = os.stat(archivo)
+    assert len(almacen) == 3
+    assert almacen.record(0) == {
+        'ruta': str(archivo),
+        'nombre': '.oculto.exe',
+        'hash': hashlib.md5(b".oculto.exe").hexdigest(),
+        'permisos': {
+            'usuario': st.st_uid,
+            'grupo': st.st_gid,
+            'modo': oct(st.st_mode)[-3:],
+            'tamaño': st.st_size,
+            'ultimo_acceso': datetime.fromtimestamp(st.st_atime).isoformat(),
+            'ultima_modificacion': datetime.fromtimestamp(st.st_mtime).isoformat()
+        },
+        'tipo': 'ASCII text',
+        'sospechoso': True,
+        'razones': ['Extensión sospechosa', 'Archivo oculto']
+    }
+    sin_permisos = almacen.record(2)
+    assert sin_permisos['hash'] is None and sin_permisos['permisos'] is None
+
+    alertas = list(almacen.alerts())
+    assert [a['archivo'] for a in alertas] == [str(archivo)]
+    assert almacen.columns()['tamano'].tolist() == [11, 9, 0]
+
+def test_arrow_export(almacen, tmp_path):
+    """Prueba la exportación a Parquet"""
+    pq = pytest.importorskip("pyarrow.parquet")
+    almacen.to_parquet(str(tmp_path / "hallazgos.parquet"))
+    tabla = pq.read_table(str(tmp_path / "hallazgos.parquet"))
+    assert tabla.column('nombre').to_pylist() == ['.oculto.exe', 'notas.txt', 'sin_permisos']
+    assert tabla.column('md5').to_pylist()[2] is None
+    assert tabla.column('sospechoso').to_pylist() == [True, False, False]
+    assert tabla.column('razones').to_pylist() == [["Extensión sospechosa", "Archivo oculto"], [], []]
+
+def test_many_reasons():
+    """Prueba que no hay límite de razones distintas (las reglas vienen de la configuración)"""
+    store = FileFindingsStore()
+    for i in range(70):
+        store.append(f"/tmp/archivo{i}", None, None, "data", [f"Regla {i}", "Común"] if i % 2 else [])
+    assert store.record(69)['razones'] == ["Regla 69", "Común"]
+    assert store.record(68)['razones'] == []
+    assert store.columns()['razones'].tolist() == [0, 2] * 35
+    assert len(list(store.alerts())) == 35
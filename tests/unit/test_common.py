@@ -12,10 +12,13 @@ import tempfile
 import json
 from scripts.utilidades.common import (
     Config,
+    DirectoryWalker,
     Logger,
     FileAnalyzer,
+    HashEngine,
     NetworkUtils,
-    ReportGenerator
+    ReportGenerator,
+    StreamingReportWriter
 )
 
 @pytest.fixture
@@ -74,6 +77,51 @@ def test_file_analyzer(temp_file):
     
     os.unlink(temp_file)
 
+def test_hash_engine_single_pass(temp_file):
+    """Prueba que el motor de hashing calcula todos los digests en una lectura"""
+    import hashlib
+    
+    class Contador:
+        def __init__(self):
+            self.total = 0
+        def update(self, chunk):
+            self.total += len(chunk)
+    
+    esperado = {
+        "md5": hashlib.md5(b"Test content").hexdigest(),
+        "sha256": hashlib.sha256(b"Test content").hexdigest()
+    }
+    
+    # Lectura con buffer reutilizable y con mmap
+    for umbral in (1024 * 1024, 0):
+        engine = HashEngine(["md5", "sha256"], buffer_size=4, mmap_threshold=umbral)
+        contador = Contador()
+        assert engine.hash_file(temp_file, consumers=[contador]) == esperado
+        assert contador.total == len(b"Test content")
+    
+    assert HashEngine(["md5", "sha256"]).hash_buffer(b"Test content") == esperado
+    
+    os.unlink(temp_file)
+
+def test_directory_walker(tmp_path):
+    """Prueba el recorrido paralelo con filtros y reutilización del stat"""
+    for ruta, tamaño in [("a.exe", 10), ("b.txt", 10), ("vacio.exe", 0),
+                         ("sub/c.exe", 10), ("sub/prof/d.exe", 10), ("cache/e.exe", 10)]:
+        archivo = tmp_path / ruta
+        archivo.parent.mkdir(parents=True, exist_ok=True)
+        archivo.write_bytes(b"x" * tamaño)
+    
+    todos = {r.path for r in DirectoryWalker(threads=1).walk(tmp_path)}
+    assert len(todos) == 6
+    assert {r.path for r in DirectoryWalker(threads=4).walk(tmp_path)} == todos
+    
+    walker = DirectoryWalker(include=["*.exe"], exclude=["cache"], max_depth=1, min_size=1, threads=4)
+    registros = list(walker.walk(tmp_path))
+    assert sorted(os.path.relpath(r.path, tmp_path) for r in registros) == ["a.exe", "sub/c.exe"]
+    assert all(r.stat.st_size == 10 for r in registros)
+    
+    assert [r.name for r in DirectoryWalker(include=["sub/prof/*"], threads=1).walk(tmp_path)] == ["d.exe"]
+
 def test_report_generator():
     """Prueba el generador de reportes"""
     generator = ReportGenerator()
@@ -88,6 +136,29 @@ def test_report_generator():
     
     os.unlink(report_path)
 
+def test_streaming_report_writer(tmp_path):
+    """Prueba la escritura incremental de reportes JSONL/CSV"""
+    import csv
+    
+    base = tmp_path / "reporte"
+    with StreamingReportWriter(base, fsync_every=1) as writer:
+        writer.write({"archivo": "a.exe", "razones": ["Firma conocida"]})
+        # Los resultados ya están en disco antes de cerrar el reporte
+        with open(f"{base}.jsonl") as f:
+            assert json.loads(f.readline())["archivo"] == "a.exe"
+        writer.write({"archivo": "b.dll", "razones": []})
+        writer.close({"total": 2})
+    
+    with open(f"{base}.jsonl") as f:
+        lineas = [json.loads(linea) for linea in f]
+    assert [l.get("archivo") for l in lineas[:2]] == ["a.exe", "b.dll"]
+    assert lineas[-1] == {"resumen": {"total": 2}}
+    
+    with open(f"{base}.csv", newline="") as f:
+        filas = list(csv.DictReader(f))
+    assert [fila["archivo"] for fila in filas] == ["a.exe", "b.dll"]
+    assert json.loads(filas[0]["razones"]) == ["Firma conocida"]
+
 def test_network_utils():
     """Prueba las utilidades de red"""
     # Prueba de IP pública
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Pruebas unitarias para la extracción de contenedores en memoria
+"""
+
+import io
+import gzip
+import tarfile
+import zipfile
+from scripts.utilidades.containers import ContainerLimits, ExtractionBudget, container_kind, iter_members
+from scripts.utilidades.malware_detector import MalwareDetector
+
+def _zip(miembros):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archivo:
+        for nombre, contenido in miembros.items():
+            archivo.writestr(nombre, contenido)
+    return buffer.getvalue()
+
+def test_iter_members_formats():
+    """Prueba la detección y el recorrido de ZIP, TAR.GZ y GZIP"""
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w:gz") as archivo:
+        info = tarfile.TarInfo("dentro.txt")
+        info.size = 4
+        archivo.addfile(info, io.BytesIO(b"hola"))
+    tgz = buffer.getvalue()
+    zip_ = _zip({"a.txt": b"uno", "b/c.txt": b"dos"})
+
+    assert container_kind(zip_) == 'zip'
+    assert container_kind(tgz) == 'gzip'
+    assert container_kind(b"texto") is None
+
+    budget = ExtractionBudget(ContainerLimits())
+    assert [(m.name, m.data) for m in iter_members(zip_, "x.zip", budget)] == [("a.txt", b"uno"), ("b/c.txt", b"dos")]
+    # El .tgz se descomprime a un .tar, que a su vez es un contenedor
+    (capa,) = iter_members(tgz, "x.tgz", budget)
+    assert capa.name == "x.tar" and container_kind(capa.data) == 'tar'
+    assert [(m.name, m.data) for m in iter_members(capa.data, capa.name, budget)] == [("dentro.txt", b"hola")]
+    assert not budget.warnings
+
+def test_zip_bomb_limits():
+    """Prueba que el ratio y el presupuesto total detienen la extracción"""
+    bomba = _zip({"ceros.bin": bytes(8 * 1024 * 1024)})
+    budget = ExtractionBudget(ContainerLimits())
+    assert list(iter_members(bomba, "bomba.zip", budget)) == []
+    assert budget.ratio_exceeded and "zip bomb" in budget.warnings[0]
+
+    budget = ExtractionBudget(ContainerLimits(max_total_bytes=5))
+    miembros = list(iter_members(_zip({"a": b"123", "b": b"456"}), "x.zip", budget))
+    assert [m.name for m in miembros] == ["a"]
+    assert budget.warnings
+
+def test_detector_recurses(tmp_path):
+    """Prueba el escaneo recursivo con rutas externo!interno y la caché de veredictos"""
+    malicioso = b"MZ... CreateRemoteThread ... cmd.exe"
+    interno = _zip({"payload.exe": malicioso})
+    ruta = tmp_path / "muestra.zip"
+    ruta.write_bytes(_zip({"leeme.txt": b"nada", "anidado.zip": interno,
+                           "copia.gz": gzip.compress(malicioso)}))
+
+    detector = MalwareDetector(container_limits=ContainerLimits(max_depth=2))
+    reporte = detector.scan_file(str(ruta))
+    contenedor = reporte['container']
+    assert contenedor['type'] == 'zip' and contenedor['members_scanned'] == 3
+    rutas = [m['file_path'] for m in contenedor['flagged_members']]
+    assert rutas == [f"{ruta}!anidado.zip", f"{ruta}!copia.gz"]
+    anidado = contenedor['flagged_members'][0]['container']['flagged_members'][0]
+    assert anidado['file_path'] == f"{ruta}!anidado.zip!payload.exe"
+    assert anidado['yara_matches'] == ['suspicious_behavior']
+    assert reporte['risk_score'] == anidado['risk_score'] > 0
+
+    # El mismo contenido en otro archivo se resuelve desde la caché de miembros
+    copia = contenedor['flagged_members'][1]['container']['flagged_members'][0]
+    assert copia['file_path'] == f"{ruta}!copia.gz!copia" and copia['md5_hash'] == anidado['md5_hash']
+
+    # Con profundidad 1 el ZIP anidado no se abre y queda el aviso
+    detector = MalwareDetector(container_limits=ContainerLimits(max_depth=1))
+    reporte = detector.scan_file(str(ruta))
+    assert any("Nesting" in aviso for aviso in reporte['container']['warnings'])
+
+def test_member_cache_by_kind():
+    """Prueba que la caché de miembros distingue el mismo contenido leído como EML o como hoja"""
+    from email.message import EmailMessage
+    correo = EmailMessage()
+    correo["Subject"] = "factura"
+    correo.set_content("adjunto")
+    correo.add_attachment(b"MZ... CreateRemoteThread ...", maintype="application",
+                          subtype="octet-stream", filename="factura.exe")
+    datos = correo.as_bytes()
+
+    detector = MalwareDetector()
+    contenedor = detector.analyze_container("x.zip", _zip({"correo.txt": datos, "correo.eml": datos}),
+                                            'zip', 0, ExtractionBudget(detector.container_limits))
+    (eml,) = contenedor['flagged_members']
+    assert eml['file_path'] == "x.zip!correo.eml" and eml['container']['type'] == 'eml'
+    assert eml['container']['flagged_members'][0]['yara_matches'] == ['suspicious_behavior']
+
+    # El MD5 ya calculado para la caché no cambia el resultado de la hoja
+    hoja = detector._scan_member("y.zip!correo.txt", datos, 1, ExtractionBudget(detector.container_limits))
+    directo = detector._scan_data("y.zip!correo.txt", datos, 1, ExtractionBudget(detector.container_limits))
+    assert (hoja['md5_hash'], hoja['tlsh'], hoja['entropy']) == (directo['md5_hash'], directo['tlsh'],
+                                                                   directo['entropy'])
@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Pruebas unitarias para el cálculo de entropía
+"""
+
+import os
+import numpy as np
+from scripts.utilidades.common import HashEngine
+from scripts.utilidades.entropy import EntropyProfile, byte_histogram, section_entropy, shannon_entropy
+
+def test_shannon_entropy():
+    """Prueba la entropía de histogramas conocidos"""
+    assert shannon_entropy(np.zeros(256, dtype=np.int64)) == 0.0
+    assert shannon_entropy(byte_histogram(b"A" * 1001)) == 0.0
+    assert shannon_entropy(byte_histogram(bytes(range(256)) * 4)) == 8.0
+    assert byte_histogram(b"abcab").tolist()[97:100] == [2, 2, 1]
+    assert section_entropy(b"AAAABBBB", [(0, 4), (0, 8), (100, 4)]) == [0.0, 1.0, 0.0]
+
+def test_profile_while_hashing():
+    """Prueba el perfil calculado durante el hashing y la región cifrada embebida"""
+    datos = b"A" * 200_000 + os.urandom(60_000) + np.arange(50_000, dtype=np.uint32).tobytes()
+    perfil = EntropyProfile()
+    HashEngine(["md5"], buffer_size=10_000).hash_buffer(datos, [perfil])
+
+    assert perfil.size == len(datos)
+    assert np.isclose(perfil.entropy, shannon_entropy(byte_histogram(datos)))
+    regiones = perfil.high_entropy_regions()
+    # La región aleatoria se detecta; la tabla de enteros no, aunque su byte bajo sea uniforme
+    assert len(regiones) == 1
+    assert 196_000 <= regiones[0]['offset'] <= 200_000
+    assert 56_000 <= regiones[0]['size'] <= 64_000
+
+    # El resultado no depende del tamaño de los bloques
+    otro = EntropyProfile()
+    HashEngine(["md5"], buffer_size=7_777).hash_buffer(datos, [otro])
+    assert np.allclose(otro.entropy_map(), perfil.entropy_map())
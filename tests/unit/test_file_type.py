@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Pruebas unitarias para la detección de tipo de archivo
+"""
+
+import io
+import struct
+import zipfile
+import magic
+from scripts.utilidades.common import HashEngine
+from scripts.utilidades.file_type import FileTypeDetector
+
+def test_signature_table():
+    """Prueba la identificación de formatos comunes sin libmagic"""
+    elf = b"\x7fELF\x02\x01\x01\x00" + b"\x00" * 8 + struct.pack("<HH", 2, 62) + b"\x00" * 44
+    assert FileTypeDetector.sniff(elf) == "ELF 64-bit LSB executable, x86-64, version 1 (SYSV)"
+    assert FileTypeDetector.sniff(b"%PDF-1.7\n") == "PDF document, version 1.7"
+    assert FileTypeDetector.sniff(b"#!/usr/bin/env python3\nprint(1)\n").startswith("Python script")
+
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as z:
+        z.writestr("[Content_Types].xml", "<Types/>")
+        z.writestr("word/document.xml", "<w:document/>")
+    assert FileTypeDetector.sniff(buffer.getvalue()) == "Microsoft Word 2007+"
+
+    # Los formatos sin firma propia se delegan en libmagic
+    assert FileTypeDetector.sniff(b"texto plano\n") is None
+
+def test_type_from_hashing_header(tmp_path):
+    """Prueba que el tipo se obtiene de la cabecera capturada durante el hashing"""
+    archivo = tmp_path / "script.sh"
+    archivo.write_bytes(b"Hola mundo\n" * 2000)
+
+    detector = FileTypeDetector()
+    cabecera = detector.capture()
+    digest = HashEngine(["sha256"], buffer_size=1024).hash_file(str(archivo), [cabecera])["sha256"]
+    assert len(cabecera.data) == 8192
+
+    tipo = detector.from_buffer(cabecera.data, digest)
+    assert tipo == magic.from_file(str(archivo))
+    # Resultado en caché por hash
+    assert detector.from_buffer(b"", digest) == tipo
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Pruebas unitarias para el hash difuso TLSH y el índice de similitud
+"""
+
+import os
+import hashlib
+from scripts.utilidades.common import HashEngine
+from scripts.utilidades import fuzzy_hash
+from scripts.utilidades.fuzzy_hash import FuzzyHashIndex, TLSHDigest, tlsh_distance
+
+DATOS = b"".join(hashlib.sha256(i.to_bytes(4, 'little')).digest() for i in range(1000))
+# Digests de py-tlsh con el checksum a cero
+ORIGINAL = "T100E2F179E15BFDF7FE07E4ABCA358B20775E39382D0602A1080411ABFA97148AD74B58"
+VARIANTE = "T100E2F169E15FFDF7EE06E47BCA35CB10775A3D386D0642A1040411ABFA97148AD34B58"
+
+def test_numpy_digest_matches_tlsh():
+    """Prueba que la implementación NumPy produce el digest de py-tlsh"""
+    digest = TLSHDigest(native=False)
+    HashEngine(["md5"], buffer_size=4099).hash_buffer(DATOS, [digest])
+    assert digest.hexdigest() == ORIGINAL
+
+    corto = TLSHDigest(native=False)
+    corto.update(b"A" * 1000)
+    assert corto.hexdigest() is None
+
+    assert tlsh_distance(ORIGINAL, ORIGINAL) == 0
+    assert tlsh_distance(ORIGINAL, VARIANTE) == 14
+
+def test_similarity_index(tmp_path):
+    """Prueba la búsqueda de una variante entre muestras no relacionadas"""
+    indice = FuzzyHashIndex(str(tmp_path))
+    ruido = ["T1" + os.urandom(35).hex().upper() for _ in range(2000)]
+    assert indice.add([(digest, "ruido") for digest in ruido] + [(ORIGINAL, "familia")]) == 2001
+    assert indice.add([(ORIGINAL, "otra")]) == 0
+
+    similares = FuzzyHashIndex(str(tmp_path)).query(VARIANTE)
+    assert similares == [{'label': 'familia', 'tlsh': ORIGINAL, 'distance': 14}]
+    assert indice.query(VARIANTE, threshold=10) == []
+
+def test_incremental_add_and_merge(tmp_path, monkeypatch):
+    """Prueba los agregados al delta, la deduplicación contra el índice ordenado y la fusión"""
+    monkeypatch.setattr(fuzzy_hash, "DELTA_MIN_ROWS", 100)
+    indice = FuzzyHashIndex(str(tmp_path))
+    ruido = ["T1" + os.urandom(35).hex().upper() for _ in range(300)]
+    assert indice.add([(digest, "ruido") for digest in ruido[:200]]) == 200
+    assert len(indice.digests) == 200 and len(indice.delta) == 0
+
+    # Los nuevos van al delta; los ya indexados o ya en el delta no se repiten
+    assert indice.add([(ORIGINAL, "familia"), (ruido[5], "otra")]) == 1
+    assert indice.add([(ORIGINAL, "otra"), (ruido[250], "ruido")]) == 1
+    assert len(indice.delta) == 2 and len(indice) == 202
+    assert indice.query(VARIANTE) == [{'label': 'familia', 'tlsh': ORIGINAL, 'distance': 14}]
+
+    # Otro proceso ve el delta; al crecer se integra en el índice ordenado
+    reabierto = FuzzyHashIndex(str(tmp_path))
+    assert len(reabierto) == 202 and reabierto.version == indice.version
+    assert reabierto.add([(digest, "ruido") for digest in ruido[200:]]) == 99
+    assert len(reabierto.delta) == 0 and len(reabierto.digests) == 301
+    assert reabierto.query(VARIANTE)[0]['label'] == 'familia'
+    assert FuzzyHashIndex(str(tmp_path)).add([(ORIGINAL, "x"), (ruido[299], "x")]) == 0
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Pruebas unitarias para el índice de reputación de hashes
+"""
+
+import hashlib
+from scripts.utilidades.hash_index import HashReputationIndex
+
+def _hashes(prefijo, cantidad, algoritmo="sha256"):
+    return [hashlib.new(algoritmo, f"{prefijo}{i}".encode()).hexdigest() for i in range(cantidad)]
+
+def test_importar_y_consultar(tmp_path):
+    """Prueba la importación de feeds CSV y listas planas"""
+    sha256 = _hashes("malo", 100)
+    md5 = _hashes("malo", 50, "md5")
+    feed_csv = tmp_path / "feed.csv"
+    feed_csv.write_text("sha256,familia\n" + "".join(f"{h},Emotet\n" for h in sha256))
+    feed_txt = tmp_path / "lista.txt"
+    feed_txt.write_text("# comentario\n" + "".join(f"{h.upper()}\n" for h in md5))
+    
+    indice = HashReputationIndex(str(tmp_path / "indice"))
+    assert indice.import_feed(str(feed_csv)) == 100
+    assert indice.import_feed(str(feed_txt)) == 50
+    
+    assert indice.lookup(sha256[7]) == "Emotet"
+    assert indice.lookup(md5[3]) == "lista"
+    assert indice.lookup(_hashes("limpio", 1)[0]) is None
+    assert indice.lookup("no es un hash") is None
+    assert len(indice) == 150
+    indice.close()
+
+def test_actualizacion_incremental(tmp_path):
+    """Prueba que las actualizaciones se fusionan y conservan la etiqueta original"""
+    directorio = str(tmp_path / "indice")
+    primeros = _hashes("a", 300, "sha1")
+    segundos = _hashes("b", 300, "sha1")
+    
+    indice = HashReputationIndex(directorio, chunk_size=64)
+    assert indice.add((h, "primero") for h in primeros) == 300
+    version = indice.version
+    assert indice.add((h, "segundo") for h in primeros[:10] + segundos) == 300
+    assert indice.version > version
+    indice.close()
+    
+    indice = HashReputationIndex(directorio)
+    assert len(indice) == 600
+    assert all(indice.lookup(h) == "primero" for h in primeros)
+    assert all(indice.lookup(h) == "segundo" for h in segundos)
+    indice.close()
+
+def test_tramos_una_sola_mezcla(tmp_path, monkeypatch):
+    """Prueba que una importación en varios tramos reescribe el índice una sola vez"""
+    indice = HashReputationIndex(str(tmp_path / "indice"), chunk_size=50)
+    assert indice.add((h, "viejo") for h in _hashes("a", 40)) == 40
+
+    mezclas = []
+    original = indice._merge
+    monkeypatch.setattr(indice, "_merge", lambda table, tramos: mezclas.append(len(tramos)) or original(table, tramos))
+    # Repetidos dentro del lote, entre tramos y con el índice existente
+    entradas = [(h, f"tramo{i // 50}") for i, h in enumerate(_hashes("a", 20) + _hashes("b", 180) + _hashes("b", 60))]
+    assert indice.add(entradas) == 180
+    assert mezclas == [6]
+    assert len(indice) == 220
+    assert indice.lookup(_hashes("a", 1)[0]) == "viejo"
+    assert [indice.lookup(h) for h in _hashes("b", 180)[::60]] == ["tramo0", "tramo1", "tramo2"]
+    assert not [p for p in (tmp_path / "indice").iterdir() if p.is_dir()]
+    indice.close()
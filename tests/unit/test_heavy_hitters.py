@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Pruebas unitarias para el recuento de las IP más frecuentes
+"""
+
+import re
+import random
+from collections import Counter
+
+import numpy as np
+
+from scripts.utilidades.heavy_hitters import (CountMinSketch, ExactCounter, SpaceSaving,
+                                              format_ip, pack_ipv4, pack_ipv6)
+from scripts.utilidades.log_analyzer import analyze_logs
+
+def _flujo(n=20000, seed=7):
+    """IPs con frecuencias de tipo Zipf, como las de un log real"""
+    generador = random.Random(seed)
+    ips = [f"10.{generador.randint(0, 255)}.{generador.randint(0, 255)}.{i % 250}" for i in range(500)]
+    return generador.choices(ips, [1 / (i + 1) for i in range(len(ips))], k=n)
+
+def test_pack_and_format():
+    """Prueba el empaquetado de IPv4 e IPv6 y su vuelta a texto"""
+    claves, descartadas = pack_ipv4(["192.168.1.10", "010.0.0.1", "300.1.1.1", "0.0.0.0"])
+    assert descartadas == 1
+    assert [format_ip(c) for c in claves] == ["192.168.1.10", "10.0.0.1", "0.0.0.0"]
+    assert claves.dtype == np.uint32
+
+    claves, descartadas = pack_ipv6(["2001:DB8::1", "10:01:02", "fe80::1:2"])
+    assert descartadas == 1
+    assert [format_ip(c.tobytes()) for c in claves] == ["2001:db8::1", "fe80::1:2"]
+
+def test_exact_counter_matches_counter():
+    """Prueba que el recuento exacto combinado por partes coincide con Counter"""
+    flujo = _flujo()
+    esperado = Counter(flujo)
+    total = ExactCounter()
+    for inicio in range(0, len(flujo), 3000):
+        parte = ExactCounter()
+        parte.add(pack_ipv4(flujo[inicio:inicio + 3000])[0])
+        total.merge(parte)
+    total.add(pack_ipv6(["::1", "::1"])[0])
+    assert len(total) == len(esperado) + 1
+    assert [(format_ip(c), n) for c, n, _ in total.most_common(5)] == esperado.most_common(5)
+
+def test_space_saving_bounds():
+    """Prueba las garantías de Space-Saving, también tras combinar resúmenes"""
+    flujo = _flujo()
+    esperado = Counter(flujo)
+    partes = [SpaceSaving(50), SpaceSaving(50)]
+    for n, inicio in enumerate(range(0, len(flujo), 1000)):
+        partes[n % 2].add(pack_ipv4(flujo[inicio:inicio + 1000])[0])
+    resumen = partes[0]
+    resumen.merge(partes[1])
+    assert resumen.total == len(flujo)
+
+    limite = len(flujo) / 50
+    estimados = {format_ip(c): (n, error) for c, n, error in resumen.most_common(50)}
+    for ip, (n, error) in estimados.items():
+        assert esperado[ip] <= n <= esperado[ip] + error and error <= limite
+    # Toda IP con más apariciones que el límite está en el resumen
+    assert all(ip in estimados for ip, n in esperado.items() if n > limite)
+    assert [ip for ip, _ in esperado.most_common(3)] == list(estimados)[:3]
+
+def test_count_min_bounds():
+    """Prueba que Count-Min sobreestima dentro de epsilon * total y encuentra el top-k"""
+    flujo = _flujo()
+    esperado = Counter(flujo)
+    sketch, otro = CountMinSketch(0.001, 0.01, candidate_size=20), CountMinSketch(0.001, 0.01, candidate_size=20)
+    sketch.add(pack_ipv4(flujo[:12000])[0])
+    otro.add(pack_ipv4(flujo[12000:])[0])
+    otro.add(pack_ipv6(["2001:db8::1"] * 5000)[0])
+    sketch.merge(otro)
+
+    resultado = sketch.most_common(4)
+    assert format_ip(resultado[0][0]) == "2001:db8::1"
+    assert [format_ip(c) for c, _, _ in resultado[1:]] == [ip for ip, _ in esperado.most_common(3)]
+    for clave, n, limite in resultado[1:]:
+        assert esperado[format_ip(clave)] <= n <= esperado[format_ip(clave)] + limite
+    assert resultado[0][2] == int(np.ceil(0.001 * (len(flujo) + 5000)))
+
+def test_analyze_logs_modes(tmp_path, capsys):
+    """Prueba que los tres modos dan el mismo top en un log con IPv4 e IPv6"""
+    log = tmp_path / "access.log"
+    lineas = [f"Oct 17 10:01:02 host sshd[1]: Failed password from {ip} port 22\n" for ip in _flujo(3000)]
+    lineas += ["Oct 17 10:01:03 host sshd[1]: ERROR from 2001:db8::7 port 22\n"] * 1000
+    log.write_text("".join(lineas))
+
+    esperado = Counter(_flujo(3000)).most_common(2)
+    for modo in ("exact", "space-saving", "count-min"):
+        analyze_logs(str(log), mode=modo, top=3, epsilon=0.01)
+        salida = capsys.readouterr().out
+        ips = re.findall(r"^(\S+): \d+ occurrences", salida, re.M)
+        assert ips[0] == "2001:db8::7" and ips[1:] == [ip for ip, _ in esperado], modo
+        assert modo != "exact" or "2001:db8::7: 1000 occurrences\n" in salida
+        assert "- Oct 17 10:01:03 host sshd[1]: ERROR from 2001:db8::7 port 22" in salida
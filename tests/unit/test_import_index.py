@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Pruebas unitarias para el índice de imports
+"""
+
+from scripts.utilidades.import_index import ImportIndex
+
+INYECTOR = [("KERNEL32.dll", ["VirtualAllocEx", "WriteProcessMemory", "CreateRemoteThread", "OpenProcess"])]
+DESCARGADOR = [("KERNEL32.dll", ["VirtualAllocEx"]), ("urlmon.dll", ["URLDownloadToFileW"])]
+
+def test_incremental_index(tmp_path):
+    """Prueba las consultas por funciones importadas e imphash"""
+    db = str(tmp_path / "imports.db")
+    with ImportIndex(db) as indice:
+        assert indice.add("A" * 64, "aa11", INYECTOR, "/muestras/a.exe")
+        assert indice.add("b" * 64, "bb22", DESCARGADOR)
+        # Una muestra ya indexada no se duplica
+        assert not indice.add("a" * 64, "aa11", INYECTOR)
+
+    # Las muestras nuevas se agregan sobre el índice existente
+    with ImportIndex(db) as indice:
+        assert indice.add("c" * 64, "aa11", INYECTOR + [("user32.dll", ["MessageBoxA"])])
+        assert len(indice) == 3
+
+        assert indice.samples_importing(["virtualallocex"]) == ["a" * 64, "b" * 64, "c" * 64]
+        assert indice.samples_importing(
+            ["VirtualAllocEx", "WriteProcessMemory", "CreateRemoteThread"]) == ["a" * 64, "c" * 64]
+        assert indice.samples_importing(["VirtualAllocEx", "URLDownloadToFileW"]) == ["b" * 64]
+        assert indice.samples_importing(["URLDownloadToFileW"], dll="kernel32.dll") == []
+        assert indice.samples_with_imphash("AA11") == ["a" * 64, "c" * 64]
@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Pruebas unitarias para el procesamiento de logs por rangos
+"""
+
+from scripts.utilidades import log_chunks
+from scripts.utilidades.log_chunks import iter_line_blocks, line_ranges
+from scripts.analisis.security_log_analyzer import SecurityLogAnalyzer
+
+CONTENIDO = (b"uno\nFailed password dos\r\ntres\rcuatro\n\n" + "cinco ñ\n".encode() * 50
+             + b"Failed password \xff\xfe seis\nAccepted password\nfinal sin salto")
+
+def test_line_ranges():
+    """Prueba que los rangos cubren el buffer y terminan en salto de línea"""
+    for partes in (1, 3, 7, 100):
+        rangos = line_ranges(CONTENIDO, partes, min_size=1)
+        assert rangos[0][0] == 0 and rangos[-1][1] == len(CONTENIDO)
+        assert all(fin == siguiente for (_, fin), (siguiente, _) in zip(rangos, rangos[1:]))
+        assert all(CONTENIDO[fin - 1:fin] == b"\n" for _, fin in rangos[:-1])
+    assert line_ranges(b"", 4) == []
+
+def test_blocks_like_text_mode(tmp_path, monkeypatch):
+    """Prueba que las líneas por rangos y bloques son las del modo texto"""
+    archivo = tmp_path / "auth.log"
+    archivo.write_bytes(CONTENIDO)
+    with open(archivo, encoding="utf-8", errors="replace") as f:
+        esperado = list(f)
+    lineas = [linea for inicio, fin in line_ranges(CONTENIDO, 5, min_size=1)
+              for bloque in iter_line_blocks(CONTENIDO, inicio, fin, block_size=16)
+              for linea in bloque]
+    assert lineas == esperado
+
+    # En paralelo el resultado combinado es el del análisis secuencial
+    monkeypatch.setattr(log_chunks, "MIN_RANGE_SIZE", 16)
+    resultados = []
+    for workers in (1, 2):
+        analizador = SecurityLogAnalyzer(str(archivo))
+        analizador.analyze_file(workers)
+        resultados.append({tipo: [e['linea'] for e in entradas] for tipo, entradas in analizador.results.items()})
+    assert resultados[0] == resultados[1]
+    assert resultados[1] == {'intentos_fallidos': ["Failed password dos", "Failed password \ufffd\ufffd seis"],
+                             'acceso_exitoso': ["Accepted password"]}
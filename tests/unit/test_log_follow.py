@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Pruebas unitarias para el seguimiento continuo de logs
+"""
+
+import os
+import signal
+import pytest
+from scripts.utilidades.log_follow import LogFollower
+
+@pytest.fixture(autouse=True)
+def limite_tiempo():
+    """Evita que una prueba fallida se quede esperando líneas para siempre"""
+    def expirado(signum, frame):
+        raise TimeoutError("sin líneas nuevas")
+    anterior = signal.signal(signal.SIGALRM, expirado)
+    signal.alarm(20)
+    yield
+    signal.alarm(0)
+    signal.signal(signal.SIGALRM, anterior)
+
+def _lineas(seguimiento, n):
+    return [next(seguimiento)[1] for _ in range(n)]
+
+def _agregar(ruta, texto):
+    with open(ruta, "a") as f:
+        f.write(texto)
+
+@pytest.mark.parametrize("inotify", [True, False])
+def test_follow_rotation_and_restart(tmp_path, inotify):
+    """Prueba el seguimiento tras renombrado, truncado y reinicio con rotación"""
+    log = tmp_path / "auth.log"
+    estado = str(tmp_path / "estado.json")
+    log.write_text("antigua\n")
+
+    seguidor = LogFollower([str(log)], estado, interval=0.05, use_inotify=inotify)
+    seguimiento = seguidor.follow()
+    _agregar(log, "b\nmedia")
+    assert next(seguimiento) == (str(log), "b\n")
+
+    # Rotación por renombrado: se termina el antiguo (incluida la línea a medias) y se sigue el nuevo
+    os.rename(log, tmp_path / "auth.log.1")
+    _agregar(tmp_path / "auth.log.1", " tardía\n")
+    log.write_text("d\nuna línea más larga\n")
+    assert _lineas(seguimiento, 3) == ["media tardía\n", "d\n", "una línea más larga\n"]
+
+    # copytruncate: el archivo vuelve a empezar
+    log.write_text("e\n")
+    assert _lineas(seguimiento, 1) == ["e\n"]
+    seguimiento.close()
+    seguidor.close()
+
+    # Reinicio tras una rotación mientras no se seguía: se recupera el final del rotado
+    _agregar(log, "f\n")
+    os.rename(log, tmp_path / "auth.log.1")
+    log.write_text("g\n")
+    seguidor = LogFollower([str(log)], estado, interval=0.05, use_inotify=inotify)
+    seguimiento = seguidor.follow()
+    assert _lineas(seguimiento, 2) == ["f\n", "g\n"]
+    seguimiento.close()
+    seguidor.close()
+
+def test_stop_mid_batch_and_restart(tmp_path):
+    """Prueba que al dejar de iterar se guarda el offset de la última línea entregada"""
+    log = tmp_path / "auth.log"
+    estado = str(tmp_path / "estado.json")
+    log.write_text("".join(f"línea {i}\n" for i in range(100000)))
+
+    seguidor = LogFollower([str(log)], estado, from_start=True, interval=0.05, use_inotify=False)
+    seguimiento = seguidor.follow()
+    assert _lineas(seguimiento, 10)[-1] == "línea 9\n"
+    seguimiento.close()
+    seguidor.close()
+
+    seguidor = LogFollower([str(log)], estado, interval=0.05, use_inotify=False)
+    seguimiento = seguidor.follow()
+    assert _lineas(seguimiento, 2) == ["línea 10\n", "línea 11\n"]
+    seguimiento.close()
+    seguidor.close()
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Pruebas unitarias para la búsqueda de varios patrones en líneas de log
+"""
+
+import re
+from scripts.utilidades.log_patterns import LogPatternMatcher, required_literal
+from scripts.analisis.security_log_analyzer import SecurityLogAnalyzer
+
+PATRONES = {
+    'fallido': r'Failed password',
+    'sudo': r'sudo:.*COMMAND=',
+    'puerto': r'port \d+ ssh2',
+    'ip': r'\d+\.\d+\.\d+\.\d+',
+}
+
+LINEAS = [
+    "sshd[1]: FAILED PASSWORD for root from 10.0.0.1 port 22 ssh2",
+    "sudo:  bob : TTY=pts/0 ; USER=root ; command=/bin/ls",
+    "COMMAND= sin sudo delante",
+    "sshd[2]: Failed password for ü from 10.0.0.2 port 23 ssh2",
+    "",
+    "kernel: nada que ver",
+]
+
+def test_required_literal():
+    """Prueba la extracción del literal obligatorio de cada patrón"""
+    assert required_literal(r'sudo:.*COMMAND=') == 'COMMAND='
+    assert required_literal(r'port \d+ ssh2') == 'port '
+    assert required_literal(r'\d+\.\d+') is None
+    assert required_literal(r'(?:Failed|Accepted) password') == ' password'
+    assert required_literal(r'a|bcd') is None
+
+def test_matches_like_re_search():
+    """Prueba que el resultado coincide con re.search patrón a patrón"""
+    matcher = LogPatternMatcher(PATRONES, re.IGNORECASE)
+    esperado = {}
+    for i, linea in enumerate(LINEAS):
+        nombres = [n for n, p in PATRONES.items() if re.search(p, linea, re.IGNORECASE)]
+        assert matcher.match(linea) == nombres
+        for nombre in nombres:
+            esperado.setdefault(nombre, []).append(i)
+    assert matcher.match_lines(LINEAS) == esperado
+    assert esperado['fallido'] == [0, 3] and esperado['sudo'] == [1]
+
+    # Sin IGNORECASE el prefiltro distingue mayúsculas
+    sensible = LogPatternMatcher(PATRONES, 0)
+    assert sensible.match_lines(LINEAS)['fallido'] == [3]
+
+def test_analyze_file_invalid_bytes(tmp_path):
+    """Prueba que un byte no UTF-8 no descarta el lote de líneas que lo contiene"""
+    archivo = tmp_path / "auth.log"
+    archivo.write_bytes(b"Failed password a\n\xff\xfe mal\n" + b"Failed password b\n" * 5)
+    analizador = SecurityLogAnalyzer(str(archivo))
+    analizador.analyze_file()
+    lineas = [e['linea'] for e in analizador.results['intentos_fallidos']]
+    assert lineas == ["Failed password a"] + ["Failed password b"] * 5
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Pruebas unitarias para la hora de los eventos de log y las ventanas deslizantes
+"""
+
+import os
+from datetime import datetime
+from scripts.utilidades.log_time import SlidingWindowCounter, TimestampParser
+from scripts.analisis.security_log_analyzer import SecurityLogAnalyzer
+
+EPOCH = 1792224062  # 2026-10-17T08:01:02Z
+
+def test_timestamp_formats():
+    """Prueba los formatos reconocidos frente a strptime"""
+    parser = TimestampParser(reference=EPOCH)
+    local = datetime(2026, 10, 17, 10, 1, 2).timestamp()
+    assert parser.parse("Oct 17 10:01:02 host sshd[1]: Failed password") == local
+    assert parser.parse("Oct  7 10:01:02.250 host") == datetime(2026, 10, 7, 10, 1, 2, 250000).timestamp()
+    assert parser.parse("2026-10-17T10:01:02.5+02:00 host sshd") == EPOCH + 0.5
+    assert parser.parse("2026-10-17 10:01:02,250 ERROR") == local + 0.25
+    assert parser.parse("<34>1 2026-10-17T08:01:02.003Z host su - ID47 - 'su root' failed") == EPOCH + 0.003
+    assert parser.parse('10.0.0.1 - - [17/Oct/2026:10:01:02 +0200] "GET / HTTP/1.1"') == EPOCH
+    assert parser.parse('{"__REALTIME_TIMESTAMP":"1792224062000000"}') == EPOCH
+    assert parser.parse("sin hora") is None
+    assert parser.parse("Feb 31 10:01:02 imposible") is None
+
+    # Un diciembre leído en enero pertenece al año anterior
+    enero = TimestampParser(reference=datetime(2027, 1, 2).timestamp())
+    assert enero.parse("Dec 31 23:59:59 host") == datetime(2026, 12, 31, 23, 59, 59).timestamp()
+
+def test_sliding_window_counter():
+    """Prueba el recuento en ventana, los eventos antiguos y el límite de claves"""
+    contador = SlidingWindowCounter(60, buckets=12, max_keys=2)
+    assert [contador.add('ip', t) for t in (0, 10, 20, 59, 65, 119, 500)] == [1, 2, 3, 4, 4, 2, 1]
+    assert contador.add('ip', 100) == 1  # Fuera de la ventana del evento más reciente
+    contador.add('otra', 0)
+    contador.add('tercera', 0)
+    assert len(contador) == 2 and contador.count('ip') == 0
+
+def test_brute_force_window(tmp_path):
+    """Prueba la alerta por IP con la hora real de los eventos"""
+    lineas = [f"Oct 17 10:{m:02d}:{s:02d} host sshd[1]: Failed password for root from 10.0.0.{ip} port 22 ssh2\n"
+              for m, s, ip in [(0, 0, 1), (0, 10, 1), (0, 20, 2), (0, 30, 1), (0, 40, 1), (5, 0, 1), (5, 5, 1),
+                               (5, 10, 1), (5, 15, 1), (5, 20, 1)]]
+    log = tmp_path / "auth.log"
+    log.write_text("".join(lineas))
+    os.utime(log, (EPOCH + 86400, EPOCH + 86400))
+
+    analizador = SecurityLogAnalyzer(str(log))
+    analizador.analyze_file()
+    fallidos = analizador.results['intentos_fallidos']
+    assert fallidos[0]['timestamp'] == "2026-10-17T10:00:00" and fallidos[0]['ip'] == "10.0.0.1"
+    assert fallidos[0]['usuario'] == "root"
+    # Cuatro intentos de 10.0.0.1 en el primer minuto no bastan; cinco en el sexto sí
+    (alerta,) = analizador.results['fuerza_bruta_por_ip']
+    assert alerta['ip'] == "10.0.0.1" and alerta['timestamp'] == "2026-10-17T10:05:20"
+    # Diez intentos contra root, pero repartidos en más de 300 segundos
+    assert 'fuerza_bruta_por_usuario' not in analizador.results
+
+def test_follow_across_days(tmp_path):
+    """Prueba que al seguir un log más de un día las fechas syslog no retroceden un año"""
+    log = tmp_path / "auth.log"
+    log.write_text("")
+    os.utime(log, (EPOCH, EPOCH))
+    analizador = SecurityLogAnalyzer(str(log))
+
+    linea = "Oct {d} 10:00:{s:02d} host sshd[1]: Failed password for root from 10.0.0.1 port 22 ssh2\n"
+    analizador._follow_line(str(log), linea.format(d=17, s=0), EPOCH)
+    eventos = []
+    for s in range(5):
+        eventos += analizador._follow_line(str(log), linea.format(d=19, s=s), EPOCH + 2 * 86400)
+    assert eventos[0]['timestamp'] == "2026-10-19T10:00:00"
+    (alerta,) = [e for e in eventos if e['tipo'] == 'fuerza_bruta_por_ip']
+    assert alerta['ip'] == "10.0.0.1" and alerta['timestamp'] == "2026-10-19T10:00:04"
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Pruebas unitarias para el escaneo de directorios con el pool de procesos
+"""
+
+import time
+from scripts.utilidades.common import DirectoryWalker
+from scripts.utilidades.malware_detector import MalwareDetector
+from scripts.utilidades.scan_cache import ScanCache
+
+def _arbol(tmp_path, n=24):
+    """Crea un árbol de muestras, todas con alguna cadena sospechosa"""
+    for i in range(n):
+        carpeta = tmp_path / "arbol" / f"d{i % 3}"
+        carpeta.mkdir(parents=True, exist_ok=True)
+        (carpeta / f"m{i:02d}.bat").write_bytes(b"cmd.exe /c " + bytes([65 + i]) * (i + 1))
+    return str(tmp_path / "arbol")
+
+def _resumen(reportes):
+    return [(r['file_path'], r['md5_hash'], r['risk_score']) for r in reportes]
+
+def test_pool_matches_serial(tmp_path):
+    """Prueba que el pool da los mismos reportes que el escaneo secuencial, en orden o no"""
+    directorio = _arbol(tmp_path)
+    # Con un único hilo de listado el orden del recorrido es determinista
+    detector = MalwareDetector(DirectoryWalker(threads=1))
+    serie = _resumen(detector.scan_directory(directorio))
+    assert len(serie) == 24
+
+    assert _resumen(detector.scan_directory(directorio, workers=2, ordered=True)) == serie
+    assert sorted(_resumen(detector.scan_directory(directorio, workers=2))) == sorted(serie)
+
+def test_pool_ordered_with_cached_entries(tmp_path):
+    """Prueba que los reportes en caché esperan detrás de los lotes anteriores en curso"""
+    directorio = _arbol(tmp_path)
+    detector = MalwareDetector(DirectoryWalker(threads=1))
+    db = str(tmp_path / "cache.db")
+    with ScanCache(db, detector.ruleset_version) as cache:
+        detector.scan_directory(directorio, cache)
+
+    # Se modifica uno de cada tres archivos: los demás salen de la caché intercalados con
+    # los lotes, dentro de un lote a medias o detrás de lotes ya enviados (lotes de 2)
+    for batch_size, marca in ((16, b" powershell"), (2, b" schtasks")):
+        time.sleep(0.01)
+        for i in range(0, 24, 3):
+            ruta = tmp_path / "arbol" / f"d{i % 3}" / f"m{i:02d}.bat"
+            ruta.write_bytes(ruta.read_bytes() + marca)
+        serie = _resumen(detector.scan_directory(directorio))
+
+        with ScanCache(db, detector.ruleset_version) as cache:
+            if batch_size == 16:
+                reportes = detector.scan_directory(directorio, cache, workers=2, ordered=True)
+            else:
+                reportes = list(detector.iter_scan(directorio, cache, workers=2, ordered=True,
+                                                   batch_size=batch_size))
+        assert _resumen(reportes) == serie
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Pruebas unitarias para la inspección perezosa de archivos PE
+"""
+
+import struct
+import hashlib
+import pefile
+import pytest
+from scripts.utilidades.pe_inspector import PEInspector
+
+def _pe():
+    """PE32 mínimo con una sección que contiene un import y un export"""
+    rva = lambda offset: 0x1000 + offset
+    seccion = bytearray(0x200)
+    # Importa KERNEL32.dll!ExitProcess
+    struct.pack_into("<IIIII", seccion, 0x00, rva(0x40), 0, 0, rva(0x60), rva(0x50))
+    struct.pack_into("<II", seccion, 0x40, rva(0x70), 0)
+    struct.pack_into("<II", seccion, 0x50, rva(0x70), 0)
+    seccion[0x60:0x6D] = b"KERNEL32.dll\0"
+    seccion[0x70:0x7E] = b"\0\0ExitProcess\0"
+    # Exporta Run
+    struct.pack_into("<IIHHIIIIIII", seccion, 0x100, 0, 0, 0, 0, rva(0x170), 1, 1, 1,
+                     rva(0x140), rva(0x150), rva(0x158))
+    struct.pack_into("<I", seccion, 0x140, rva(0))
+    struct.pack_into("<I", seccion, 0x150, rva(0x160))
+    struct.pack_into("<H", seccion, 0x158, 0)
+    seccion[0x160:0x164] = b"Run\0"
+    seccion[0x170:0x176] = b"x.dll\0"
+
+    cabecera = bytearray(0x200)
+    cabecera[0:2] = b"MZ"
+    struct.pack_into("<I", cabecera, 0x3C, 0x40)
+    cabecera[0x40:0x44] = b"PE\0\0"
+    struct.pack_into("<HHIIIHH", cabecera, 0x44, 0x14C, 1, 0x5F000000, 0, 0, 0xE0, 0x0102)
+    directorios = [(rva(0x100), 40), (rva(0), 40)] + [(0, 0)] * 14
+    struct.pack_into("<HBBIIIIIIIIIHHHHHHIIIIHHIIIIII" + "II" * 16, cabecera, 0x58,
+                     0x10B, 1, 0, 0x200, 0x200, 0, rva(0), rva(0), rva(0), 0x400000, 0x1000, 0x200,
+                     4, 0, 0, 0, 4, 0, 0, 0x2000, 0x200, 0, 2, 0, 0x100000, 0x1000, 0x100000, 0x1000,
+                     0, 16, *[valor for par in directorios for valor in par])
+    struct.pack_into("<8sIIIIIIHHI", cabecera, 0x138, b".rdata", 0x200, rva(0), 0x200, 0x200,
+                     0, 0, 0, 0, 0x40000040)
+    return bytes(cabecera + seccion)
+
+@pytest.fixture
+def directorios_parseados(monkeypatch):
+    """Registra los directorios que pefile parsea en cada llamada"""
+    llamadas = []
+    original = pefile.PE.parse_data_directories
+
+    def espia(self, directories=None, **kwargs):
+        llamadas.append(sorted(directories))
+        return original(self, directories=directories, **kwargs)
+
+    monkeypatch.setattr(pefile.PE, "parse_data_directories", espia)
+    return llamadas
+
+def test_fast_load_parses_only_requested_directories(directorios_parseados):
+    """Prueba que solo se parsean los directorios pedidos y el imphash"""
+    info = PEInspector().inspect(_pe(), "a" * 32, directories=('imports',))
+    assert info['machine'] == 0x14C and info['entry_point'] == 0x1000
+    assert [s['name'] for s in info['sections']] == ['.rdata']
+    assert info['imports'] == [('KERNEL32.dll', ['ExitProcess'])]
+    assert info['imphash'] == hashlib.md5(b"kernel32.exitprocess").hexdigest()
+    assert 'exports' not in info
+    assert directorios_parseados == [[pefile.DIRECTORY_ENTRY['IMAGE_DIRECTORY_ENTRY_IMPORT']]]
+
+def test_cache_per_digest_and_merge(directorios_parseados):
+    """Prueba la caché por hash y la fusión de directorios pedidos después"""
+    inspector = PEInspector(max_entries=2)
+    datos = _pe()
+    inspector.inspect(datos, "a" * 32, directories=('imports',))
+
+    # Con el mismo hash no se vuelve a parsear: ni siquiera se leen los bytes
+    assert inspector.inspect(b"no es un PE", "a" * 32, directories=('imports',))['imports']
+    assert len(directorios_parseados) == 1
+
+    # Un directorio nuevo se parsea solo él y se agrega a la entrada existente
+    info = inspector.inspect(datos, "a" * 32, directories=('exports', 'imports'))
+    assert info['exports'] == ['Run'] and info['imports'] == [('KERNEL32.dll', ['ExitProcess'])]
+    assert directorios_parseados[1] == [pefile.DIRECTORY_ENTRY['IMAGE_DIRECTORY_ENTRY_EXPORT']]
+    assert inspector.inspect(b"no es un PE", "a" * 32, directories=('imports', 'exports')) is info
+
+    # Sin hash, o tras salir de la caché, se parsean los datos recibidos
+    with pytest.raises(pefile.PEFormatError):
+        inspector.inspect(b"no es un PE")
+    inspector.inspect(datos, "b" * 32)
+    inspector.inspect(datos, "c" * 32)
+    with pytest.raises(pefile.PEFormatError):
+        inspector.inspect(b"no es un PE", "a" * 32)
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Pruebas unitarias para el motor de reglas de atributos
+"""
+
+import numpy as np
+from scripts.utilidades.rules_engine import AttributeRuleEngine
+
+REGLAS = [
+    {'reason': 'Extensión sospechosa', 'extensions': ['.exe', '.ps1']},
+    {'reason': 'Nombre sospechoso', 'name_contains': ['cmd.exe', 'mimikatz']},
+    {'reason': 'Permisos inusuales', 'modes': ['777', '666']},
+    {'reason': 'Archivo oculto', 'name_startswith': ['.']},
+    {'reason': 'SUID grande', 'mode_bits': '4000', 'min_size': 1024},
+]
+
+def test_evaluate_batch():
+    """Prueba la evaluación de un lote y la conversión a razones"""
+    motor = AttributeRuleEngine(REGLAS)
+    nombres = ['CMD.EXE', '.exe', 'notas.txt', '.bashrc', 'run.PS1.bak', 'Mimikatz.zip', 'su']
+    modos = np.array([0o100644, 0o100644, 0o100777, 0o100600, 0o100666, 0o100644, 0o104755],
+                     dtype=np.uint32)
+    tamanos = np.array([10, 10, 10, 10, 10, 10, 4096], dtype=np.int64)
+
+    razones = motor.reasons_for(motor.evaluate(nombres, modos, tamanos))
+    assert razones == [
+        ['Extensión sospechosa', 'Nombre sospechoso'],
+        # Como en Path.suffix, ".exe" no tiene extensión
+        ['Archivo oculto'],
+        ['Permisos inusuales'],
+        ['Archivo oculto'],
+        ['Permisos inusuales'],
+        ['Nombre sospechoso'],
+        ['SUID grande'],
+    ]
+
+def test_missing_columns():
+    """Prueba que los predicados sin columna no coinciden"""
+    motor = AttributeRuleEngine([{'reason': 'En tmp', 'path_contains': ['/tmp/'], 'case_sensitive': True},
+                                 {'reason': 'Grande', 'min_size': 1}])
+    coincidencias = motor.evaluate(['a', 'b'], paths=['/tmp/a', '/TMP/b'])
+    assert coincidencias.tolist() == [[True, False], [False, False]]
+
+def test_non_ascii_names():
+    """Prueba que un nombre que cambia de longitud al pasar a minúsculas no desplaza el lote"""
+    motor = AttributeRuleEngine([{'reason': 'exe', 'extensions': ['.exe']},
+                                 {'reason': 'hid', 'name_startswith': ['.']}])
+    nombres = ['İİİİİİ.txt', 'a.txt', 'b.exe', 'c.txt', '.d']
+    assert motor.reasons_for(motor.evaluate(nombres)) == [[], [], ['exe'], [], ['hid']]
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Pruebas unitarias para el ejecutor de muestras en sandbox
+"""
+
+import os
+import time
+import pytest
+from scripts.utilidades.sandbox_runner import SandboxRunner
+
+pytestmark = pytest.mark.skipif(os.name != "posix", reason="Requiere un sistema POSIX")
+
+def _script(tmp_path, nombre, cuerpo):
+    muestra = tmp_path / nombre
+    muestra.write_text(f"#!/bin/sh\n{cuerpo}\n")
+    muestra.chmod(0o755)
+    return str(muestra)
+
+def test_muestras_concurrentes_con_limite_de_tiempo(tmp_path):
+    """Prueba que las muestras corren en paralelo y se terminan al agotar el tiempo"""
+    lenta = _script(tmp_path, "lenta.sh", "sleep 30")
+    runner = SandboxRunner(workers=3, timeout=1, cpu_time=2, interval=0.2)
+    recibidos = []
+    
+    inicio = time.monotonic()
+    futuros = [runner.submit(lenta, recibidos.append) for _ in range(3)]
+    runner.wait()
+    assert time.monotonic() - inicio < 10
+    
+    for futuro in futuros:
+        comportamiento = futuro.result()
+        assert comportamiento['codigo_salida'] != 0
+    assert len(recibidos) == 3
+    runner.shutdown()
+
+def test_muestra_que_termina(tmp_path):
+    """Prueba el resultado de una muestra que termina sola"""
+    rapida = _script(tmp_path, "rapida.sh", "exit 0")
+    runner = SandboxRunner(workers=1, timeout=5, interval=0.2)
+    comportamiento = runner.submit(rapida).result()
+    assert comportamiento['codigo_salida'] == 0
+    assert 'fin' in comportamiento
+    runner.shutdown()
+
+def test_limites_aplicados(tmp_path):
+    """Prueba que la muestra corre con los límites de CPU y memoria, con y sin prlimit"""
+    salida = tmp_path / "limites.txt"
+    muestra = _script(tmp_path, "limites.sh", f"echo $(ulimit -t) $(ulimit -v) > {salida}")
+    runner = SandboxRunner(workers=1, timeout=5, cpu_time=3, memory_limit=512 * 1024 * 1024,
+                           interval=0.2, isolate=False)
+    for prlimit in {runner.prlimit, None}:
+        runner.prlimit = prlimit
+        assert runner.submit(muestra).result()['codigo_salida'] == 0
+        assert salida.read_text().split() == ["3", str(512 * 1024)]
+    runner.shutdown()
+
+    # Un valor explícito de 0 no se sustituye por el de la configuración
+    runner = SandboxRunner(workers=1, timeout=0, isolate=False)
+    assert runner.timeout == 0
+    runner.shutdown()
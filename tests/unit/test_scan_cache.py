@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Pruebas unitarias para la caché persistente de escaneos
+"""
+
+import os
+import pytest
+from scripts.utilidades.scan_cache import ScanCache, ruleset_version
+
+@pytest.fixture
+def muestra(tmp_path):
+    """Crea un archivo de muestra"""
+    archivo = tmp_path / "muestra.exe"
+    archivo.write_bytes(b"MZ contenido")
+    return archivo
+
+def test_cache_reutiliza_veredicto(tmp_path, muestra):
+    """Prueba que un archivo sin cambios reutiliza su veredicto"""
+    db = str(tmp_path / "cache.db")
+    version = ruleset_version("regla", ["cmd.exe"])
+    
+    with ScanCache(db, version) as cache:
+        assert cache.get(str(muestra)) is None
+        cache.put(str(muestra), os.stat(muestra), {"risk_score": 10})
+    
+    with ScanCache(db, version) as cache:
+        assert cache.get(str(muestra)) == {"risk_score": 10}
+
+def test_cache_invalida_por_cambios(tmp_path, muestra):
+    """Prueba que un cambio en el archivo o en las reglas invalida la entrada"""
+    db = str(tmp_path / "cache.db")
+    version = ruleset_version("regla")
+    
+    with ScanCache(db, version) as cache:
+        cache.put(str(muestra), os.stat(muestra), {"risk_score": 10})
+    
+    with ScanCache(db, ruleset_version("regla nueva")) as cache:
+        assert cache.get(str(muestra)) is None
+    
+    muestra.write_bytes(b"MZ contenido modificado")
+    with ScanCache(db, version) as cache:
+        assert cache.get(str(muestra)) is None
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Pruebas unitarias para la priorización de escaneos
+"""
+
+import os
+import time
+import pytest
+from scripts.utilidades.common import DirectoryWalker
+from scripts.utilidades.scan_cache import ScanCache
+from scripts.utilidades.scan_priority import PriorityScorer, ScanScheduler, parse_duration
+
+def test_parse_duration():
+    """Prueba el formato de los presupuestos de tiempo"""
+    assert parse_duration("30m") == 1800
+    assert parse_duration("1h30m") == 5400
+    assert parse_duration("90") == 90
+    with pytest.raises(ValueError):
+        parse_duration("media hora")
+
+def test_schedule_order_and_budget(tmp_path):
+    """Prueba el orden por riesgo, el veredicto previo y el corte por presupuesto"""
+    (tmp_path / "Downloads").mkdir()
+    (tmp_path / "docs").mkdir()
+    archivos = {"docs/informe.txt": b"x", "docs/viejo.dll": b"x", "Downloads/setup.exe": b"x",
+                "docs/vacio.exe": b"", "docs/notas.txt": b"x"}
+    for nombre, contenido in archivos.items():
+        (tmp_path / nombre).write_bytes(contenido)
+    antiguo = time.time() - 365 * 86400
+    os.utime(tmp_path / "docs/viejo.dll", (antiguo, antiguo))
+
+    with ScanCache(str(tmp_path / "cache.db"), "v1") as cache:
+        ruta = str(tmp_path / "docs/notas.txt")
+        cache.put(ruta, os.stat(ruta), {"risk_score": 45})
+        cache.put(str(tmp_path / "docs/informe.txt"), os.stat(ruta), {"risk_score": 0})
+        previos = cache.risk_scores()
+    assert previos == {ruta: 45}
+
+    # tmp_path cuelga de /tmp, que ya puntúa como ubicación: solo se usa Downloads
+    planificador = ScanScheduler(PriorityScorer(location_weights={'downloads': 25}), previous_risks=previos)
+    orden = [r.name for r in planificador.schedule(DirectoryWalker().walk(str(tmp_path)))
+             if not r.name.endswith(".db")]
+    assert orden == ["setup.exe", "notas.txt", "viejo.dll", "informe.txt", "vacio.exe"]
+    assert planificador.coverage()['complete']
+
+    # Con el presupuesto agotado no se entrega nada y la cobertura lista lo omitido
+    planificador = ScanScheduler(PriorityScorer(), budget=0)
+    assert list(planificador.schedule(DirectoryWalker().walk(str(tmp_path / "Downloads")))) == []
+    cobertura = planificador.coverage()
+    assert not cobertura['complete'] and cobertura['skipped'] == 1
+    assert cobertura['top_skipped'][0]['path'].endswith("setup.exe")
+    assert cobertura['skipped_by_extension'] == {'.exe': 1}
@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Pruebas unitarias para la línea de tiempo MACB
+"""
+
+import os
+from scripts.utilidades.timeline import TimelineBuilder, query_timeline
+
+def test_timeline_external_sort(tmp_path):
+    """Prueba el orden de la línea de tiempo con varios tramos y las consultas por rango"""
+    archivos = []
+    for i in range(50):
+        archivo = tmp_path / "datos" / f"archivo_{i:02d}.txt"
+        archivo.parent.mkdir(exist_ok=True)
+        archivo.write_text(str(i))
+        # mtime y atime distintos para generar dos eventos por archivo
+        os.utime(archivo, (1_600_000_000 + i * 7200, 1_600_000_000 + i * 3600))
+        archivos.append(archivo)
+
+    salida = tmp_path / "timeline.csv"
+    with TimelineBuilder(str(salida), run_size=16, index_every=8) as timeline:
+        for archivo in reversed(archivos):
+            timeline.add(str(archivo), os.stat(archivo))
+
+    lineas = salida.read_text().splitlines(keepends=True)[1:]
+    assert lineas == sorted(lineas)
+    assert sum(1 for l in lineas if ",m...," in l) == 49
+    assert len((tmp_path / "timeline.body").read_text().splitlines()) == 50
+
+    # 2020-09-13T12:26:40Z es el epoch 1_600_000_000
+    rango = list(query_timeline(str(salida), "2020-09-13T20:00:00Z", "2020-09-14T00:00:00"))
+    assert rango == [l for l in lineas if "2020-09-13T20:00:00Z" <= l[:20] <= "2020-09-14T00:00:00Z"]
+    assert len(rango) > 0
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Pruebas unitarias para el gestor de reglas YARA
+"""
+
+import pytest
+from scripts.utilidades.yara_rules import YaraRulesManager, LiteralMatcher
+
+REGLA = 'rule %s { strings: $a = "%s" condition: $a }'
+
+@pytest.fixture
+def reglas(tmp_path):
+    """Crea un directorio de reglas y uno de caché"""
+    directorio = tmp_path / "reglas"
+    directorio.mkdir()
+    (directorio / "uno.yar").write_text(REGLA % ("uno", "malicioso"))
+    return directorio, tmp_path / "compiladas"
+
+def test_reglas_compiladas_se_reutilizan(reglas):
+    """Prueba que la segunda carga usa el conjunto guardado"""
+    directorio, cache = reglas
+    gestor = YaraRulesManager(str(directorio), str(cache))
+    assert [m.rule for m in gestor.match(data=b"algo malicioso")] == ["uno"]
+    assert (cache / f"{gestor.version}.yarc").exists()
+    
+    otro = YaraRulesManager(str(directorio), str(cache))
+    assert otro.rules is not None
+    assert otro.version == gestor.version
+
+def test_recarga_en_caliente(reglas):
+    """Prueba que un cambio en el directorio intercambia el conjunto de reglas"""
+    directorio, cache = reglas
+    gestor = YaraRulesManager(str(directorio), str(cache))
+    version = gestor.version if gestor.rules else None
+    assert not gestor.reload_if_changed()
+    
+    (directorio / "dos.yara").write_text(REGLA % ("dos", "sospechoso"))
+    assert gestor.reload_if_changed()
+    assert gestor.version != version
+    assert [m.rule for m in gestor.match(data=b"sospechoso")] == ["dos"]
+
+def test_literal_matcher():
+    """Prueba la búsqueda de literales sin distinguir mayúsculas sobre bytes crudos"""
+    matcher = LiteralMatcher(["cmd.exe", "VirtualBox", 'comilla"y\\barra'])
+    datos = b"\x00\xffejecuta CMD.EXE en virtualbox comilla\"y\\barra"
+    assert matcher.match(datos) == ["cmd.exe", "VirtualBox", 'comilla"y\\barra']
+    assert matcher.match(b"nada relevante") == []
+    assert matcher.match(b"") == []